@@ -0,0 +1,506 @@
+"""
+板塊資金流向 / 熱力圖 HTTP JSON API (aiohttp)
+在記憶體保留最新一輪結果的快照,預先序列化並建立索引,每個請求只讀取同一份快照:
+  - ETag / If-None-Match: 內容未變動時回 304
+  - gzip: 用戶端接受時回傳壓縮內容 (每份回應只壓縮一次)
+  - 篩選: 依美股 ticker、台股族群、個股代號
+追蹤器完成一輪或輸出檔更新時建立新快照,以單一參照替換 (進行中的請求仍使用舊快照)
+
+端點:
+  GET /api/health                  快照版本與筆數
+  GET /api/summary                 本輪摘要 (sector_flow_data.json 去掉 sectors)
+  GET /api/sectors                 美股板塊列表 ?ticker=XLK,SMH &theme=半導體 &stock=2330 &sector_type=核心板塊
+  GET /api/sectors/{ticker}        單一美股板塊
+  GET /api/themes                  台股族群排名 (out/tw_themes_ranked.json) ?theme=
+  GET /api/themes/{theme}          族群排名、成分股熱力圖、對應的美股板塊與成分股
+  GET /api/heatmap                 成分股熱力圖 (out/tw_theme_heatmap.json) ?theme=
+  GET /api/picks                   美股板塊 -> 台股族群 -> 個股 (out/us_sector_to_tw_picks.json) ?ticker=
+  GET /api/stocks/{code}           個股所屬族群、對應的美股板塊與最新報價
+
+用法:
+  python api_server.py [--port 8765] [--data sector_flow_data.json] [--outdir out] [--watch 5]
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 小於此大小的回應不壓縮
+GZIP_MIN_BYTES = 1024
+# 每份快照最多快取幾個不同的篩選結果
+RESPONSE_CACHE_SIZE = 1024
+
+# out/ 內的輸出檔 -> 快照欄位
+OUT_FILES = {
+    'ranked': 'tw_themes_ranked.json',
+    'picks': 'us_sector_to_tw_picks.json',
+    'heatmap': 'tw_theme_heatmap.json',
+    'constituents': 'tw_theme_constituents.json',
+}
+
+STOCK_CODE = re.compile(r'^\s*(\d{4,6}[A-Z]?)')
+
+
+def _split(value):
+    """?ticker=XLK,SMH -> {'XLK', 'SMH'} (未提供時為 None)"""
+    if not value:
+        return None
+    return {v.strip() for v in value.split(',') if v.strip()}
+
+
+def _stock_code(text):
+    """'2330 台積電' -> '2330'"""
+    m = STOCK_CODE.match(text)
+    return m.group(1) if m else None
+
+
+class Body:
+    """預先序列化的回應內容"""
+    __slots__ = ('data', 'etag', '_gzip')
+
+    def __init__(self, obj):
+        self.data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"' + hashlib.sha1(self.data).hexdigest()[:20] + '"'
+        self._gzip = None
+
+    @property
+    def gzip(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.data, compresslevel=6)
+        return self._gzip
+
+
+class Snapshot:
+    """某一時間點的所有結果與索引 (建立後不再修改)"""
+
+    def __init__(self, flow=None, ranked=None, picks=None, heatmap=None, constituents=None):
+        self.flow = flow or {}
+        self.ranked = ranked or []
+        self.picks = picks or []
+        self.heatmap = heatmap or []
+        self.constituents = constituents or {}
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        self.sectors = self.flow.get('sectors', [])
+        self._cache = {}
+        self._index()
+        self.version = hashlib.sha1(b''.join(
+            self.body(name).data for name in ('summary', 'sectors', 'themes', 'heatmap', 'picks')
+        )).hexdigest()[:12]
+
+    def parts(self):
+        return {'flow': self.flow, 'ranked': self.ranked, 'picks': self.picks,
+                'heatmap': self.heatmap, 'constituents': self.constituents}
+
+    def _index(self):
+        self.by_ticker = {s['us_ticker']: s for s in self.sectors}
+        self.ranked_by_theme = {r['tw_theme']: r for r in self.ranked}
+        self.heatmap_by_theme = {r['tw_theme']: r for r in self.heatmap}
+
+        # 美股板塊的台股產業 / 個股
+        self.sector_themes = {s['us_ticker']: set(s.get('tw_sectors', [])) for s in self.sectors}
+        self.sector_codes = {
+            s['us_ticker']: {c for c in map(_stock_code, s.get('tw_stocks', [])) if c} for s in self.sectors
+        }
+
+        # 台股族群 -> 對應的美股板塊 (追蹤器的產業對應 + 熱力圖的 picks)
+        self.theme_tickers = {}
+        for ticker, themes in self.sector_themes.items():
+            for theme in themes:
+                self.theme_tickers.setdefault(theme, set()).add(ticker)
+        for p in self.picks:
+            for t in p['tw_themes']:
+                self.theme_tickers.setdefault(t['tw_theme'], set()).add(p['us_sector']['ticker'])
+
+        # 個股 -> 名稱 / 所屬族群 / 對應的美股板塊 / 最新報價
+        self.stocks = {}
+
+        def stock(code, name=None):
+            entry = self.stocks.setdefault(code, {'stock_code': code, 'stock_name': name,
+                                                  'themes': set(), 'us_tickers': set(), 'quote': None})
+            if name and not entry['stock_name']:
+                entry['stock_name'] = name
+            return entry
+
+        for theme, members in self.constituents.items():
+            for s in members:
+                stock(s['stock_code'], s.get('stock_name'))['themes'].add(theme)
+        for s in self.sectors:
+            for text in s.get('tw_stocks', []):
+                code = _stock_code(text)
+                if code:
+                    stock(code, text[len(code):].strip() or None)['us_tickers'].add(s['us_ticker'])
+        for p in self.picks:
+            for t in p['tw_themes']:
+                for s in t['stocks']:
+                    entry = stock(s['stock_code'], s.get('stock_name'))
+                    entry['themes'].add(t['tw_theme'])
+                    entry['us_tickers'].add(p['us_sector']['ticker'])
+        for row in self.heatmap:
+            for cell in row['stocks']:
+                entry = stock(cell['stock_code'], cell.get('stock_name'))
+                entry['themes'].add(row['tw_theme'])
+                entry['quote'] = {k: cell[k] for k in ('price', 'change_pct', 'volume') if k in cell}
+
+    # ---- 各端點的內容 ----
+
+    def _summary(self):
+        return {k: v for k, v in self.flow.items() if k != 'sectors'}
+
+    def _health(self):
+        return {
+            'status': 'ok',
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'update_time': self.flow.get('update_time'),
+            'counts': {'sectors': len(self.sectors), 'themes': len(self.ranked),
+                       'heatmap': len(self.heatmap), 'picks': len(self.picks), 'stocks': len(self.stocks)},
+        }
+
+    def _sectors(self, ticker=None, theme=None, stock=None, sector_type=None):
+        tickers, themes, codes = _split(ticker), _split(theme), _split(stock)
+        return [
+            s for s in self.sectors
+            if (tickers is None or s['us_ticker'] in tickers)
+            and (themes is None or self.sector_themes[s['us_ticker']] & themes)
+            and (codes is None or self.sector_codes[s['us_ticker']] & codes)
+            and (sector_type is None or s.get('sector_type') == sector_type)
+        ]
+
+    def _sector(self, ticker):
+        return self.by_ticker.get(ticker)
+
+    def _themes(self, theme=None):
+        themes = _split(theme)
+        return [r for r in self.ranked if themes is None or r['tw_theme'] in themes]
+
+    def _theme(self, theme):
+        tickers = self.theme_tickers.get(theme)
+        if theme not in self.ranked_by_theme and theme not in self.heatmap_by_theme and not tickers:
+            return None
+        return {
+            'tw_theme': theme,
+            'ranked': self.ranked_by_theme.get(theme),
+            'heatmap': self.heatmap_by_theme.get(theme),
+            'us_sectors': [self.by_ticker[t] for t in sorted(tickers or ()) if t in self.by_ticker],
+            'stocks': self.constituents.get(theme, []),
+        }
+
+    def _heatmap(self, theme=None):
+        themes = _split(theme)
+        return [r for r in self.heatmap if themes is None or r['tw_theme'] in themes]
+
+    def _picks(self, ticker=None):
+        tickers = _split(ticker)
+        return [p for p in self.picks if tickers is None or p['us_sector']['ticker'] in tickers]
+
+    def _stock(self, code):
+        entry = self.stocks.get(code)
+        if entry is None:
+            return None
+        return {
+            'stock_code': code,
+            'stock_name': entry['stock_name'],
+            'themes': sorted(entry['themes']),
+            'us_sectors': [self.by_ticker[t] for t in sorted(entry['us_tickers']) if t in self.by_ticker],
+            'quote': entry['quote'],
+        }
+
+    ENDPOINTS = {
+        'health': ('_health', ()),
+        'summary': ('_summary', ()),
+        'sectors': ('_sectors', ('ticker', 'theme', 'stock', 'sector_type')),
+        'sector': ('_sector', ()),
+        'themes': ('_themes', ('theme',)),
+        'theme': ('_theme', ()),
+        'heatmap': ('_heatmap', ('theme',)),
+        'picks': ('_picks', ('ticker',)),
+        'stock': ('_stock', ()),
+    }
+
+    def body(self, name, key=None, query=None):
+        """
+        端點的回應內容 (同一份快照內相同的端點 + 參數只序列化一次)
+        key: 路徑參數 (ticker / theme / 個股代號)
+        query: 查詢參數,只使用該端點支援的篩選
+        回傳 Body,找不到資源時為 None
+        """
+        method, filters = self.ENDPOINTS[name]
+        params = tuple((f, query[f]) for f in filters if query and query.get(f))
+        cache_key = (name, key, params)
+        body = self._cache.get(cache_key)
+        if body is None:
+            args = (key,) if key is not None else ()
+            obj = getattr(self, method)(*args, **dict(params))
+            if obj is None:
+                return None
+            body = Body(obj)
+            if len(self._cache) >= RESPONSE_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[cache_key] = body
+        return body
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_parts(data_file='sector_flow_data.json', outdir='out', only=None):
+    """
+    讀取輸出檔,回傳成功讀取的部分 {快照欄位: 內容} (檔案不存在或無法讀取的部分不包含在內)
+    only: 只讀取這些路徑 (None 表示全部)
+    """
+    files = {'flow': data_file}
+    files.update({name: os.path.join(outdir, filename) if outdir else None for name, filename in OUT_FILES.items()})
+    parts = {}
+    for name, path in files.items():
+        if not path or (only is not None and path not in only):
+            continue
+        value = _read_json(path)
+        if value is not None:
+            parts[name] = value
+    return parts
+
+
+def load_snapshot(data_file='sector_flow_data.json', outdir='out', base=None):
+    """
+    由輸出檔建立快照
+    base: 沿用的快照 (檔案不存在或無法讀取的部分沿用其內容)
+    """
+    parts = base.parts() if base else {}
+    parts.update(load_parts(data_file, outdir))
+    return Snapshot(**parts)
+
+
+class ApiState:
+    """目前的快照 (整份替換,讀取端不需要加鎖)"""
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot or Snapshot()
+        self.swaps = 0
+        self._lock = threading.Lock()
+
+    def swap(self, snapshot):
+        self.snapshot = snapshot
+        self.swaps += 1
+        print(f"🔁 API 快照已更新: {snapshot.version} ({len(snapshot.sectors)} 個板塊)")
+
+    def update(self, **parts):
+        """以新的部分內容 (flow / ranked / picks / heatmap / constituents) 建立快照並替換,可由任何執行緒呼叫"""
+        with self._lock:
+            merged = {**self.snapshot.parts(), **parts}
+            self.swap(Snapshot(**merged))
+
+
+def _accepts_gzip(request):
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def _not_modified(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(',')}
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+def respond(request, body):
+    """以 ETag / gzip 回傳預先序列化的內容"""
+    headers = {
+        'ETag': body.etag,
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        'Access-Control-Allow-Origin': '*',
+    }
+    if _not_modified(request, body.etag):
+        return web.Response(status=304, headers=headers)
+    data = body.data
+    if len(data) >= GZIP_MIN_BYTES and _accepts_gzip(request):
+        data = body.gzip
+        headers['Content-Encoding'] = 'gzip'
+    return web.Response(body=data, headers=headers, content_type='application/json', charset='utf-8')
+
+
+def create_app(state):
+    routes = [
+        ('/api/health', 'health', None),
+        ('/api/summary', 'summary', None),
+        ('/api/sectors', 'sectors', None),
+        ('/api/sectors/{ticker}', 'sector', 'ticker'),
+        ('/api/themes', 'themes', None),
+        ('/api/themes/{theme}', 'theme', 'theme'),
+        ('/api/heatmap', 'heatmap', None),
+        ('/api/picks', 'picks', None),
+        ('/api/stocks/{code}', 'stock', 'code'),
+    ]
+
+    def handler(name, path_key):
+        async def handle(request):
+            snapshot = state.snapshot  # 整個請求只讀取同一份快照
+            key = request.match_info[path_key] if path_key else None
+            body = snapshot.body(name, key, request.query)
+            if body is None:
+                raise web.HTTPNotFound(text=json.dumps({'error': 'not found', 'key': key}, ensure_ascii=False),
+                                       content_type='application/json')
+            return respond(request, body)
+        return handle
+
+    app = web.Application()
+    for path, name, path_key in routes:
+        app.router.add_get(path, handler(name, path_key))
+    app['state'] = state
+    return app
+
+
+async def watch_files(state, data_file, outdir, interval):
+    """
+    定期檢查輸出檔的修改時間,有變動時在背景執行緒只重新讀取變動的檔案,
+    經由 state.update 在鎖內合併 (不會蓋掉追蹤器在讀檔期間更新的 flow)
+    """
+    paths = [p for p in [data_file] + [os.path.join(outdir, f) for f in OUT_FILES.values()] if p]
+
+    def mtimes():
+        return {p: os.path.getmtime(p) for p in paths if os.path.exists(p)}
+
+    def reload(changed):
+        parts = load_parts(data_file, outdir, only=changed)
+        if parts:
+            state.update(**parts)
+
+    seen = mtimes()
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        current = mtimes()
+        if current != seen:
+            changed = {p for p, mtime in current.items() if seen.get(p) != mtime}
+            seen = current
+            try:
+                await loop.run_in_executor(None, reload, changed)
+            except Exception as e:
+                print(f"❌ 重新載入輸出檔失敗: {e}")
+
+
+class ApiServer:
+    """在背景執行緒執行 API server (供追蹤器內嵌使用)"""
+
+    def __init__(self, state=None, host=DEFAULT_HOST, port=DEFAULT_PORT, data_file=None, outdir='out',
+                 watch=5.0):
+        """
+        state: 共用的 ApiState (None 時由 data_file / outdir 載入)
+        data_file / outdir: 監看並載入的輸出檔 (內嵌時 flow 由追蹤器直接更新,data_file 可為 None)
+        watch: 檢查輸出檔變動的間隔秒數 (0 表示不監看)
+        """
+        self.state = state or ApiState(load_snapshot(data_file, outdir))
+        self.host = host
+        self.port = port
+        self.data_file = data_file
+        self.outdir = outdir
+        self.watch = watch
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    async def _start(self):
+        self._runner = web.AppRunner(create_app(self.state), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+        if self.watch:
+            asyncio.get_running_loop().create_task(
+                watch_files(self.state, self.data_file, self.outdir, self.watch))
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start())
+        except Exception as e:
+            # 例如連接埠已被占用: 交由 start() 在呼叫端拋出
+            self._error = e
+            self._loop.close()
+            self._loop = None
+            return
+        finally:
+            self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='api-server', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+        print(f"🌐 API server: http://{self.host}:{self.port}/api/health")
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def update(self, **parts):
+        """替換快照內容 (例如追蹤器每輪完成後的 flow)"""
+        self.state.update(**parts)
+
+
+def main():
+    p = argparse.ArgumentParser(description="板塊資金流向 / 熱力圖 HTTP JSON API")
+    p.add_argument('--host', default=DEFAULT_HOST)
+    p.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p.add_argument('--data', default='sector_flow_data.json', help="追蹤器輸出的 JSON")
+    p.add_argument('--outdir', default='out', help="sector_heatmap 輸出目錄")
+    p.add_argument('--watch', type=float, default=5.0, help="檢查輸出檔變動的間隔秒數 (0 表示不監看)")
+    args = p.parse_args()
+
+    started = time.perf_counter()
+    state = ApiState(load_snapshot(args.data, args.outdir))
+    print(f"📦 快照 {state.snapshot.version}: {len(state.snapshot.sectors)} 個板塊, "
+          f"{len(state.snapshot.ranked)} 個族群, {len(state.snapshot.stocks)} 檔個股 "
+          f"({time.perf_counter() - started:.2f}s)")
+
+    async def serve():
+        runner = web.AppRunner(create_app(state), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, args.port).start()
+        print(f"🌐 API server: http://{args.host}:{args.port}/api/health (Ctrl+C 結束)")
+        try:
+            if args.watch:
+                await watch_files(state, args.data, args.outdir, args.watch)
+            else:
+                await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n⚠️  使用者中斷")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
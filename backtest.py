@@ -0,0 +1,295 @@
+"""
+板塊資金流向信號回測
+以本地日線快取 (stock_data/cache) 重播美股板塊 ETF 與台股個股的歷史 K 線,
+逐日套用追蹤器的 flow_strength / 交易信號 / 強度等級計算,
+衡量每個信號對應的 tw_stocks 在台股下一個交易日開盤進場後的前瞻報酬
+
+計算方式與 SectorFlowTracker(realtime=False) 相同:
+  change_pct   = (收盤 / 前一日收盤 - 1) * 100
+  volume_ratio = 成交量 / 最近 5 日平均成交量
+  flow_strength = change_pct * volume_ratio
+
+所有日期 x 板塊 x 個股的運算皆以 numpy 矩陣一次完成,不逐日迴圈
+
+用法:
+  python backtest.py --start 2020-01-01 [--end 2024-12-31] [--horizons 1,5,20] [--fetch]
+  python backtest.py --from-history      # 改用 history/ 內實際記錄的快照信號
+"""
+
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import DATE_COLUMN, BarCache, bar_dates
+from history_store import HistoryStore
+from mapping_index import load_mapping_index
+from sector_flow_tracker import (SIGNAL_FLOOR, SIGNAL_THRESHOLDS, STRENGTH_THRESHOLDS,
+                                 US_SECTOR_ETFS, US_THEME_ETFS)
+
+US_SOURCE = 'us'
+VOLUME_WINDOW = 5
+DEFAULT_HORIZONS = (1, 5, 20)
+
+
+def _numeric(values):
+    """證交所數字欄位含千分位逗號與 '--',轉為 float"""
+    return pd.to_numeric(pd.Series(values).astype(str).str.replace(',', ''), errors='coerce')
+
+
+def fetch_us_bars(cache, ticker, start, end):
+    """以快取補抓美股 ETF 日線 (欄位與台股 Yahoo 快取相同)"""
+    import yfinance as yf
+
+    fetch_from = cache.plan(US_SOURCE, ticker, start, end)
+    if fetch_from is None:
+        return
+    df = yf.Ticker(ticker).history(start=fetch_from.isoformat(), end=(end + timedelta(days=1)).isoformat())
+    if df is None or df.empty:
+        print(f"❌ {ticker} 無資料")
+        return
+    df = df.reset_index().rename(columns={
+        'Date': '日期', 'Open': '開盤價', 'High': '最高價', 'Low': '最低價',
+        'Close': '收盤價', 'Volume': '成交量', 'Dividends': '股息', 'Stock Splits': '股票分割',
+    })
+    df['股票代碼'] = ticker
+    cache.append(US_SOURCE, ticker, df, checked=end, fetched_from=fetch_from)
+    print(f"✅ {ticker} 抓取成功! 共 {len(df)} 筆資料")
+
+
+def load_panel(cache, source, codes, start=None, end=None):
+    """
+    從快取讀取多檔日線,組成 日期 x 代碼 的寬表
+    回傳 {'open', 'close', 'volume'} 三個 DataFrame (index 為 datetime.date),無快取的代碼不列入
+    """
+    opens, closes, volumes = {}, {}, {}
+    for code in codes:
+        df = cache.load(source, code, start, end)
+        if df is None or df.empty:
+            continue
+        dates = bar_dates(source, df[DATE_COLUMN]).values
+        if source == 'twse':
+            volume = _numeric(df['成交股數']).values
+        else:
+            volume = pd.to_numeric(df['成交量'], errors='coerce').values
+        opens[code] = pd.Series(_numeric(df['開盤價']).values, index=dates)
+        closes[code] = pd.Series(_numeric(df['收盤價']).values, index=dates)
+        volumes[code] = pd.Series(volume, index=dates)
+
+    def wide(columns):
+        frame = pd.DataFrame(columns).sort_index()
+        return frame[~frame.index.duplicated(keep='last')]
+
+    return {'open': wide(opens), 'close': wide(closes), 'volume': wide(volumes)}
+
+
+def strength_levels(flow):
+    """向量化的 SectorFlowTracker._get_strength_level"""
+    thresholds = np.array([t for t, _ in STRENGTH_THRESHOLDS])
+    levels = np.array([lv for _, lv in STRENGTH_THRESHOLDS] + [1])
+    return levels[(flow[..., None] <= thresholds).sum(axis=-1)]
+
+
+def signal_labels(flow):
+    """向量化的 SectorFlowTracker._generate_signal"""
+    thresholds = np.array([t for t, _ in SIGNAL_THRESHOLDS])
+    labels = np.array([s for _, s in SIGNAL_THRESHOLDS] + [SIGNAL_FLOOR], dtype=object)
+    return labels[(flow[..., None] <= thresholds).sum(axis=-1)]
+
+
+def bar_signals(us_panel):
+    """
+    由美股 ETF 日線計算每日每檔的 flow_strength 與信號
+    回傳長表: date, us_ticker, us_change, volume_ratio, flow_strength, strength_level, signal
+    """
+    close = us_panel['close'].to_numpy(dtype=float)
+    volume = us_panel['volume'].reindex_like(us_panel['close']).to_numpy(dtype=float)
+
+    prev = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    change_pct = (close / prev - 1) * 100
+    avg_volume = pd.DataFrame(volume).rolling(VOLUME_WINDOW, min_periods=1).mean().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        volume_ratio = np.where(avg_volume > 0, volume / avg_volume, 1.0)
+    flow = change_pct * volume_ratio
+
+    days, tickers = np.nonzero(~np.isnan(flow))
+    flow_values = flow[days, tickers]
+    return pd.DataFrame({
+        'date': us_panel['close'].index.values[days],
+        'us_ticker': us_panel['close'].columns.values[tickers],
+        'us_change': np.round(change_pct[days, tickers], 2),
+        'volume_ratio': np.round(volume_ratio[days, tickers], 2),
+        'flow_strength': np.round(flow_values, 2),
+        'strength_level': strength_levels(np.round(flow_values, 2)),
+        'signal': signal_labels(np.round(flow_values, 2)),
+    })
+
+
+def history_signals(store, start=None, end=None):
+    """讀取 history/ 內追蹤器實際輸出的快照 (每個 ticker 每天取最後一筆)"""
+    df = store.load(start, end)
+    if df.empty:
+        return df
+    df = df.drop_duplicates(['date', 'us_ticker'], keep='last')
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    return df[['date', 'us_ticker', 'us_change', 'volume_ratio', 'flow_strength',
+               'strength_level', 'signal', 'tw_stocks']].reset_index(drop=True)
+
+
+def forward_returns(signals, tw_panel, stock_lists, horizons=DEFAULT_HORIZONS, same_day=False):
+    """
+    計算每個信號對應台股個股的等權前瞻報酬
+    signals: bar_signals / history_signals 的結果
+    stock_lists: 每列對應的台股代碼清單 (與 signals 等長)
+    horizons: 持有交易日數,報酬 = 第 h 個交易日收盤 / 進場日開盤 - 1
+    same_day: 進場日可否為信號當日 (history 快照在台股開盤前產生時為 True)
+    回傳 signals 加上 ret_{h}d (對應個股平均)、bench_{h}d (全部對應個股平均)、excess_{h}d、n_stocks
+    """
+    codes = list(tw_panel['close'].columns)
+    col = {c: i for i, c in enumerate(codes)}
+    tw_dates = np.array(tw_panel['close'].index, dtype='datetime64[D]')
+    opens = tw_panel['open'].reindex_like(tw_panel['close']).to_numpy(dtype=float)
+    closes = tw_panel['close'].to_numpy(dtype=float)
+    n_days = len(tw_dates)
+
+    # 會員矩陣: 不重複的個股清單 x 台股個股,每個信號列只記錄所屬清單
+    groups, group_of = {}, np.empty(len(signals), dtype=np.int64)
+    for i, stocks in enumerate(stock_lists):
+        key = tuple(sorted(c for c in set(stocks) if c in col))
+        group_of[i] = groups.setdefault(key, len(groups))
+    member = np.zeros((len(groups) + 1, len(codes)))
+    for key, g in groups.items():
+        member[g, [col[c] for c in key]] = 1.0
+    member[-1] = member[:-1].max(axis=0)  # 最後一列: 所有對應個股 (基準)
+
+    sig_dates = np.array(pd.to_datetime(signals['date']).values, dtype='datetime64[D]')
+    entry = np.searchsorted(tw_dates, sig_dates, side='left' if same_day else 'right')
+
+    out = signals.copy()
+    out['n_stocks'] = member[group_of].sum(axis=1).astype(int)
+    padded_close = np.vstack([closes, np.full((1, len(codes)), np.nan)])
+    for h in horizons:
+        # 每個進場日 x 個股的報酬,超出資料範圍者為 NaN (多一列 NaN 給超出範圍的進場日)
+        exit_idx = np.minimum(np.arange(n_days) + h - 1, n_days)
+        ret = np.vstack([padded_close[exit_idx] / opens - 1, np.full((1, len(codes)), np.nan)])
+
+        # 進場日 x 清單 的平均報酬: 一次矩陣乘法
+        valid = ~np.isnan(ret)
+        sums = np.where(valid, ret, 0.0) @ member.T
+        counts = valid.astype(float) @ member.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_table = sums / counts
+
+        rows = np.minimum(entry, n_days)
+        mean = mean_table[rows, group_of]
+        bench = mean_table[rows, -1]
+        out[f'ret_{h}d'] = mean * 100
+        out[f'bench_{h}d'] = bench * 100
+        out[f'excess_{h}d'] = (mean - bench) * 100
+    return out
+
+
+def summarize(result, horizons=DEFAULT_HORIZONS, by='strength_level'):
+    """依強度等級 (或信號) 彙總: 筆數、平均報酬、勝率、超額報酬"""
+    rows = []
+    for key, group in result.groupby(by, sort=True):
+        row = {by: key, 'count': len(group), 'avg_flow': group['flow_strength'].mean()}
+        for h in horizons:
+            ret = group[f'ret_{h}d'].dropna()
+            row[f'mean_{h}d'] = ret.mean()
+            row[f'hit_{h}d'] = (ret > 0).mean() * 100 if len(ret) else np.nan
+            row[f'excess_{h}d'] = group[f'excess_{h}d'].mean()
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values('avg_flow', ascending=False).reset_index(drop=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description="板塊資金流向信號回測")
+    p.add_argument("--start", help="起始日 YYYY-MM-DD")
+    p.add_argument("--end", help="結束日 YYYY-MM-DD")
+    p.add_argument("--horizons", default="1,5,20", help="持有交易日數,逗號分隔")
+    p.add_argument("--source", default="yahoo", choices=["yahoo", "twse"], help="台股快取來源")
+    p.add_argument("--cache-dir", default="stock_data/cache", help="日線快取目錄")
+    p.add_argument("--fetch", action="store_true", help="快取不足時先下載 (美股 ETF 與台股個股)")
+    p.add_argument("--from-history", action="store_true", help="使用 history/ 內的實際快照信號")
+    p.add_argument("--outdir", default="out", help="輸出目錄")
+    args = p.parse_args()
+
+    horizons = [int(h) for h in args.horizons.split(',')]
+    start = date.fromisoformat(args.start) if args.start else None
+    end = date.fromisoformat(args.end) if args.end else datetime.now().date()
+    cache = BarCache(args.cache_dir)
+    mapping = load_mapping_index()
+
+    ticker_stocks = {
+        t: [entry.split()[0] for entry in info.get('tw_stocks', [])]
+        for t, info in mapping.sector_mapping.items()
+    }
+    tw_codes = sorted({c for codes in ticker_stocks.values() for c in codes})
+    us_tickers = list({**US_SECTOR_ETFS, **US_THEME_ETFS})
+
+    if args.fetch:
+        if start is None:
+            raise SystemExit("❌ --fetch 需要指定 --start")
+        from tw_stock_fetcher import TaiwanStockFetcher
+        for t in us_tickers:
+            fetch_us_bars(cache, t, start, end)
+        fetcher = TaiwanStockFetcher()
+        fetcher.cache = cache
+        # 多抓最長持有期間,讓區間尾端的信號也有前瞻報酬
+        tw_end = min(end + timedelta(days=max(horizons) * 2), datetime.now().date()).isoformat()
+        if args.source == 'twse':
+            fetcher.fetch_many_from_twse(tw_codes, start.strftime('%Y%m%d'), tw_end.replace('-', ''))
+        else:
+            for code in tw_codes:
+                fetcher.fetch_from_yahoo(code, start_date=start.isoformat(), end_date=tw_end)
+
+    t0 = time.perf_counter()
+    if args.from_history:
+        signals = history_signals(HistoryStore('history'), start, end)
+        stock_lists = [[entry.split()[0] for entry in stocks] for stocks in signals.get('tw_stocks', [])]
+        same_day = True
+    else:
+        us_panel = load_panel(cache, US_SOURCE, us_tickers)
+        if us_panel['close'].empty:
+            raise SystemExit("❌ 沒有美股 ETF 日線快取,請加上 --fetch --start YYYY-MM-DD")
+        signals = bar_signals(us_panel)
+        mask = pd.Series(True, index=signals.index)
+        if start:
+            mask &= signals['date'] >= start
+        mask &= signals['date'] <= end
+        signals = signals[mask].reset_index(drop=True)
+        stock_lists = [ticker_stocks.get(t, []) for t in signals['us_ticker']]
+        same_day = False
+
+    if signals.empty:
+        raise SystemExit("❌ 區間內沒有信號")
+
+    tw_panel = load_panel(cache, args.source, tw_codes)
+    print(f"📊 信號: {len(signals)} 筆 | 台股個股: {tw_panel['close'].shape[1]} 檔 x {len(tw_panel['close'])} 日")
+
+    result = forward_returns(signals, tw_panel, stock_lists, horizons, same_day=same_day)
+    by_level = summarize(result, horizons, 'strength_level')
+    by_signal = summarize(result, horizons, 'signal')
+    elapsed = time.perf_counter() - t0
+
+    pd.set_option('display.width', 200)
+    print("\n📈 依強度等級:")
+    print(by_level.round(2).to_string(index=False))
+    print("\n📈 依交易信號:")
+    print(by_signal.round(2).to_string(index=False))
+    print(f"\n⏱️  計算耗時: {elapsed:.2f} 秒")
+
+    os.makedirs(args.outdir, exist_ok=True)
+    result.drop(columns=['tw_stocks'], errors='ignore').to_csv(
+        os.path.join(args.outdir, 'backtest_signals.csv'), index=False, encoding='utf-8-sig')
+    by_level.to_csv(os.path.join(args.outdir, 'backtest_summary.csv'), index=False, encoding='utf-8-sig')
+    print(f"✅ 已儲存: {args.outdir}/backtest_signals.csv, {args.outdir}/backtest_summary.csv")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
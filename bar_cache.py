@@ -0,0 +1,187 @@
+"""
+台股日線本地快取
+每檔股票、每個資料來源一個檔案,記錄已涵蓋的日期區間,
+之後每次只需補抓缺少的尾端資料並附加到檔案後面
+plan / append 以鎖保護,可由多個抓取執行緒共用
+"""
+
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+DATE_COLUMN = '日期'
+
+
+def bar_dates(source, values):
+    """
+    將日期欄位轉為 datetime.date Series
+    yahoo: Timestamp / ISO 字串 (含時區)
+    twse: 民國年字串 'YYY/MM/DD'
+    """
+    values = pd.Series(values)
+    if source == 'twse':
+        def roc_to_date(text):
+            y, m, d = str(text).strip().split('/')
+            return date(int(y) + 1911, int(m), int(d))
+        return values.map(roc_to_date)
+    return pd.to_datetime(values, utc=True).dt.tz_convert('Asia/Taipei').dt.date
+
+
+def has_weekday(start, end):
+    """[start, end] 之間是否有週一至週五 (可能有交易日)"""
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            return True
+        day += timedelta(days=1)
+    return False
+
+
+class BarCache:
+    def __init__(self, cache_dir='stock_data/cache'):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.index = self._load_index()
+        self._lock = threading.RLock()
+        self.stats = {
+            'hits': 0,
+            'partial': 0,
+            'misses': 0,
+            'rows_downloaded': 0,
+            'bytes_downloaded': 0,
+        }
+
+    def _load_index(self):
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.index_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_file)
+
+    def _path(self, source, stock_code):
+        return os.path.join(self.cache_dir, source, f"{stock_code}.csv")
+
+    def _entry(self, source, stock_code):
+        return self.index.get(source, {}).get(stock_code)
+
+    def plan(self, source, stock_code, start, end):
+        """
+        判斷 [start, end] 區間需從哪一天開始補抓
+        回傳 None 表示快取已完整涵蓋 (命中),否則回傳需補抓的起始日
+        """
+        with self._lock:
+            entry = self._entry(source, stock_code)
+            if entry and os.path.exists(self._path(source, stock_code)):
+                first = date.fromisoformat(entry['first_date'])
+                last = date.fromisoformat(entry['last_date'])
+                checked = date.fromisoformat(entry.get('checked', entry['last_date']))
+                if first <= start:
+                    covered = max(last, checked)
+                    if covered >= end or not has_weekday(covered + timedelta(days=1), end):
+                        self.stats['hits'] += 1
+                        return None
+                    self.stats['partial'] += 1
+                    return last + timedelta(days=1)
+
+            self.stats['misses'] += 1
+            return start
+
+    def load(self, source, stock_code, start=None, end=None):
+        """讀取快取 (可指定日期區間),無快取時回傳 None"""
+        path = self._path(source, stock_code)
+        if not os.path.exists(path):
+            return None
+
+        if source == 'twse':
+            df = pd.read_csv(path, dtype=str, encoding='utf-8')
+        else:
+            df = pd.read_csv(path, dtype={'股票代碼': str}, encoding='utf-8')
+            df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], utc=True).dt.tz_convert('Asia/Taipei')
+
+        if start is not None or end is not None:
+            dates = bar_dates(source, df[DATE_COLUMN])
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= dates >= start
+            if end is not None:
+                mask &= dates <= end
+            df = df[mask.values].reset_index(drop=True)
+        return df
+
+    def append(self, source, stock_code, df, checked=None, fetched_from=None):
+        """
+        將新抓到的資料附加到快取,只寫入比快取最後日期更新的列
+        checked: 已確認抓取到的日期 (無新資料的假日也會推進,避免重複補抓)
+        fetched_from: 本次下載的起始日 (區間開頭的非交易日也算已涵蓋)
+        回傳實際新增的列數
+        """
+        with self._lock:
+            checked = checked or datetime.now().date()
+            entry = self._entry(source, stock_code)
+            path = self._path(source, stock_code)
+            exists = entry is not None and os.path.exists(path)
+
+            new_rows = 0
+            if df is not None and not df.empty:
+                dates = bar_dates(source, df[DATE_COLUMN])
+                first_date = min(min(dates), fetched_from or min(dates))
+                if exists and first_date < date.fromisoformat(entry['first_date']):
+                    # 需要比快取更早的資料: 與舊快取合併後整檔重寫
+                    cached = self.load(source, stock_code)
+                    cached_dates = bar_dates(source, cached[DATE_COLUMN])
+                    older = (dates < min(cached_dates)).values
+                    newer = (dates > max(cached_dates)).values
+                    merged = pd.concat([df[older], cached, df[newer]], ignore_index=True)
+                    with open(path, 'w', encoding='utf-8', newline='') as f:
+                        f.write(merged.to_csv(index=False))
+
+                    fresh = df[older | newer]
+                    new_rows = len(fresh)
+                    entry = {
+                        'first_date': first_date.isoformat(),
+                        'last_date': max(max(dates), max(cached_dates)).isoformat(),
+                    }
+                else:
+                    if exists:
+                        keep = (dates > date.fromisoformat(entry['last_date'])).values
+                        df, dates = df[keep], dates[keep]
+                        # 欄位順序對齊既有檔案表頭
+                        df = df.reindex(columns=pd.read_csv(path, nrows=0, encoding='utf-8').columns)
+
+                    fresh = df
+                    new_rows = len(df)
+                    if new_rows:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, 'a' if exists else 'w', encoding='utf-8', newline='') as f:
+                            f.write(df.to_csv(index=False, header=not exists))
+
+                        entry = entry if exists else {'first_date': first_date.isoformat()}
+                        entry['last_date'] = max(dates).isoformat()
+
+                self.stats['rows_downloaded'] += new_rows
+                self.stats['bytes_downloaded'] += len(fresh.to_csv(index=False, header=False).encode('utf-8'))
+
+            if entry is not None and 'last_date' in entry:
+                entry['checked'] = max(checked, date.fromisoformat(entry['last_date'])).isoformat()
+                self.index.setdefault(source, {})[stock_code] = entry
+                self._save_index()
+
+            return new_rows
+
+    def report(self):
+        """快取統計文字"""
+        s = self.stats
+        lookups = s['hits'] + s['partial'] + s['misses']
+        hit_rate = (s['hits'] + s['partial']) / lookups * 100 if lookups else 0.0
+        return (f"快取命中: {s['hits']} | 補抓尾端: {s['partial']} | 未命中: {s['misses']} "
+                f"| 命中率: {hit_rate:.1f}%\n"
+                f"新下載: {s['rows_downloaded']} 筆 / {s['bytes_downloaded'] / 1024:.1f} KB")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API server 壓力測試
+
+以目前的 sector_flow_data.json 與 out/*.json (複製到暫存目錄) 啟動 api_server 子程序,
+用 aiohttp 用戶端以固定並行數對各端點送出請求,回報每秒請求數與延遲;
+最後一個情境在壓測期間持續改寫輸出檔,確認快照替換時沒有失敗的請求。
+
+用法:
+  python benchmarks/bench_api_server.py [--requests 5000] [--concurrency 64] [--port 8799]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def wait_ready(url, timeout=15):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(url) as resp:
+                    if resp.status == 200:
+                        return await resp.json()
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"API server 未在 {timeout}s 內啟動")
+
+
+async def load(url, total, concurrency, headers=None):
+    """送出 total 個請求,回傳 (耗時, 各狀態碼次數, 延遲列表, 平均回應位元組)"""
+    statuses, latencies, sizes = {}, [], []
+    remaining = iter(range(total))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+        async def worker():
+            for _ in remaining:
+                t0 = time.perf_counter()
+                try:
+                    async with session.get(url, headers=headers) as resp:
+                        body = await resp.read()
+                        statuses[resp.status] = statuses.get(resp.status, 0) + 1
+                        sizes.append(len(body))
+                except aiohttp.ClientError:
+                    statuses['error'] = statuses.get('error', 0) + 1
+                latencies.append(time.perf_counter() - t0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, statuses, sorted(latencies), sum(sizes) / max(len(sizes), 1)
+
+
+def touch_outputs(data_file, stop_at):
+    """壓測期間每 0.2 秒改寫一次追蹤器輸出 (模擬每輪完成),回傳改寫次數"""
+    with open(data_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    n = 0
+    while time.perf_counter() < stop_at:
+        n += 1
+        data['update_time'] = f"bench-{n}"
+        tmp = data_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, data_file)
+        time.sleep(0.2)
+    return n
+
+
+async def run(args, base, data_file):
+    health = await wait_ready(f"{base}/api/health")
+    print(f"📦 快照 {health['version']}: {health['counts']}")
+
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        async with session.get(f"{base}/api/sectors") as resp:
+            etag = resp.headers['ETag']
+
+    scenarios = [
+        ("sectors (identity)", "/api/sectors", {'Accept-Encoding': 'identity'}),
+        ("sectors (gzip)", "/api/sectors", {'Accept-Encoding': 'gzip'}),
+        ("sectors If-None-Match", "/api/sectors", {'If-None-Match': etag}),
+        ("sectors?ticker=XLK,SMH", "/api/sectors?ticker=XLK,SMH", None),
+        ("themes (gzip)", "/api/themes", {'Accept-Encoding': 'gzip'}),
+        ("stocks/2330", "/api/stocks/2330", None),
+    ]
+    print(f"\n{'情境':<24}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'平均 bytes':>12}  狀態碼")
+    for name, path, headers in scenarios:
+        elapsed, statuses, lat, size = await load(base + path, args.requests, args.concurrency, headers)
+        print(f"{name:<24}{args.requests / elapsed:>10.0f}{lat[len(lat) // 2] * 1000:>9.2f}"
+              f"{lat[int(len(lat) * 0.99)] * 1000:>9.2f}{size:>12.0f}  {statuses}")
+
+    # 壓測期間持續改寫輸出檔,伺服器在背景重新載入並替換快照
+    loop = asyncio.get_running_loop()
+    writer = loop.run_in_executor(None, touch_outputs, data_file, time.perf_counter() + 3)
+    elapsed, statuses, lat, size = await load(f"{base}/api/sectors", args.requests * 2, args.concurrency,
+                                              {'Accept-Encoding': 'gzip'})
+    rewrites = await writer
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base}/api/health") as resp:
+            health = await resp.json()
+    print(f"{'sectors + 快照替換':<24}{args.requests * 2 / elapsed:>10.0f}{lat[len(lat) // 2] * 1000:>9.2f}"
+          f"{lat[int(len(lat) * 0.99)] * 1000:>9.2f}{size:>12.0f}  {statuses}")
+    print(f"   改寫輸出檔 {rewrites} 次,目前快照 {health['version']} (update_time={health['update_time']})")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="API server 壓力測試")
+    p.add_argument("--requests", type=int, default=5000, help="每個情境的請求數")
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--port", type=int, default=8799)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "sector_flow_data.json")
+        shutil.copy(ROOT / "sector_flow_data.json", data_file)
+        shutil.copytree(ROOT / "out", os.path.join(tmp, "out"))
+
+        # 對照: 每個請求都重新解析一次完整的縮排 JSON
+        t0 = time.perf_counter()
+        for _ in range(100):
+            with open(data_file, 'r', encoding='utf-8') as f:
+                json.load(f)
+        print(f"📄 重新解析 sector_flow_data.json: {(time.perf_counter() - t0) * 10:.2f} ms/次 "
+              f"({os.path.getsize(data_file)} bytes)")
+
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT / "api_server.py"), "--port", str(args.port),
+             "--data", data_file, "--outdir", os.path.join(tmp, "out"), "--watch", "0.1"],
+            stdout=subprocess.DEVNULL, cwd=tmp)
+        try:
+            asyncio.run(run(args, f"http://127.0.0.1:{args.port}", data_file))
+        finally:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+產業股價 CSV vs 欄式 (memory-map) 讀取基準測試
+
+產生與 fetch_category_stocks 輸出相同格式的合成 CSV (UTF-8-SIG、中文欄位)，
+轉換為 columnar_store 目錄後比較：
+  csv        pd.read_csv + 日期解析
+  mmap       read_columnar (memory-map，只讀取需要的欄位)
+  frame      read_frame (還原成與 CSV 相同欄位的 DataFrame)
+並計算每檔股票平均收盤價確認結果一致。
+
+用法:
+  python benchmarks/bench_columnar_read.py [--stocks 10] [--years 5] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from columnar_store import convert_csv, read_columnar, read_frame, read_meta  # noqa: E402
+
+
+def synthetic_category_csv(path, stocks, years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2024-12-31", periods=years * 250, tz="Asia/Taipei")
+    frames = []
+    for i in range(stocks):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        frames.append(pd.DataFrame({
+            "日期": dates, "開盤價": close, "最高價": close * 1.01, "最低價": close * 0.99,
+            "收盤價": close, "成交量": rng.integers(1e5, 1e7, len(dates)),
+            "股息": 0.0, "股票分割": 0.0, "股票代碼": str(2300 + i),
+            "股票名稱": f"股票{i}", "產業分類": "半導體",
+        }))
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def timed(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="CSV vs 欄式讀取基準測試")
+    p.add_argument("--stocks", type=int, default=10)
+    p.add_argument("--years", type=int, default=5)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "半導體_stocks_20241231.csv")
+        synthetic_category_csv(csv_path, args.stocks, args.years)
+        path = convert_csv(csv_path, tmp)
+
+        def from_csv():
+            df = pd.read_csv(csv_path, dtype={"股票代碼": str}, encoding="utf-8-sig")
+            df["日期"] = pd.to_datetime(df["日期"], utc=True)
+            return df.groupby("股票代碼")["收盤價"].mean()
+
+        def from_mmap():
+            cols = read_columnar(path, ["股票代碼", "收盤價"])
+            codes, close = cols["股票代碼"], cols["收盤價"]
+            meta = {c["name"]: c for c in read_meta(path)["columns"]}
+            n = len(meta["股票代碼"]["categories"])
+            return np.bincount(codes, weights=close, minlength=n) / np.bincount(codes, minlength=n)
+
+        def from_frame():
+            return read_frame(path).groupby("股票代碼", observed=True)["收盤價"].mean()
+
+        csv_t, csv_mean = timed(from_csv, args.repeat)
+        mmap_t, mmap_mean = timed(from_mmap, args.repeat)
+        frame_t, _ = timed(from_frame, args.repeat)
+
+        csv_size = os.path.getsize(csv_path)
+        col_size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        rows = read_meta(path)["rows"]
+
+    print(f"{args.stocks} 檔 x {args.years} 年 = {rows} 筆 | CSV {csv_size / 1024:.0f} KB | 欄式 {col_size / 1024:.0f} KB")
+    print(f"{'mode':8s} {'read(ms)':>10s} {'speedup':>8s}")
+    for mode, t in (("csv", csv_t), ("mmap", mmap_t), ("frame", frame_t)):
+        print(f"{mode:8s} {t * 1000:10.2f} {csv_t / t:7.1f}x")
+    same = np.allclose(csv_mean.to_numpy(), mmap_mean, rtol=1e-5)
+    print(f"平均收盤價一致 (float32 精度): {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板塊資金流向歷史: CSV 整檔重寫 vs history_store 日期分區 基準測試
+
+以合成的追蹤器輸出 (每輪 N 個板塊,含 flow_z / flow_momentum) 模擬 --days 天、每天 --cycles 輪:
+  csv       舊做法: 每輪讀取全部 CSV -> 合併 -> 整檔重寫
+  store     HistoryStore.append: 只重寫當日分區
+並比較讀回最近 5 天的耗時、磁碟大小,以及讀回內容與寫入內容是否一致 (含舊版 CSV 匯入)。
+
+用法:
+  python benchmarks/bench_history_store.py [--days 60] [--cycles 4] [--sectors 16]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import COLUMNS, HistoryStore  # noqa: E402
+
+
+def synthetic_cycle(rng, sectors):
+    return [{
+        'us_sector': f"板塊{i}", 'us_ticker': f"T{i:02d}", 'sector_type': '核心板塊',
+        'us_change': round(float(rng.normal(0, 1.5)), 2),
+        'flow_strength': round(float(rng.normal(0, 2)), 2),
+        'volume_ratio': round(float(rng.uniform(0.5, 2)), 2),
+        'current_price': round(float(rng.uniform(20, 500)), 2), 'prev_close': None,
+        'flow_z': round(float(rng.normal()), 4), 'flow_momentum': round(float(rng.normal()), 4),
+        'tw_sectors': ['半導體', 'IC設計'], 'tw_stocks': ['2330 台積電', '2454 聯發科', '3034 聯詠'],
+        'related_themes': [], 'signal': '📈 資金流入', 'strength_level': int(rng.integers(1, 6)),
+        'industry_detail': None, 'last_update': '2026-01-01 05:00', 'market_status': '已收盤',
+    } for i in range(sectors)]
+
+
+def csv_append(path, records, day, time_str):
+    """舊版 save_to_history: 讀取全部 -> 合併 -> 整檔重寫"""
+    df = pd.DataFrame(records).assign(date=day, time=time_str)
+    if os.path.exists(path):
+        df = pd.concat([pd.read_csv(path, encoding='utf-8-sig'), df], ignore_index=True)
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="歷史資料寫入/讀取基準測試")
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--cycles", type=int, default=4, help="每天幾輪")
+    p.add_argument("--sectors", type=int, default=16)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(0)
+    first = date(2026, 1, 1)
+    plan = [((first + timedelta(days=d)).isoformat(), f"{8 + c:02d}:00:00", synthetic_cycle(rng, args.sectors))
+            for d in range(args.days) for c in range(args.cycles)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'sector_flow_history.csv')
+        store = HistoryStore(os.path.join(tmp, 'history'))
+
+        timings = {'csv': [], 'store': []}
+        for day, time_str, records in plan:
+            t0 = time.perf_counter()
+            csv_append(csv_path, records, day, time_str)
+            timings['csv'].append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            store.append(records, day, time_str)
+            timings['store'].append(time.perf_counter() - t0)
+
+        start = (first + timedelta(days=args.days - 5)).isoformat()
+        t0 = time.perf_counter()
+        recent_csv = pd.read_csv(csv_path, encoding='utf-8-sig')
+        recent_csv = recent_csv[recent_csv['date'] >= start]
+        csv_read = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        recent = store.load(start)
+        store_read = time.perf_counter() - t0
+
+        print(f"📊 {len(plan)} 輪 x {args.sectors} 個板塊 ({args.days} 天)")
+        print(f"{'':8s}{'最後一輪寫入 ms':>16s}{'總寫入 s':>10s}{'讀取最近 5 天 ms':>18s}{'大小 KB':>10s}")
+        print(f"{'csv':8s}{timings['csv'][-1] * 1000:>16.2f}{sum(timings['csv']):>10.2f}"
+              f"{csv_read * 1000:>18.2f}{os.path.getsize(csv_path) / 1024:>10.1f}")
+        print(f"{'store':8s}{timings['store'][-1] * 1000:>16.2f}{sum(timings['store']):>10.2f}"
+              f"{store_read * 1000:>18.2f}{dir_size(store.root) / 1024:>10.1f}")
+
+        # 讀回內容與寫入內容一致 (含 flow_z / flow_momentum 與清單欄位)
+        everything = store.load()
+        expected = [dict(r, date=d, time=t) for d, t, records in plan for r in records]
+        assert len(everything) == len(expected)
+        assert list(everything.columns) == COLUMNS
+        for col in ('flow_z', 'flow_momentum', 'us_change', 'strength_level'):
+            assert np.allclose(everything[col].astype(float), [r[col] for r in expected]), col
+        assert everything['tw_stocks'].tolist() == [r['tw_stocks'] for r in expected]
+        assert everything['prev_close'].isna().all() and everything['industry_detail'].isna().all()
+        assert len(recent) == len(recent_csv)
+
+        # 舊版 CSV 匯入後與 CSV 內容一致
+        migrated = HistoryStore(os.path.join(tmp, 'migrated'))
+        assert migrated.migrate_csv(csv_path) == len(expected)
+        assert np.allclose(migrated.load()['flow_z'], everything['flow_z'])
+        print("✅ 讀回內容一致 (含 flow_z / flow_momentum、清單欄位、CSV 匯入)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盤中分K 增量接收基準測試
+
+以 ReplayBarSource 重播一個完整交易日 (09:30 ~ 16:00) 的合成分K，
+每 --interval 分鐘輪詢一次，比較：
+  full    每輪重新抓取當日全部分K (舊版 period='1d', interval='1m')
+  stream  IntradayStream 只抓最後一根之後的 K 線
+每輪的傳輸量 (K 線序列化後的位元組數) 與延遲 (本地處理時間 + 以 RTT/頻寬估算的傳輸時間)。
+
+用法:
+  python benchmarks/bench_intraday_stream.py [--tickers 16] [--interval 5] [--rtt 80] [--bandwidth 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intraday_stream import SESSION_MINUTES, IntradayStream, ReplayBarSource  # noqa: E402
+
+
+def synthetic_session(n_tickers: int, day: str = "2024-06-03", seed: int = 0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(f"{day} 09:30", tz="America/New_York")
+    index = pd.date_range(start, periods=SESSION_MINUTES, freq="min")
+    frames, prev_closes = {}, {}
+    for i in range(n_tickers):
+        t = f"T{i:03d}"
+        prev_closes[t] = 100.0 + i
+        frames[t] = pd.DataFrame({
+            "Close": prev_closes[t] + rng.normal(0, 0.05, SESSION_MINUTES).cumsum(),
+            "Volume": rng.integers(1_000, 100_000, SESSION_MINUTES).astype(float),
+        }, index=index)
+    return frames, prev_closes, index
+
+
+def run(mode: str, frames, prev_closes, index, interval: int, rtt: float, bandwidth: float):
+    tickers = sorted(frames)
+    source = ReplayBarSource(frames, prev_closes, clock=index[0])
+    stream = IntradayStream(source)
+    cycles = []
+    last = {}
+    for clock in index[interval - 1::interval]:
+        source.advance(clock)
+        before = dict(source.stats)
+        t0 = time.perf_counter()
+        if mode == "full":
+            for t in tickers:
+                bars, _ = source.fetch(t)
+                last[t] = (float(bars["Close"].iloc[-1]), len(bars))
+        else:
+            for t, data in stream.poll(tickers):
+                last[t] = (data["current_price"], len(data["hist"]))
+        cpu = time.perf_counter() - t0
+        sent = source.stats["bytes"] - before["bytes"]
+        requests = source.stats["requests"] - before["requests"]
+        # 估算延遲: 每個請求一個 RTT (依序) + 傳輸時間
+        latency = cpu + requests * rtt / 1000 + sent / (bandwidth * 1024)
+        cycles.append((sent, source.stats["rows"] - before["rows"], latency))
+    return np.array(cycles), last
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="盤中分K 增量接收基準測試")
+    p.add_argument("--tickers", type=int, default=16, help="ETF 數量")
+    p.add_argument("--interval", type=int, default=5, help="輪詢間隔 (分鐘)")
+    p.add_argument("--rtt", type=float, default=80, help="每個請求的往返延遲 (ms)")
+    p.add_argument("--bandwidth", type=float, default=2000, help="頻寬 (KB/s)")
+    args = p.parse_args()
+
+    frames, prev_closes, index = synthetic_session(args.tickers)
+    full, full_last = run("full", frames, prev_closes, index, args.interval, args.rtt, args.bandwidth)
+    stream, stream_last = run("stream", frames, prev_closes, index, args.interval, args.rtt, args.bandwidth)
+
+    print(f"tickers: {args.tickers} | 每 {args.interval} 分鐘輪詢 | 共 {len(full)} 輪 | "
+          f"RTT {args.rtt:.0f} ms | {args.bandwidth:.0f} KB/s")
+    print(f"{'mode':8s} {'KB/cycle':>10s} {'KB total':>10s} {'rows/cycle':>11s} "
+          f"{'ms/cycle':>10s} {'ms last':>9s}")
+    for mode, c in (("full", full), ("stream", stream)):
+        print(f"{mode:8s} {c[:, 0].mean() / 1024:10.1f} {c[:, 0].sum() / 1024:10.1f} "
+              f"{c[:, 1].mean():11.0f} {c[:, 2].mean() * 1000:10.1f} {c[-1, 2] * 1000:9.1f}")
+
+    same = all(full_last[t] == stream_last[t] for t in frames)
+    print(f"最終現價/K 線數一致: {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
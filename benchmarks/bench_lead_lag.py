@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+領先落後相關性引擎基準測試
+
+以合成的美股 ETF / 台股個股日線 (台股族群對前一日美股報酬有已知的敏感度)
+測量 lead_lag 的耗時，並與逐組合的 pandas rolling().corr() 迴圈比對結果，
+最後檢查 learned 對應權重是否找回植入的對應關係。
+
+用法:
+  python benchmarks/bench_lead_lag.py [--years 10] [--etfs 20] [--themes 19] [--stocks 187]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lead_lag import (align_us, daily_returns, latest_table, lead_lag,  # noqa: E402
+                      learned_weights, theme_returns)
+
+
+def synthetic(years, n_etfs, n_themes, n_stocks, rng):
+    end = pd.Timestamp("2024-12-31")
+    us_dates = [d.date() for d in pd.bdate_range(end - pd.DateOffset(years=years), end)]
+    tw_dates = [d.date() for d in pd.bdate_range(end - pd.DateOffset(years=years), end + pd.Timedelta(days=1))
+                if d.dayofyear % 23]  # 台股另有不同的休市日
+    etfs = [f"E{i:02d}" for i in range(n_etfs)]
+    themes = [f"T{i:02d}" for i in range(n_themes)]
+    codes = [f"{1000 + i}" for i in range(n_stocks)]
+
+    us_ret = rng.normal(0, 0.012, (len(us_dates), n_etfs))
+    us_close = pd.DataFrame(100 * np.exp(np.cumsum(us_ret, axis=0)), index=us_dates, columns=etfs)
+
+    # 每個族群由一檔 ETF 隔夜報酬驅動 (beta 0.8)
+    driver = {theme: etfs[i % n_etfs] for i, theme in enumerate(themes)}
+    theme_to_codes = {theme: list(rng.choice(codes, max(3, n_stocks // n_themes), replace=False)) for theme in themes}
+    stock_theme = {}
+    for theme, members in theme_to_codes.items():
+        for c in members:
+            stock_theme.setdefault(c, theme)
+
+    x = align_us(us_dates, daily_returns(us_close.to_numpy()), tw_dates, lag=1)
+    tw_ret = rng.normal(0, 0.015, (len(tw_dates), n_stocks))
+    for j, c in enumerate(codes):
+        if c in stock_theme:
+            tw_ret[:, j] += 0.8 * np.nan_to_num(x[:, etfs.index(driver[stock_theme[c]])])
+    tw_close = pd.DataFrame(100 * np.exp(np.cumsum(tw_ret, axis=0)), index=tw_dates, columns=codes)
+    return {'close': us_close}, {'close': tw_close}, theme_to_codes, driver
+
+
+def pandas_loop(us_panel, tw_panel, theme_to_codes, window, lag):
+    """逐 (ETF, 族群) 組合以 pandas rolling().corr() 計算最新相關係數 (對照組)"""
+    tw_close = tw_panel['close']
+    stock_ret = daily_returns(tw_close.to_numpy())
+    theme_ret, themes = theme_returns(stock_ret, list(tw_close.columns), theme_to_codes)
+    x = align_us(list(us_panel['close'].index), daily_returns(us_panel['close'].to_numpy()),
+                 list(tw_close.index), lag)
+    out = {}
+    for u, ticker in enumerate(us_panel['close'].columns):
+        for k, theme in enumerate(themes):
+            pair = pd.DataFrame({'x': x[:, u], 'y': theme_ret[:, k]})
+            corr = pair['x'].rolling(window, min_periods=int(window * 0.8)).corr(pair['y'])
+            out[(ticker, theme)] = corr.iloc[-1]
+    return out
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="領先落後相關性引擎基準測試")
+    p.add_argument("--years", type=int, default=10)
+    p.add_argument("--etfs", type=int, default=20)
+    p.add_argument("--themes", type=int, default=19)
+    p.add_argument("--stocks", type=int, default=187)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(0)
+    us_panel, tw_panel, theme_to_codes, driver = synthetic(args.years, args.etfs, args.themes, args.stocks, rng)
+    windows = (20, 60, 120, 250)
+
+    t0 = time.perf_counter()
+    result = lead_lag(us_panel, tw_panel, theme_to_codes, windows)
+    table = latest_table(result)
+    vec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ref = pandas_loop(us_panel, tw_panel, theme_to_codes, 60, 1)
+    loop = time.perf_counter() - t0
+
+    rows = table[(table['lag'] == 1) & (table['window'] == 60)].set_index(['us_ticker', 'tw_theme'])['corr']
+    diff = max(abs(rows[key] - value) for key, value in ref.items() if np.isfinite(value))
+
+    weights = learned_weights(table, lag=1, min_corr=0.3)
+    found = sum(1 for theme, etf in driver.items() if theme in weights.get(etf, {}))
+    extra = sum(len(v) for v in weights.values()) - found
+
+    pairs = len(result['tickers']) * len(result['themes'])
+    print(f"ETF: {args.etfs} | 族群: {args.themes} | 個股: {args.stocks} | 台股交易日: {len(result['dates'])}")
+    print(f"vectorized: {len(windows)} 視窗 x 2 lag 全部日期 {vec:.3f}s")
+    print(f"pandas 迴圈: 1 視窗 x 1 lag x {pairs} 組合 {loop:.3f}s "
+          f"(全部約 {loop * len(windows) * 2:.1f}s)")
+    print(f"最新相關係數最大差異: {diff:.2e}")
+    print(f"learned 對應: 找回 {found}/{len(driver)} 組植入關係 | 其他 {extra} 組")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SectorFlowTracker.fetch_realtime_data 基準測試
+
+以本地 stub 取代 yfinance.Ticker（history 與 info 各有固定延遲，info 較慢），
+比較舊版「K 線 + stock.info」與新版「只讀 K 線 (每輪不抓基本資料)」
+每輪抓取的請求次數與耗時 (新版分別量測第一輪與之後各輪；之後已知昨收，
+只抓最新幾根分K)。
+
+用法:
+  python benchmarks/bench_realtime_quotes.py [--history-latency 0.05] [--info-latency 0.4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sector_flow_tracker  # noqa: E402
+from sector_flow_tracker import US_SECTOR_ETFS, US_THEME_ETFS, SectorFlowTracker  # noqa: E402
+
+
+class StubTickerSource:
+    """模擬 yf.Ticker，依端點記錄請求次數"""
+
+    def __init__(self, history_latency=0.05, info_latency=0.4):
+        self.history_latency = history_latency
+        self.info_latency = info_latency
+        self.requests = Counter()
+
+    def reset(self):
+        self.requests = Counter()
+
+    def Ticker(self, t):
+        return _StubTicker(self, t)
+
+
+class _StubTicker:
+    def __init__(self, source, t):
+        self.source = source
+        self.t = t
+        self.history_metadata = None
+        seed = sum(map(ord, t))
+        self.rng = np.random.default_rng(seed)
+        self.prev_close = 100 + seed % 50
+
+    def history(self, period=None, interval='1d', start=None, timeout=None):
+        self.source.requests['history'] += 1
+        time.sleep(self.source.history_latency)
+        n = 390 if interval == '1m' else 5
+        close = self.prev_close + self.rng.normal(0, 0.2, n).cumsum()
+        volume = self.rng.integers(1_000, 50_000, n)
+        self.history_metadata = {'regularMarketPrice': float(close[-1]),
+                                 'chartPreviousClose': float(self.prev_close)}
+        if interval == '1d':
+            close[-2] = self.prev_close
+        end = pd.Timestamp.now(tz='America/New_York').normalize() + pd.Timedelta(hours=15, minutes=59)
+        index = pd.date_range(end=end, periods=n, freq='min' if interval == '1m' else 'D')
+        df = pd.DataFrame({'Close': close, 'Volume': volume}, index=index)
+        # start= 表示只抓最近幾根分K
+        return df.tail(5) if start is not None else df
+
+    @property
+    def info(self):
+        self.source.requests['info'] += 1
+        time.sleep(self.source.info_latency)
+        return {'currentPrice': None, 'previousClose': self.prev_close,
+                'shortName': self.t, 'quoteType': 'ETF', 'category': 'stub'}
+
+
+def legacy_fetch_realtime_data(tracker, ticker):
+    """舊版 fetch_realtime_data: K 線之外每檔再呼叫一次 stock.info"""
+    stock = sector_flow_tracker.yf.Ticker(ticker)
+    hist = stock.history(period='1d', interval='1m')
+    if len(hist) == 0:
+        hist = stock.history(period='5d', interval='1d')
+    info = stock.info
+    current_price = info.get('currentPrice') or info.get('regularMarketPrice')
+    prev_close = info.get('previousClose') or info.get('regularMarketPreviousClose')
+    if current_price is None and len(hist) > 0:
+        current_price = hist['Close'].iloc[-1]
+    if prev_close is None and len(hist) >= 2:
+        prev_close = hist['Close'].iloc[-2]
+    return {'hist': hist, 'current_price': current_price, 'prev_close': prev_close, 'info': info}
+
+
+def cycle(tracker, stub, tickers):
+    stub.reset()
+    t0 = time.perf_counter()
+    results = tracker._fetch_concurrently(tickers)
+    return dict(stub.requests), time.perf_counter() - t0, results
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="fetch_realtime_data 基準測試")
+    p.add_argument("--history-latency", type=float, default=0.05, help="history 請求模擬延遲 (秒)")
+    p.add_argument("--info-latency", type=float, default=0.4, help="info 請求模擬延遲 (秒)")
+    p.add_argument("--workers", type=int, default=8, help="並行執行緒數")
+    args = p.parse_args()
+
+    stub = StubTickerSource(args.history_latency, args.info_latency)
+    sector_flow_tracker.yf = stub
+    tickers = list({**US_SECTOR_ETFS, **US_THEME_ETFS})
+
+    tracker = SectorFlowTracker(max_workers=args.workers, volume_profile_dir=None, metrics_file=None)
+
+    rows = []
+    tracker.fetch_realtime_data = lambda t, metrics=None: legacy_fetch_realtime_data(tracker, t)
+    rows.append(('legacy',) + cycle(tracker, stub, tickers))
+    del tracker.fetch_realtime_data
+    rows.append(('bars/cold',) + cycle(tracker, stub, tickers))
+    rows.append(('bars/warm',) + cycle(tracker, stub, tickers))
+    tracker.close()
+
+    print(f"tickers: {len(tickers)} | workers: {args.workers} | "
+          f"history: {args.history_latency * 1000:.0f} ms | info: {args.info_latency * 1000:.0f} ms")
+    print(f"{'mode':10s} {'history':>8s} {'info':>6s} {'wall(s)':>9s}")
+    for mode, requests, elapsed, _ in rows:
+        print(f"{mode:10s} {requests.get('history', 0):8d} {requests.get('info', 0):6d} {elapsed:9.3f}")
+
+    legacy, warm = rows[0][3], rows[2][3]
+    same = all(
+        abs(legacy[t]['prev_close'] - warm[t]['prev_close']) < 1e-9
+        and abs(legacy[t]['current_price'] - warm[t]['current_price']) < 1e-9
+        for t in tickers
+    )
+    print(f"現價/昨收一致: {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
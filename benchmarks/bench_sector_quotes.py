@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fetch_sector_quotes 批次 vs 逐檔 基準測試
+
+以本地 stub 報價來源取代 yfinance（每次請求固定延遲），
+比較兩種模式的請求次數與耗時。
+
+用法:
+  python benchmarks/bench_sector_quotes.py [--latency 0.05] [--missing XLRE,XLU]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sector_heatmap  # noqa: E402
+from sector_heatmap import read_csv  # noqa: E402
+
+
+class StubQuoteSource:
+    """模擬 yfinance 的 download / Ticker 介面，並記錄請求次數"""
+
+    def __init__(self, tickers, latency=0.05, missing=()):
+        self.latency = latency
+        self.missing = set(missing)
+        self.requests = 0
+        rng = np.random.default_rng(0)
+        idx = pd.date_range(end=pd.Timestamp.today().normalize(), periods=5, freq="B")
+        self.frames = {
+            t: pd.DataFrame({"Close": 100 + rng.normal(0, 1, len(idx)).cumsum()}, index=idx)
+            for t in tickers
+        }
+
+    def _hit(self):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def download(self, tickers, **kwargs):
+        self._hit()
+        found = {t: self.frames[t] for t in tickers if t in self.frames and t not in self.missing}
+        if not found:
+            return pd.DataFrame()
+        return pd.concat(found, axis=1)
+
+    def Ticker(self, t):
+        return _StubTicker(self, t)
+
+
+class _StubTicker:
+    def __init__(self, source, t):
+        self.source = source
+        self.t = t
+
+    @property
+    def fast_info(self):
+        # fast_info 只回傳空資料，迫使走 history 備援（與線上最差情況一致）
+        self.source._hit()
+        return {}
+
+    def history(self, **kwargs):
+        self.source._hit()
+        return self.source.frames.get(self.t, pd.DataFrame())
+
+
+def run(batch: bool, tickers, latency, missing):
+    stub = StubQuoteSource(tickers, latency=latency, missing=missing)
+    sector_heatmap.yf = stub
+    t0 = time.perf_counter()
+    quotes = sector_heatmap.fetch_sector_quotes(tickers, batch=batch)
+    elapsed = time.perf_counter() - t0
+    return stub.requests, elapsed, quotes
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="fetch_sector_quotes 基準測試")
+    p.add_argument("--us2tw", default="mappings/us_sector_to_tw_theme.csv")
+    p.add_argument("--latency", type=float, default=0.05, help="每次請求模擬延遲 (秒)")
+    p.add_argument("--missing", default="", help="批次下載中缺漏的 ticker，逗號分隔")
+    args = p.parse_args()
+
+    rows = read_csv(Path(args.us2tw))
+    tickers = sorted({(r.get("us_sector_ticker") or "").strip().upper() for r in rows} - {""})
+    missing = [t for t in args.missing.split(",") if t]
+
+    sector_heatmap.logger.disabled = True
+    legacy_req, legacy_time, legacy_quotes = run(False, tickers, args.latency, missing)
+    batch_req, batch_time, batch_quotes = run(True, tickers, args.latency, missing)
+
+    same = all(legacy_quotes[t].change_pct == batch_quotes[t].change_pct for t in tickers)
+    print(f"tickers: {len(tickers)} | latency: {args.latency * 1000:.0f} ms | 缺漏: {missing or '無'}")
+    print(f"{'mode':8s} {'requests':>9s} {'wall(s)':>9s}")
+    print(f"{'legacy':8s} {legacy_req:9d} {legacy_time:9.3f}")
+    print(f"{'batch':8s} {batch_req:9d} {batch_time:9.3f}")
+    print(f"結果一致: {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
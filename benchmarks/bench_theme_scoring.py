@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+族群熱度計分基準測試
+
+以合成的 美股板塊 -> 台股族群 對應 (規模逐步放大)，比較舊版 Python 雙迴圈
+(max change_pct) 與 ThemeWeightMatrix + score_themes 的向量化計算耗時，
+並檢查兩者 max 結果一致。
+
+用法:
+  python benchmarks/bench_theme_scoring.py [--sizes 100,1000,10000] [--fanout 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sector_heatmap import AGGREGATORS, ThemeWeightMatrix, score_themes  # noqa: E402
+
+
+def synthetic_mapping(n_sectors: int, n_themes: int, fanout: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    sectors = [f"S{i:05d}" for i in range(n_sectors)]
+    themes = [f"T{j:05d}" for j in range(n_themes)]
+    us_to_tw: Dict[str, List[str]] = {
+        t: [themes[j] for j in rng.choice(n_themes, size=min(fanout, n_themes), replace=False)]
+        for t in sectors
+    }
+    change = dict(zip(sectors, rng.normal(0, 2, n_sectors).round(4)))
+    volume = dict(zip(sectors, rng.integers(1_000, 1_000_000, n_sectors).astype(float)))
+    return sectors, us_to_tw, change, volume
+
+
+def loop_max(sectors, us_to_tw, change) -> Dict[str, float]:
+    """舊版 sector_heatmap 第 5 步的雙迴圈寫法"""
+    theme_score: Dict[str, float] = {}
+    for t in sectors:
+        for theme in us_to_tw.get(t, []):
+            theme_score[theme] = max(theme_score.get(theme, -1e9), float(change[t]))
+    return theme_score
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="族群熱度計分基準測試")
+    p.add_argument("--sizes", default="100,1000,10000,50000", help="板塊數 (族群數相同)，逗號分隔")
+    p.add_argument("--fanout", type=int, default=4, help="每個板塊對應的族群數")
+    args = p.parse_args()
+
+    header = f"{'sectors':>8s} {'nnz':>8s} {'loop(ms)':>10s} {'build(ms)':>10s}"
+    header += "".join(f" {name + '(ms)':>14s}" for name in AGGREGATORS)
+    print(header)
+
+    for n in (int(x) for x in args.sizes.split(",")):
+        sectors, us_to_tw, change, volume = synthetic_mapping(n, n, args.fanout)
+
+        loop_ms = timed(lambda: loop_max(sectors, us_to_tw, change)) * 1000
+        build_ms = timed(lambda: ThemeWeightMatrix.from_mapping(sectors, us_to_tw)) * 1000
+
+        m = ThemeWeightMatrix.from_mapping(sectors, us_to_tw)
+        x = np.array([change[t] for t in m.sectors])
+        v = np.array([volume[t] for t in m.sectors])
+
+        expected = loop_max(sectors, us_to_tw, change)
+        got = dict(zip(m.themes, score_themes(m, x, v, "max")))
+        assert all(abs(expected[k] - got[k]) < 1e-12 for k in expected), "max 結果不一致"
+
+        row = f"{n:8d} {len(m.cols):8d} {loop_ms:10.2f} {build_ms:10.2f}"
+        for name in AGGREGATORS:
+            row += f" {timed(lambda: score_themes(m, x, v, name)) * 1000:14.3f}"
+        print(row)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
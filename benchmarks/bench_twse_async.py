@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AsyncTWSEFetcher 基準測試
+
+在本機啟動一個模擬證交所 STOCK_DAY 的 HTTP 服務 (可設定延遲與限流頻率),
+以非同步抓取器抓取多檔股票一整年的資料,回報請求數/重試數與耗時。
+
+用法:
+  python benchmarks/bench_twse_async.py [--stocks 10] [--rate 20] [--throttle-every 7]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rate_limiter import TokenBucket  # noqa: E402
+from twse_async import AsyncTWSEFetcher, month_starts  # noqa: E402
+
+FIELDS = ["日期", "成交股數", "成交金額", "開盤價", "最高價", "最低價", "收盤價", "漲跌價差", "成交筆數"]
+
+
+def make_stock_day_app(latency, throttle_every):
+    """建立模擬 STOCK_DAY 端點,每 throttle_every 次請求回傳一次 HTTP 429"""
+    state = {'count': 0}
+
+    async def stock_day(request):
+        state['count'] += 1
+        await asyncio.sleep(latency)
+        if throttle_every and state['count'] % throttle_every == 0:
+            return web.Response(status=429, text="Too Many Requests")
+
+        month = datetime.strptime(request.query['date'], '%Y%m%d')
+        roc = month.year - 1911
+        rows = [
+            [f"{roc}/{month.month:02d}/{day:02d}", "1,000", "100,000",
+             "100.00", "101.00", "99.00", "100.50", "+0.50", "100"]
+            for day in range(1, 21)
+        ]
+        return web.json_response({'stat': 'OK', 'fields': FIELDS, 'data': rows})
+
+    app = web.Application()
+    app.router.add_get('/exchangeReport/STOCK_DAY', stock_day)
+    return app, state
+
+
+async def run(args):
+    app, state = make_stock_day_app(args.latency, args.throttle_every)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    codes = [str(2300 + i) for i in range(args.stocks)]
+    end_date = datetime.now().strftime('%Y%m%d')
+    start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
+
+    fetcher = AsyncTWSEFetcher(
+        base_url=f"http://127.0.0.1:{port}/exchangeReport/STOCK_DAY",
+        limiter=TokenBucket(args.rate, args.burst),
+        backoff=0.05,
+    )
+    t0 = time.perf_counter()
+    results = await fetcher.fetch_stocks_async(codes, start_date, end_date)
+    elapsed = time.perf_counter() - t0
+    await runner.cleanup()
+
+    pairs = len(codes) * len(month_starts(start_date, end_date))
+    print(f"股票: {len(codes)} | (股票, 月份) 組合: {pairs} | 限速: {args.rate}/s burst {args.burst}")
+    print(f"伺服器收到請求: {state['count']} | 抓取器統計: {fetcher.stats}")
+    print(f"取得資料股票數: {len(results)} | 耗時: {elapsed:.2f}s")
+    print(f"舊版逐月 sleep(3) 估計耗時: {pairs * 3:.0f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(description="AsyncTWSEFetcher 基準測試")
+    p.add_argument("--stocks", type=int, default=10)
+    p.add_argument("--rate", type=float, default=20.0, help="限速器每秒請求數")
+    p.add_argument("--burst", type=float, default=5.0)
+    p.add_argument("--latency", type=float, default=0.05, help="模擬伺服器延遲 (秒)")
+    p.add_argument("--throttle-every", type=int, default=7, help="每 N 次請求回傳 429 (0 表示不限流)")
+    asyncio.run(run(p.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
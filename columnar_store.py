@@ -0,0 +1,219 @@
+"""
+台股歷史股價二進位欄式儲存 (memory-map 讀取)
+取代每次分析都要重新解析 UTF-8-SIG CSV 的做法
+
+目錄結構 (一個表格一個目錄,一檔股票或一個產業):
+  {name}/meta.json   欄位名稱、型別、列數、類別欄位的對照表
+  {name}/00.npy      每個欄位一個 .npy (np.load(mmap_mode='r') 零複製讀取)
+  {name} 為指向版本目錄 .{name}.v{n} 的符號連結,重寫時以新版本目錄原子替換連結
+
+欄位型別:
+  日期            int64   epoch 秒 (UTC)
+  價格類欄位      float32
+  成交量/股數/金額 int64
+  文字欄位        int32   類別代碼,對照表存在 meta.json
+
+用法:
+  python columnar_store.py convert stock_data/*.csv [--outdir stock_data/columnar]
+  python columnar_store.py show stock_data/columnar/半導體_stocks_20240101
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+DATE_COLUMN = '日期'
+TIMEZONE = 'Asia/Taipei'
+
+INT_COLUMNS = {'成交量', '成交股數', '成交金額', '成交筆數'}
+TEXT_COLUMNS = {'股票代碼', '股票名稱', '產業分類'}
+
+
+def _to_number(values):
+    """證交所數字欄位為含千分位逗號的字串 ('--'、'X0.00' 等視為缺值或去除前綴)"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    text = values.astype(str).str.replace(',', '', regex=False).str.lstrip('X')
+    return pd.to_numeric(text, errors='coerce')
+
+
+def _epoch_seconds(values):
+    """日期欄位 -> epoch 秒;支援 Timestamp / ISO 字串 / 民國年 'YYY/MM/DD'"""
+    values = pd.Series(values)
+    sample = str(values.iloc[0]) if len(values) else ''
+    if '/' in sample and len(sample.split('/')[0]) <= 3:
+        def roc_to_date(text):
+            y, m, d = str(text).strip().split('/')
+            return date(int(y) + 1911, int(m), int(d))
+        stamps = pd.to_datetime(values.map(roc_to_date)).dt.tz_localize(TIMEZONE)
+    else:
+        stamps = pd.to_datetime(values, utc=True)
+    return stamps.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy('datetime64[s]').astype(np.int64)
+
+
+def _encode(name, values):
+    """單一欄位 -> (ndarray, meta)"""
+    if name == DATE_COLUMN:
+        return _epoch_seconds(values), {'kind': 'epoch_s'}
+
+    numbers = None if name in TEXT_COLUMNS else _to_number(values)
+    if numbers is None or (len(numbers) and numbers.isna().all()):
+        codes, categories = pd.factorize(values.astype(str), sort=True)
+        return codes.astype(np.int32), {'kind': 'category', 'categories': list(categories)}
+    if name in INT_COLUMNS:
+        return numbers.fillna(0).round().astype(np.int64).to_numpy(), {'kind': 'int'}
+    return numbers.astype(np.float32).to_numpy(), {'kind': 'float'}
+
+
+def _publish_dir(tmp, path):
+    """
+    以寫好的 tmp 目錄取代 path,讀取端任何時刻都看得到完整的舊版或新版:
+      tmp 換名為版本目錄,再以 os.replace 把 path 這個符號連結原子地指向新版本;
+      上一個版本保留到下次寫入 (正在讀取舊版本的讀取端不會讀到一半檔案被刪除),更早的版本刪除
+    不支援符號連結時 (或 path 仍是舊格式的一般目錄) 改為舊目錄先移開再換名,中間有極短的空窗
+    """
+    parent, name = os.path.split(path)
+    version = os.path.join(parent, f".{name}.v{time.time_ns()}")
+    os.replace(tmp, version)
+
+    old = None
+    if os.path.islink(path):
+        old = os.path.join(parent, os.readlink(path))
+    link = f"{path}.lnk"
+    try:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(version), link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        link = None
+
+    if link and (old is not None or not os.path.exists(path)):
+        os.replace(link, path)
+        keep = {os.path.basename(version), os.path.basename(old) if old else None}
+        for entry in os.listdir(parent or '.'):
+            if entry.startswith(f".{name}.v") and entry not in keep:
+                shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+    else:
+        # 舊格式的一般目錄無法直接以連結取代: 先移開 (只會發生一次)
+        aside = f"{path}.old"
+        shutil.rmtree(aside, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, aside)
+        os.replace(link or version, path)
+        shutil.rmtree(aside, ignore_errors=True)
+
+
+def write_columnar(df, path):
+    """
+    將 DataFrame 寫成欄式目錄 (先寫到暫存目錄再原子切換,讀取端不會看到寫一半或不存在的目錄)
+    回傳寫入的位元組數
+    """
+    path = path.rstrip('/')
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    size = 0
+    for i, name in enumerate(df.columns):
+        array, meta = _encode(name, df[name].reset_index(drop=True))
+        filename = f"{i:02d}.npy"
+        np.save(os.path.join(tmp, filename), np.ascontiguousarray(array))
+        size += os.path.getsize(os.path.join(tmp, filename))
+        columns.append({'name': name, 'file': filename, 'dtype': str(array.dtype), **meta})
+
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': FORMAT_VERSION, 'rows': len(df), 'columns': columns},
+                  f, ensure_ascii=False, indent=2)
+
+    _publish_dir(tmp, path)
+    return size
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_columnar(path, columns=None, mmap=True):
+    """
+    讀取欄式目錄,回傳 {欄位名稱: ndarray}
+    mmap=True 時為唯讀 memory-map,不複製資料;類別欄位回傳代碼 (對照表見 read_meta)
+    """
+    path = os.path.realpath(path)  # 固定讀取同一個版本目錄
+    meta = read_meta(path)
+    wanted = set(columns) if columns else None
+    return {
+        col['name']: np.load(os.path.join(path, col['file']), mmap_mode='r' if mmap else None)
+        for col in meta['columns']
+        if wanted is None or col['name'] in wanted
+    }
+
+
+def read_frame(path, columns=None):
+    """讀取為 DataFrame (日期還原為台北時間,類別欄位還原為文字),欄位與原本 CSV 相同"""
+    path = os.path.realpath(path)
+    meta = read_meta(path)
+    arrays = read_columnar(path, columns)
+    data = {}
+    for col in meta['columns']:
+        if col['name'] not in arrays:
+            continue
+        array = arrays[col['name']]
+        if col['kind'] == 'epoch_s':
+            data[col['name']] = pd.to_datetime(array, unit='s', utc=True).tz_convert(TIMEZONE)
+        elif col['kind'] == 'category':
+            data[col['name']] = pd.Categorical.from_codes(array, col['categories'])
+        else:
+            data[col['name']] = array
+    return pd.DataFrame(data)
+
+
+def convert_csv(csv_path, outdir='stock_data/columnar'):
+    """將 fetch_category_stocks 輸出的 CSV 轉成欄式目錄,回傳目錄路徑"""
+    df = pd.read_csv(csv_path, dtype={'股票代碼': str}, encoding='utf-8-sig')
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    path = os.path.join(outdir, name)
+    size = write_columnar(df, path)
+    print(f"✅ {csv_path} -> {path}/ ({os.path.getsize(csv_path) / 1024:.1f} KB -> {size / 1024:.1f} KB)")
+    return path
+
+
+def main():
+    p = argparse.ArgumentParser(description="台股歷史股價欄式儲存")
+    sub = p.add_subparsers(dest='command', required=True)
+    conv = sub.add_parser('convert', help="轉換既有 CSV")
+    conv.add_argument('csv', nargs='+', help="CSV 檔案 (可用萬用字元)")
+    conv.add_argument('--outdir', default='stock_data/columnar', help="輸出目錄")
+    show = sub.add_parser('show', help="顯示欄式目錄內容")
+    show.add_argument('path')
+    args = p.parse_args()
+
+    if args.command == 'convert':
+        paths = [path for pattern in args.csv for path in sorted(glob.glob(pattern))]
+        # 產業分類表不是股價資料
+        paths = [path for path in paths if '產業分類表' not in os.path.basename(path)]
+        if not paths:
+            raise SystemExit("❌ 找不到 CSV 檔案")
+        for path in paths:
+            convert_csv(path, args.outdir)
+        return 0
+
+    meta = read_meta(args.path)
+    print(f"📊 {meta['rows']} 筆")
+    for col in meta['columns']:
+        print(f"   {col['name']:8s} {col['dtype']:8s} {col['kind']}")
+    print(read_frame(args.path).head(10).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
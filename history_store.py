@@ -0,0 +1,290 @@
+"""
+板塊資金流向歷史資料庫 (依日期分區的欄式二進位檔)
+取代 sector_flow_history.csv 每輪「讀取全部 → 合併 → 整檔重寫」的做法
+
+目錄結構:
+  history/date=YYYY-MM-DD.npz   一天一個分區 (np.savez_compressed),同型別的欄位存成同一個矩陣:
+    schema        欄位清單 ('float:us_change', 'str:us_ticker', ...)
+    float         float64 (列數, 欄位數)   缺值為 NaN
+    int           int8    (列數, 欄位數)   strength_level,缺值為 0
+    str           unicode (列數, 欄位數)   缺值為空字串
+    list.values   unicode                  所有清單欄位的元素
+    list.offsets  int32   (列數 + 1, 欄位數) 第 j 個清單欄位第 i 筆為 list.values[offsets[i, j]:offsets[i + 1, j]]
+
+每次寫入只重寫當日分區 (與歷史長度無關),查詢時只讀取日期區間內的分區;
+分區以暫存檔寫入後換名,讀取端不會讀到寫一半的檔案;舊分區缺少的欄位讀回時視為缺值
+"""
+
+import argparse
+import ast
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# 欄位型別定義
+FLOAT_COLUMNS = ['us_change', 'flow_strength', 'volume_ratio', 'current_price', 'prev_close',
+                 'flow_z', 'flow_momentum']
+INT_COLUMNS = ['strength_level']
+LIST_COLUMNS = ['tw_sectors', 'tw_stocks', 'related_themes']
+STR_COLUMNS = ['us_sector', 'us_ticker', 'sector_type', 'signal', 'industry_detail',
+               'last_update', 'market_status', 'date', 'time']
+COLUMNS = STR_COLUMNS[:3] + FLOAT_COLUMNS + LIST_COLUMNS + STR_COLUMNS[3:] + INT_COLUMNS
+
+PARTITION_SUFFIX = '.npz'
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def normalize_record(record):
+    """依欄位定義轉換型別,缺值一律為 None"""
+    row = {}
+    for col in COLUMNS:
+        value = record.get(col)
+        if _is_missing(value) or value == '':
+            row[col] = [] if col in LIST_COLUMNS else None
+        elif col in FLOAT_COLUMNS:
+            row[col] = float(value)
+        elif col in INT_COLUMNS:
+            row[col] = int(value)
+        elif col in LIST_COLUMNS:
+            row[col] = ast.literal_eval(value) if isinstance(value, str) else list(value)
+        else:
+            row[col] = str(value)
+    return row
+
+
+def _encode(rows):
+    """正規化後的記錄 -> {陣列名稱: ndarray}"""
+    arrays = {}
+    for col in FLOAT_COLUMNS:
+        arrays[col] = np.array([np.nan if r[col] is None else r[col] for r in rows], dtype=np.float64)
+    for col in INT_COLUMNS:
+        arrays[col] = np.array([r[col] or 0 for r in rows], dtype=np.int8)
+    for col in STR_COLUMNS:
+        arrays[col] = np.array([r[col] or '' for r in rows], dtype=str)
+    for col in LIST_COLUMNS:
+        values = [str(v) for r in rows for v in r[col]]
+        arrays[f"{col}.values"] = np.array(values, dtype=str)
+        arrays[f"{col}.offsets"] = np.cumsum([0] + [len(r[col]) for r in rows], dtype=np.int32)
+    return arrays
+
+
+def _complete(arrays):
+    """補上舊分區沒有的欄位 (以缺值補齊列數)"""
+    n = len(next(a for name, a in arrays.items() if not name.endswith(('.values', '.offsets'))))
+    filled = dict(arrays)
+    for col in FLOAT_COLUMNS:
+        filled.setdefault(col, np.full(n, np.nan))
+    for col in INT_COLUMNS:
+        filled.setdefault(col, np.zeros(n, dtype=np.int8))
+    for col in STR_COLUMNS:
+        filled.setdefault(col, np.full(n, '', dtype=str))
+    for col in LIST_COLUMNS:
+        filled.setdefault(f"{col}.values", np.array([], dtype=str))
+        filled.setdefault(f"{col}.offsets", np.zeros(n + 1, dtype=np.int32))
+    return filled
+
+
+def _concat(parts):
+    """接起多個分區的陣列 (清單欄位的 offsets 需平移)"""
+    parts = [_complete(p) for p in parts]
+    merged = {}
+    for name in parts[0]:
+        if name.endswith('.offsets'):
+            arrays, shift = [np.zeros(1, dtype=np.int64)], 0
+            for p in parts:
+                arrays.append(p[name][1:].astype(np.int64) + shift)
+                shift += int(p[name][-1])
+            merged[name] = np.concatenate(arrays).astype(np.int32)
+        else:
+            merged[name] = np.concatenate([p[name] for p in parts])
+    return merged
+
+
+def _pack(arrays):
+    """{欄位陣列} -> 磁碟格式 (同型別的欄位合併成一個矩陣,減少每個分區的陣列數)"""
+    schema = ([f"float:{c}" for c in FLOAT_COLUMNS] + [f"int:{c}" for c in INT_COLUMNS]
+              + [f"str:{c}" for c in STR_COLUMNS] + [f"list:{c}" for c in LIST_COLUMNS])
+    values = [arrays[f"{c}.values"] for c in LIST_COLUMNS]
+    bases = np.cumsum([0] + [len(v) for v in values[:-1]])
+    return {
+        'schema': np.array(schema, dtype=str),
+        'float': np.stack([arrays[c] for c in FLOAT_COLUMNS], axis=1),
+        'int': np.stack([arrays[c] for c in INT_COLUMNS], axis=1),
+        'str': np.stack([arrays[c] for c in STR_COLUMNS], axis=1),
+        'list.values': np.concatenate(values),
+        'list.offsets': np.stack([arrays[f"{c}.offsets"] + base for c, base in zip(LIST_COLUMNS, bases)],
+                                 axis=1).astype(np.int32),
+    }
+
+
+def _unpack(packed):
+    """磁碟格式 -> {欄位陣列} (依 schema 還原,未知欄位略過,缺少的欄位由 _complete 補上)"""
+    arrays, position = {}, {}
+    for entry in packed['schema'].tolist():
+        kind, col = entry.split(':', 1)
+        position[kind] = position.get(kind, -1) + 1
+        j = position[kind]
+        if kind == 'list':
+            offsets = packed['list.offsets'][:, j]
+            arrays[f"{col}.values"] = packed['list.values'][offsets[0]:offsets[-1]]
+            arrays[f"{col}.offsets"] = offsets - offsets[0]
+        else:
+            arrays[col] = packed[kind][:, j]
+    return _complete(arrays)
+
+
+def _frame(arrays, mask=None):
+    """分區陣列 -> DataFrame (欄位依 COLUMNS);mask: 只取這些列"""
+    n = len(arrays[STR_COLUMNS[0]])
+    rows = np.arange(n) if mask is None else np.flatnonzero(mask)
+    data = {}
+    for col in COLUMNS:
+        if col in LIST_COLUMNS:
+            items = arrays[f"{col}.values"].tolist()
+            offsets = arrays[f"{col}.offsets"]
+            data[col] = pd.Series([items[offsets[i]:offsets[i + 1]] for i in rows], dtype=object)
+        elif col in FLOAT_COLUMNS:
+            data[col] = arrays[col][rows]
+        elif col in INT_COLUMNS:
+            values = arrays[col][rows]
+            data[col] = pd.Series(values, dtype='Int64').mask(values <= 0)
+        else:
+            values = arrays[col][rows]
+            text = values.astype(object)
+            text[values == ''] = None
+            data[col] = text
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+class HistoryStore:
+    def __init__(self, root='history'):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _partition(self, day):
+        return os.path.join(self.root, f"date={day}{PARTITION_SUFFIX}")
+
+    def partitions(self):
+        """列出所有分區日期 (已排序)"""
+        if not os.path.isdir(self.root):
+            return []
+        days = [
+            name[len('date='):-len(PARTITION_SUFFIX)]
+            for name in os.listdir(self.root)
+            if name.startswith('date=') and name.endswith(PARTITION_SUFFIX)
+        ]
+        return sorted(days)
+
+    def is_empty(self):
+        return not self.partitions()
+
+    def _read(self, day):
+        with np.load(self._partition(day), allow_pickle=False) as data:
+            return _unpack({name: data[name] for name in data.files})
+
+    def _write(self, day, arrays):
+        path = self._partition(day)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(f, **_pack(arrays))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def append(self, records, day=None, time_str=None):
+        """
+        附加一輪快照到當日分區 (只重寫當日分區,與歷史長度無關)
+        records: mapped_data 列表
+        day / time_str: 'YYYY-MM-DD' / 'HH:MM:SS',未提供時以記錄內的 date/time 為準
+        回傳寫入筆數
+        """
+        by_day = {}
+        for record in records:
+            record = dict(record)
+            if day is not None:
+                record['date'] = day
+            if time_str is not None:
+                record['time'] = time_str
+            row = normalize_record(record)
+            by_day.setdefault(row['date'], []).append(row)
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            for d, rows in by_day.items():
+                arrays = _encode(rows)
+                if os.path.exists(self._partition(d)):
+                    arrays = _concat([self._read(d), arrays])
+                self._write(d, arrays)
+
+        return sum(len(rows) for rows in by_day.values())
+
+    def load(self, start=None, end=None, tickers=None):
+        """
+        讀取日期區間 / 指定 ticker 的記錄為 DataFrame
+        start / end: 'YYYY-MM-DD' 或 date,含頭尾
+        tickers: 只讀取指定的 us_ticker
+        """
+        start = start.isoformat() if isinstance(start, date) else start
+        end = end.isoformat() if isinstance(end, date) else end
+
+        parts = [self._read(day) for day in self.partitions()
+                 if not ((start and day < start) or (end and day > end))]
+        if not parts:
+            return _frame(_complete(_encode([])))
+        arrays = _concat(parts)
+        mask = np.isin(arrays['us_ticker'], list(tickers)) if tickers else None
+        return _frame(arrays, mask)
+
+    def iter_records(self, start=None, end=None, tickers=None):
+        """逐筆讀取日期區間內的記錄 (dict,缺值為 None)"""
+        df = self.load(start, end, tickers)
+        for row in df.to_dict('records'):
+            yield {k: (None if not isinstance(v, list) and pd.isna(v) else v) for k, v in row.items()}
+
+    def migrate_csv(self, csv_path='sector_flow_history.csv'):
+        """
+        一次性匯入舊版 sector_flow_history.csv
+        回傳匯入筆數
+        """
+        if not os.path.exists(csv_path):
+            return 0
+
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        records = df.to_dict('records')
+        count = self.append(records)
+        print(f"📦 已匯入 {count} 筆歷史資料: {csv_path} -> {self.root}/")
+        return count
+
+
+def main():
+    p = argparse.ArgumentParser(description="板塊資金流向歷史資料庫")
+    p.add_argument("--root", default="history", help="歷史資料目錄")
+    p.add_argument("--migrate", metavar="CSV", help="匯入舊版 sector_flow_history.csv")
+    p.add_argument("--start", help="查詢起始日 YYYY-MM-DD")
+    p.add_argument("--end", help="查詢結束日 YYYY-MM-DD")
+    p.add_argument("--tickers", help="查詢 ticker,逗號分隔")
+    args = p.parse_args()
+
+    store = HistoryStore(args.root)
+    if args.migrate:
+        if not store.is_empty():
+            raise SystemExit(f"❌ {args.root}/ 已有資料,略過匯入")
+        store.migrate_csv(args.migrate)
+        return 0
+
+    tickers = [t.strip().upper() for t in args.tickers.split(',')] if args.tickers else None
+    df = store.load(args.start, args.end, tickers)
+    print(df.to_string(index=False) if not df.empty else "(無資料)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+"""
+盤中分K 增量接收
+每檔 ticker 在記憶體保留一個分K 環狀緩衝區,每輪只向資料來源要求比最後一根更新的 K 線,
+經過 產生請求 -> 抓取 -> 寫入緩衝區 -> 產生快照 的 generator 管線交給資金流向計算
+
+資料來源:
+  YahooBarSource   yfinance 分K (第一次抓當日全部,之後只抓最後時間戳之後)
+  ReplayBarSource  重播本地分K (測試 / 基準測試用,以模擬時鐘控制可見範圍)
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytz
+
+US_TZ = pytz.timezone('America/New_York')
+
+# 美股一般交易時段 09:30 ~ 16:00 共 390 根分K
+SESSION_MINUTES = 390
+
+
+def _epoch_seconds(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.as_unit('s').asi8
+
+
+def _payload_bytes(bars):
+    """估算回應大小: 以 K 線序列化為 JSON 後的位元組數計算"""
+    if bars is None or len(bars) == 0:
+        return 0
+    return len(bars[['Close', 'Volume']].to_json(orient='split').encode('utf-8'))
+
+
+class BarRingBuffer:
+    """固定容量的分K 環狀緩衝區 (時間戳 / 收盤價 / 成交量)"""
+
+    def __init__(self, capacity=SESSION_MINUTES):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.close = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.head = 0  # 下一個寫入位置
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_ts(self):
+        """最後一根 K 線的 epoch 秒數,空緩衝區為 None"""
+        if not self.size:
+            return None
+        return int(self.ts[(self.head - 1) % self.capacity])
+
+    def clear(self):
+        self.size = 0
+        self.head = 0
+
+    def push(self, ts, close, volume):
+        """
+        寫入一根 K 線
+        時間戳與最後一根相同時覆寫 (進行中的 K 線會持續更新),較舊的 K 線忽略
+        回傳是否有寫入
+        """
+        last = self.last_ts
+        if last is not None and ts < last:
+            return False
+        if last is not None and ts == last:
+            pos = (self.head - 1) % self.capacity
+        else:
+            pos = self.head
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        self.ts[pos] = ts
+        self.close[pos] = close
+        self.volume[pos] = volume
+        return True
+
+    def extend(self, bars):
+        """寫入 DataFrame (index 為時間,含 Close / Volume),回傳寫入根數"""
+        if bars is None or len(bars) == 0:
+            return 0
+        ts = _epoch_seconds(bars.index)
+        close = bars['Close'].to_numpy(dtype=float)
+        volume = bars['Volume'].to_numpy(dtype=float)
+        return sum(self.push(int(t), c, v) for t, c, v in zip(ts, close, volume))
+
+    def _order(self):
+        start = (self.head - self.size) % self.capacity
+        return (start + np.arange(self.size)) % self.capacity
+
+    def frame(self):
+        """依時間排序的 DataFrame (UTC 時間 index,Close / Volume 欄位)"""
+        order = self._order()
+        index = pd.to_datetime(self.ts[order], unit='s', utc=True)
+        return pd.DataFrame({'Close': self.close[order], 'Volume': self.volume[order]}, index=index)
+
+
+class YahooBarSource:
+    def __init__(self, ticker_factory=None, timeout=None):
+        """
+        ticker_factory: ticker -> yf.Ticker 物件 (預設 yfinance.Ticker)
+        timeout: 單次請求逾時秒數 (None 為 yfinance 預設值)
+        """
+        if ticker_factory is None:
+            import yfinance as yf
+            ticker_factory = yf.Ticker
+        self.ticker_factory = ticker_factory
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'rows': 0, 'bytes': 0}
+
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    def fetch(self, ticker, since=None):
+        """
+        since: epoch 秒數,None 表示抓取當日全部分K
+        回傳 (bars, prev_close),只有抓當日全部時才會附帶昨收
+        """
+        stock = self.ticker_factory(ticker)
+        kwargs = {'timeout': self.timeout} if self.timeout else {}
+        prev_close = None
+        if since is None:
+            bars = stock.history(period='1d', interval='1m', **kwargs)
+            meta = getattr(stock, 'history_metadata', None) or {}
+            prev_close = meta.get('previousClose') or meta.get('chartPreviousClose')
+        else:
+            start = datetime.fromtimestamp(since, timezone.utc)
+            bars = stock.history(start=start, interval='1m', **kwargs)
+        self.stats['requests'] += 1
+        self.stats['rows'] += len(bars)
+        self.stats['bytes'] += _payload_bytes(bars)
+        return bars, prev_close
+
+
+class ReplayBarSource:
+    def __init__(self, frames, prev_closes=None, clock=None):
+        """
+        frames: {ticker: 分K DataFrame (時間 index,含 Close / Volume)}
+        prev_closes: {ticker: 昨收}
+        clock: 模擬時間 (pd.Timestamp,含時區),只回傳此時間之前已出現的 K 線
+        """
+        self.frames = frames
+        self.prev_closes = prev_closes or {}
+        self.clock = clock
+        self.stats = {'requests': 0, 'rows': 0, 'bytes': 0}
+
+    def now(self):
+        return self.clock.to_pydatetime()
+
+    def advance(self, clock):
+        self.clock = clock
+
+    def fetch(self, ticker, since=None):
+        bars = self.frames.get(ticker)
+        if bars is None:
+            bars = pd.DataFrame(columns=['Close', 'Volume'])
+        else:
+            ts = _epoch_seconds(bars.index)
+            session_start = pd.Timestamp(self.clock).tz_convert(US_TZ).normalize()
+            lower = int(session_start.timestamp()) if since is None else since
+            mask = (ts >= lower) & (ts <= int(pd.Timestamp(self.clock).timestamp()))
+            bars = bars[mask]
+        self.stats['requests'] += 1
+        self.stats['rows'] += len(bars)
+        self.stats['bytes'] += _payload_bytes(bars)
+        return bars, self.prev_closes.get(ticker) if since is None else None
+
+
+class IntradayStream:
+    def __init__(self, source, capacity=SESSION_MINUTES):
+        """
+        source: YahooBarSource / ReplayBarSource (提供 now() 與 fetch(ticker, since))
+        capacity: 每檔保留的分K 根數
+        """
+        self.source = source
+        self.capacity = capacity
+        self.buffers = {}
+        self.prev_closes = {}
+        self.sessions = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _session(self):
+        return self.source.now().astimezone(US_TZ).date()
+
+    def requests(self, tickers):
+        """產生 (ticker, since);換日或尚無資料時 since 為 None (抓當日全部)"""
+        session = self._session()
+        for ticker in tickers:
+            buffer = self.buffers.setdefault(ticker, BarRingBuffer(self.capacity))
+            if self.sessions.get(ticker) != session:
+                buffer.clear()
+                self.prev_closes.pop(ticker, None)
+                self.sessions[ticker] = session
+            # 從最後一根開始抓,讓進行中的 K 線也能更新
+            yield ticker, buffer.last_ts
+
+    def fetch(self, requests):
+        """產生 (ticker, bars, prev_close)"""
+        for ticker, since in requests:
+            bars, prev_close = self.source.fetch(ticker, since)
+            yield ticker, bars, prev_close
+
+    def ingest(self, batches):
+        """寫入緩衝區,產生 (ticker, 新寫入根數)"""
+        for ticker, bars, prev_close in batches:
+            if prev_close:
+                self.prev_closes[ticker] = prev_close
+            yield ticker, self.buffers[ticker].extend(bars)
+
+    def snapshots(self, updates):
+        """產生 (ticker, data),data 與 fetch_realtime_data 的回傳格式相同;緩衝區為空時為 None"""
+        for ticker, _ in updates:
+            buffer = self.buffers[ticker]
+            if not len(buffer):
+                yield ticker, None
+                continue
+            hist = buffer.frame()
+            yield ticker, {
+                'hist': hist,
+                'current_price': float(hist['Close'].iloc[-1]),
+                'prev_close': self.prev_closes.get(ticker),
+            }
+
+    def poll(self, tickers):
+        """完整管線: 只抓新 K 線並產生各 ticker 的最新快照 (單一執行緒使用;多執行緒請逐檔呼叫 update)"""
+        return self.snapshots(self.ingest(self.fetch(self.requests(tickers))))
+
+    def update(self, ticker):
+        """
+        單一 ticker 的 poll (供執行緒池逐檔呼叫)
+        同一 ticker 的更新以鎖依序進行,避免兩個執行緒同時寫入同一個緩衝區
+        """
+        with self._lock(ticker):
+            return next(self.poll([ticker]))[1]
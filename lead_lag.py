@@ -0,0 +1,270 @@
+"""
+美股板塊 ETF -> 台股族群 領先落後相關性分析
+以本地日線快取 (stock_data/cache) 計算每檔美股 ETF 與每個台股族群指數
+(成分股日報酬等權平均) 的滾動相關係數與 beta,檢驗人工對應表是否成立
+
+對齊方式 (以台股交易日為準):
+  lag 0  同一日曆日的美股報酬 (台股收盤時美股尚未開盤,為同步參考)
+  lag 1  台股開盤前最近一個美股交易日的報酬 (隔夜美股 -> 台股下一個交易日)
+
+所有 日期 x ETF x 族群 的滾動統計以累積和一次算出,不逐組合迴圈
+
+輸出:
+  out/lead_lag.csv                        每組 (ETF, 族群, lag, 視窗) 的最新相關係數 / beta
+  out/us_sector_to_tw_theme_learned.csv   資料驅動的對應權重 (格式同 us_sector_to_tw_theme.csv,
+                                          可用 sector_heatmap.py --learned 取代人工對應)
+
+用法:
+  python lead_lag.py [--windows 20,60,120,250] [--source yahoo] [--min-corr 0.2]
+  python lead_lag.py --fetch --start 2022-01-01   # 快取不足時先下載
+"""
+
+import argparse
+import csv
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest import US_SOURCE, fetch_us_bars, load_panel
+from bar_cache import BarCache
+from mapping_index import load_mapping_index
+
+LAGS = (0, 1)
+DEFAULT_WINDOWS = (20, 60, 120, 250)
+# 視窗內有效樣本數至少要達到視窗長度的比例
+MIN_COVERAGE = 0.8
+
+
+def daily_returns(close):
+    """日報酬 (收盤 / 前一列收盤 - 1),close: 日期 x 代碼 的 ndarray"""
+    prev = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return close / prev - 1
+
+
+def theme_returns(stock_returns, codes, theme_to_codes):
+    """
+    族群指數日報酬: 成分股日報酬等權平均 (缺值的個股不列入當日平均)
+    回傳 (日期 x 族群 ndarray, 族群名稱)
+    """
+    col = {c: i for i, c in enumerate(codes)}
+    themes = [t for t, members in theme_to_codes.items() if any(c in col for c in members)]
+    member = np.zeros((len(codes), len(themes)))
+    for j, theme in enumerate(themes):
+        member[[col[c] for c in theme_to_codes[theme] if c in col], j] = 1.0
+    valid = ~np.isnan(stock_returns)
+    sums = np.where(valid, stock_returns, 0.0) @ member
+    counts = valid.astype(float) @ member
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan), themes
+
+
+def align_us(us_dates, us_returns, tw_dates, lag):
+    """
+    將美股報酬對齊到台股交易日
+    lag 0: 同一日曆日 (美股當日休市者為 NaN);lag 1: 台股交易日之前最近一個美股交易日
+    """
+    us_dates = np.asarray(us_dates, dtype='datetime64[D]')
+    tw_dates = np.asarray(tw_dates, dtype='datetime64[D]')
+    padded = np.vstack([us_returns, np.full((1, us_returns.shape[1]), np.nan)])
+    if lag == 0:
+        pos = np.searchsorted(us_dates, tw_dates, side='left')
+        hit = (pos < len(us_dates)) & (us_dates[np.minimum(pos, len(us_dates) - 1)] == tw_dates)
+        return padded[np.where(hit, pos, len(us_dates))]
+    pos = np.searchsorted(us_dates, tw_dates, side='left') - lag
+    return padded[np.where(pos >= 0, pos, len(us_dates))]
+
+
+def _cumulative(values):
+    """沿第 0 軸的累積和,前面補一列 0 (任一視窗的加總 = 兩列相減)"""
+    out = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def _window_sum(cumulative, window):
+    """由 _cumulative 的結果取滾動加總 (前 window-1 列為部分視窗)"""
+    rows = cumulative.shape[0] - 1
+    start = np.maximum(np.arange(1, rows + 1) - window, 0)
+    return cumulative[1:] - cumulative[start]
+
+
+def rolling_stats(x, y, windows, min_coverage=MIN_COVERAGE):
+    """
+    所有 (x 欄, y 欄) 組合的滾動相關係數與 beta (y 對 x 迴歸)
+    x: 日期 x U,y: 日期 x K (皆可含 NaN,只用兩者都有值的日子)
+    累積和只算一次,各視窗共用
+    回傳 {window: (corr, beta, n)},皆為 日期 x U x K 陣列,樣本數不足 window * min_coverage 者為 NaN
+    """
+    valid = ~np.isnan(x)[:, :, None] & ~np.isnan(y)[:, None, :]
+    xv = np.where(valid, np.nan_to_num(x)[:, :, None], 0.0)
+    yv = np.where(valid, np.nan_to_num(y)[:, None, :], 0.0)
+    sums = {
+        'n': _cumulative(valid.astype(float)),
+        'x': _cumulative(xv),
+        'y': _cumulative(yv),
+        'xx': _cumulative(xv * xv),
+        'yy': _cumulative(yv * yv),
+        'xy': _cumulative(xv * yv),
+    }
+
+    out = {}
+    for window in windows:
+        n, sx, sy, sxx, syy, sxy = (_window_sum(sums[key], window) for key in ('n', 'x', 'y', 'xx', 'yy', 'xy'))
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        enough = n >= max(3, window * min_coverage)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.where(enough & (var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan)
+            beta = np.where(enough & (var_x > 0), cov / var_x, np.nan)
+        out[window] = (np.clip(corr, -1.0, 1.0), beta, n)
+    return out
+
+
+def lead_lag(us_panel, tw_panel, theme_to_codes, windows=DEFAULT_WINDOWS, lags=LAGS):
+    """
+    計算所有 ETF x 族群 在各 lag / 視窗的滾動相關係數與 beta
+    回傳 dict:
+      tickers, themes, dates (台股交易日)
+      stats[(lag, window)] = {'corr', 'beta', 'n'} (日期 x ETF x 族群)
+    """
+    us_close = us_panel['close']
+    tw_close = tw_panel['close']
+    us_ret = daily_returns(us_close.to_numpy(dtype=float))
+    stock_ret = daily_returns(tw_close.to_numpy(dtype=float))
+    theme_ret, themes = theme_returns(stock_ret, list(tw_close.columns), theme_to_codes)
+
+    stats = {}
+    for lag in lags:
+        x = align_us(list(us_close.index), us_ret, list(tw_close.index), lag)
+        for window, (corr, beta, n) in rolling_stats(x, theme_ret, windows).items():
+            stats[(lag, window)] = {'corr': corr, 'beta': beta, 'n': n}
+    return {
+        'tickers': list(us_close.columns),
+        'themes': themes,
+        'dates': list(tw_close.index),
+        'stats': stats,
+    }
+
+
+def latest_table(result, mapped=None):
+    """各組合在最後一個交易日的相關係數 / beta 長表;mapped: {ticker: [theme]} 人工對應"""
+    mapped = mapped or {}
+    tickers, themes = result['tickers'], result['themes']
+    frames = []
+    for (lag, window), s in result['stats'].items():
+        u, k = np.meshgrid(np.arange(len(tickers)), np.arange(len(themes)), indexing='ij')
+        frames.append(pd.DataFrame({
+            'us_ticker': np.array(tickers)[u.ravel()],
+            'tw_theme': np.array(themes)[k.ravel()],
+            'lag': lag,
+            'window': window,
+            'corr': s['corr'][-1].ravel(),
+            'beta': s['beta'][-1].ravel(),
+            'n': s['n'][-1].ravel().astype(int),
+        }))
+    table = pd.concat(frames, ignore_index=True)
+    table['mapped'] = [theme in mapped.get(t, []) for t, theme in zip(table['us_ticker'], table['tw_theme'])]
+    return table
+
+
+def learned_weights(table, lag=1, min_corr=0.2):
+    """
+    資料驅動的對應權重: 指定 lag 下各視窗最新相關係數的平均 (負值不計)
+    只保留平均相關係數 >= min_corr 的組合,回傳 {ticker: {theme: weight}}
+    """
+    rows = table[table['lag'] == lag]
+    score = rows.groupby(['us_ticker', 'tw_theme'], sort=False)['corr'].mean()
+    weights = {}
+    for (ticker, theme), value in score.items():
+        if np.isfinite(value) and value >= min_corr:
+            weights.setdefault(ticker, {})[theme] = round(float(value), 4)
+    return weights
+
+
+def write_learned_mapping(path, weights, us_names):
+    """寫出與 us_sector_to_tw_theme.csv 相同格式 (加上 weight 欄) 的對應表"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['us_sector_ticker', 'us_sector_name', 'tw_theme', 'weight'])
+        for ticker in sorted(weights):
+            for theme, weight in sorted(weights[ticker].items(), key=lambda kv: -kv[1]):
+                writer.writerow([ticker, us_names.get(ticker, ticker), theme, weight])
+
+
+def main():
+    p = argparse.ArgumentParser(description="美股板塊 ETF -> 台股族群 領先落後相關性分析")
+    p.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOWS)), help="滾動視窗 (交易日),逗號分隔")
+    p.add_argument("--source", default="yahoo", choices=["yahoo", "twse"], help="台股快取來源")
+    p.add_argument("--cache-dir", default="stock_data/cache", help="日線快取目錄")
+    p.add_argument("--start", help="起始日 YYYY-MM-DD (--fetch 時必填)")
+    p.add_argument("--fetch", action="store_true", help="快取不足時先下載 (美股 ETF 與台股個股)")
+    p.add_argument("--min-corr", type=float, default=0.2, help="learned 對應表保留的最低平均相關係數 (lag 1)")
+    p.add_argument("--outdir", default="out", help="輸出目錄")
+    args = p.parse_args()
+
+    windows = [int(w) for w in args.windows.split(',')]
+    start = date.fromisoformat(args.start) if args.start else None
+    end = datetime.now().date()
+    cache = BarCache(args.cache_dir)
+    mapping = load_mapping_index()
+
+    us_tickers = sorted(mapping.us_to_themes)
+    theme_to_codes = {theme: [code for code, _ in stocks] for theme, stocks in mapping.theme_to_stocks.items()}
+    tw_codes = sorted({c for codes in theme_to_codes.values() for c in codes})
+
+    if args.fetch:
+        if start is None:
+            raise SystemExit("❌ --fetch 需要指定 --start")
+        from tw_stock_fetcher import TaiwanStockFetcher
+        for t in us_tickers:
+            fetch_us_bars(cache, t, start, end)
+        fetcher = TaiwanStockFetcher()
+        fetcher.cache = cache
+        if args.source == 'twse':
+            fetcher.fetch_many_from_twse(tw_codes, start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))
+        else:
+            fetcher.fetch_yahoo_bulk(tw_codes, start_date=start.isoformat(), end_date=end.isoformat())
+
+    us_panel = load_panel(cache, US_SOURCE, us_tickers, start)
+    tw_panel = load_panel(cache, args.source, tw_codes, start)
+    if us_panel['close'].empty or tw_panel['close'].empty:
+        raise SystemExit("❌ 日線快取不足,請加上 --fetch --start YYYY-MM-DD")
+    print(f"📊 美股 ETF: {us_panel['close'].shape[1]} 檔 | 台股個股: {tw_panel['close'].shape[1]} 檔 "
+          f"x {len(tw_panel['close'])} 日 | 視窗: {windows}")
+
+    t0 = time.perf_counter()
+    result = lead_lag(us_panel, tw_panel, theme_to_codes, windows)
+    table = latest_table(result, mapping.us_to_themes)
+    elapsed = time.perf_counter() - t0
+
+    weights = learned_weights(table, lag=1, min_corr=args.min_corr)
+    os.makedirs(args.outdir, exist_ok=True)
+    table.round(4).to_csv(os.path.join(args.outdir, 'lead_lag.csv'), index=False, encoding='utf-8-sig')
+    learned_path = os.path.join(args.outdir, 'us_sector_to_tw_theme_learned.csv')
+    write_learned_mapping(learned_path, weights, mapping.us_names)
+
+    # 人工對應表檢驗: lag 1 平均相關係數
+    score = table[table['lag'] == 1].groupby(['us_ticker', 'tw_theme', 'mapped'])['corr'].mean().reset_index()
+    weak = score[score['mapped'] & ~(score['corr'] >= args.min_corr)].sort_values('corr')
+    strong = score[~score['mapped'] & (score['corr'] >= args.min_corr)].sort_values('corr', ascending=False)
+    print(f"\n⚠️  人工對應但 lag 1 相關性偏低 (< {args.min_corr}): {len(weak)} 組")
+    for r in weak.head(15).itertuples():
+        print(f"   {r.us_ticker:6s} -> {r.tw_theme:8s} corr {r.corr:+.2f}")
+    print(f"\n💡 未對應但 lag 1 相關性高 (>= {args.min_corr}): {len(strong)} 組")
+    for r in strong.head(15).itertuples():
+        print(f"   {r.us_ticker:6s} -> {r.tw_theme:8s} corr {r.corr:+.2f}")
+
+    print(f"\n⏱️  計算耗時: {elapsed:.2f} 秒")
+    print(f"✅ 已儲存: {args.outdir}/lead_lag.csv, {learned_path} "
+          f"({sum(len(v) for v in weights.values())} 組對應)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
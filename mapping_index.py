@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+美股板塊 / 台股族群 / 台股個股 對應索引編譯器
+
+Sources:
+  mappings/us_sector_to_tw_theme.csv      (美股板塊->台股族群，選填 weight 欄位)
+  mappings/tw_theme_to_stocks.csv         (台股族群->個股)
+  sector_flow_tracker.py                  (SECTOR_MAPPING)
+  sector_flow_tracker_merged.py           (SECTOR_MAPPING)
+  tw_stock_fetcher.py                     (TW_STOCK_CATEGORIES)
+
+Output:
+  mappings/.mapping_index.pkl             (編譯後索引，來源檔內容變更時才重建)
+  mappings/.mapping_index.<hash>.pkl      (其他對應表來源的索引，例如 lead_lag 產生的 learned 對應表)
+
+所有來源只在重建時解析與驗證一次；之後各程式以單次讀檔載入，
+並以 dict 做 O(1) 查詢 (us_ticker->themes, theme->stocks, stock->themes)。
+Python 來源以 ast 讀取常數字面值，不需 import 對應模組。
+"""
+
+from __future__ import annotations
+
+import ast
+import csv
+import hashlib
+import logging
+import os
+import pickle
+import bisect
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 3
+BASE_DIR = Path(__file__).resolve().parent
+
+DEFAULT_US2TW = BASE_DIR / "mappings" / "us_sector_to_tw_theme.csv"
+DEFAULT_TWLIST = BASE_DIR / "mappings" / "tw_theme_to_stocks.csv"
+# lead_lag.py 產生的資料驅動對應表 (格式同 us_sector_to_tw_theme.csv，含 weight 欄位)
+LEARNED_US2TW = BASE_DIR / "out" / "us_sector_to_tw_theme_learned.csv"
+CACHE_DIR = BASE_DIR / "mappings"
+TRACKER_SOURCE = BASE_DIR / "sector_flow_tracker.py"
+MERGED_SOURCE = BASE_DIR / "sector_flow_tracker_merged.py"
+FETCHER_SOURCE = BASE_DIR / "tw_stock_fetcher.py"
+
+
+@dataclass
+class MappingIndex:
+    """編譯後的對應索引 (所有欄位皆為 dict，查詢為 O(1))"""
+    us_to_themes: Dict[str, List[str]] = field(default_factory=dict)
+    us_theme_weights: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    us_names: Dict[str, str] = field(default_factory=dict)
+    theme_to_stocks: Dict[str, List[Tuple[str, str]]] = field(default_factory=dict)
+    stock_to_themes: Dict[str, List[str]] = field(default_factory=dict)
+    stock_names: Dict[str, str] = field(default_factory=dict)
+    sector_mapping: Dict[str, dict] = field(default_factory=dict)
+    merged_groups: Dict[str, List[str]] = field(default_factory=dict)
+    categories: Dict[str, dict] = field(default_factory=dict)
+    stock_to_groups: Dict[str, List[str]] = field(default_factory=dict)
+    sorted_codes: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def themes_for(self, us_ticker: str) -> List[str]:
+        return self.us_to_themes.get(us_ticker.strip().upper(), [])
+
+    def stocks_for(self, theme: str) -> List[Tuple[str, str]]:
+        return self.theme_to_stocks.get(theme, [])
+
+    def themes_for_stock(self, stock_code: str) -> List[str]:
+        return self.stock_to_themes.get(stock_code, [])
+
+    def groups_for_stock(self, stock_code: str) -> List[str]:
+        """個股所屬的全部產業/族群 (TW_STOCK_CATEGORIES + tw_theme_to_stocks.csv)"""
+        return self.stock_to_groups.get(stock_code.strip(), [])
+
+    def lookup_stocks(self, stock_codes: List[str]) -> Dict[str, List[str]]:
+        """批次查詢多檔個股所屬產業/族群，找不到的代碼回傳空列表"""
+        groups = self.stock_to_groups
+        return {code: groups.get(code.strip(), []) for code in stock_codes}
+
+    def search_stocks(self, query: str, limit: int = 50) -> List[Tuple[str, str]]:
+        """
+        依代碼前綴或名稱關鍵字搜尋個股
+
+        Returns:
+            [(stock_code, stock_name)]，代碼前綴符合者在前
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        codes = self.sorted_codes
+        start = bisect.bisect_left(codes, query)
+        end = bisect.bisect_left(codes, query + "\uffff")
+        hits = codes[start:end]
+
+        seen = set(hits)
+        hits += [code for code, name in self.stock_names.items()
+                 if query in name and code not in seen]
+        return [(code, self.stock_names.get(code, "")) for code in hits[:limit]]
+
+
+def _read_csv(path: Path) -> List[dict]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _literal_assignments(path: Path, names: List[str]) -> Tuple[Dict[str, object], List[str]]:
+    """
+    以 ast 讀取模組頂層的常數 dict 指派 (不執行模組)
+
+    Returns:
+        ({name: value}, warnings)，並檢查 dict 字面值中的重複 key
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    values: Dict[str, object] = {}
+    warnings: List[str] = []
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        if not isinstance(target, ast.Name) or target.id not in names:
+            continue
+        if isinstance(node.value, ast.Dict):
+            seen = set()
+            for key in node.value.keys:
+                if isinstance(key, ast.Constant):
+                    if key.value in seen:
+                        warnings.append(f"{path.name}: {target.id} 重複的 key '{key.value}' (後者覆蓋前者)")
+                    seen.add(key.value)
+        values[target.id] = ast.literal_eval(node.value)
+    return values, warnings
+
+
+def _split_stock(entry: str) -> Tuple[str, str]:
+    """'2330 台積電' -> ('2330', '台積電')"""
+    code, _, name = entry.strip().partition(" ")
+    return code, name.strip()
+
+
+def compile_index(us2tw: Path, twlist: Path) -> MappingIndex:
+    """解析並驗證所有來源，產生 MappingIndex"""
+    idx = MappingIndex()
+    warn = idx.warnings
+
+    # 1) 美股板塊 -> 台股族群
+    rows = _read_csv(us2tw)
+    if rows and "us_sector_ticker" not in rows[0]:
+        raise ValueError(f"{us2tw} 缺少 us_sector_ticker 欄位")
+    for r in rows:
+        us_t = (r.get("us_sector_ticker") or "").strip().upper()
+        us_n = (r.get("us_sector_name") or "").strip()
+        tw = (r.get("tw_theme") or "").strip()
+        if not us_t:
+            continue
+        themes = idx.us_to_themes.setdefault(us_t, [])
+        if tw and tw not in themes:
+            themes.append(tw)
+        if tw:
+            # 選填 weight 欄位 (預設 1.0)，供族群熱度加權計分
+            raw = (r.get("weight") or "").strip()
+            try:
+                weight = float(raw) if raw else 1.0
+            except ValueError:
+                warn.append(f"{us2tw.name}: {us_t}->{tw} weight 無法解析 ({raw})，以 1.0 計")
+                weight = 1.0
+            idx.us_theme_weights.setdefault(us_t, {})[tw] = weight
+        if us_n:
+            idx.us_names[us_t] = us_n
+
+    # 2) 台股族群 -> 個股
+    seen_pairs = set()
+    for r in _read_csv(twlist):
+        theme = (r.get("tw_theme") or r.get("產業分類") or "").strip()
+        code = (r.get("stock_code") or r.get("股票代碼") or "").strip()
+        name = (r.get("stock_name") or r.get("股票名稱") or "").strip()
+        if not theme or not code:
+            continue
+        if (theme, code) in seen_pairs:
+            warn.append(f"{twlist.name}: [{theme}] 重複列出 {code}")
+            continue
+        seen_pairs.add((theme, code))
+        idx.theme_to_stocks.setdefault(theme, []).append((code, name))
+        idx.stock_to_themes.setdefault(code, []).append(theme)
+        if name:
+            if idx.stock_names.get(code, name) != name:
+                warn.append(f"{twlist.name}: {code} 名稱不一致 ({idx.stock_names[code]} / {name})")
+            idx.stock_names.setdefault(code, name)
+
+    for us_t, themes in idx.us_to_themes.items():
+        for theme in themes:
+            if theme not in idx.theme_to_stocks:
+                warn.append(f"{us2tw.name}: {us_t} 對應的族群 [{theme}] 沒有個股")
+
+    # 3) Python 常數來源
+    if TRACKER_SOURCE.exists():
+        values, w = _literal_assignments(TRACKER_SOURCE, ["SECTOR_MAPPING"])
+        warn.extend(w)
+        idx.sector_mapping = values.get("SECTOR_MAPPING", {})
+        for us_t, info in idx.sector_mapping.items():
+            for entry in info.get("tw_stocks", []):
+                code, name = _split_stock(entry)
+                known = idx.stock_names.get(code)
+                if known and name and known != name:
+                    warn.append(f"{TRACKER_SOURCE.name}: {us_t} {code} 名稱不一致 ({known} / {name})")
+
+    if MERGED_SOURCE.exists():
+        values, w = _literal_assignments(MERGED_SOURCE, ["SECTOR_MAPPING"])
+        warn.extend(w)
+        idx.merged_groups = {
+            us_t: list(info.get("tw_groups", []))
+            for us_t, info in values.get("SECTOR_MAPPING", {}).items()
+        }
+
+    if FETCHER_SOURCE.exists():
+        values, w = _literal_assignments(FETCHER_SOURCE, ["TW_STOCK_CATEGORIES"])
+        warn.extend(w)
+        idx.categories = values.get("TW_STOCK_CATEGORIES", {})
+        for category, info in idx.categories.items():
+            if len(info.get("stocks", [])) != len(info.get("names", [])):
+                warn.append(f"{FETCHER_SOURCE.name}: [{category}] stocks 與 names 數量不一致")
+
+    # 4) 反向索引: 個股 -> 所屬全部產業/族群
+    for category, info in idx.categories.items():
+        for code, name in zip(info.get("stocks", []), info.get("names", [])):
+            groups = idx.stock_to_groups.setdefault(code, [])
+            if category not in groups:
+                groups.append(category)
+            idx.stock_names.setdefault(code, name)
+    for code, themes in idx.stock_to_themes.items():
+        groups = idx.stock_to_groups.setdefault(code, [])
+        groups.extend(theme for theme in themes if theme not in groups)
+    idx.sorted_codes = sorted(idx.stock_to_groups)
+
+    return idx
+
+
+def _sources(us2tw: Path, twlist: Path) -> List[Path]:
+    return [p for p in (us2tw, twlist, TRACKER_SOURCE, MERGED_SOURCE, FETCHER_SOURCE) if p.exists()]
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def default_cache_path(us2tw: Path, twlist: Path) -> Path:
+    """
+    索引快取固定放在 mappings/ (已列入 .gitignore)，不隨來源檔位置寫進 out/ 等輸出目錄；
+    非預設來源依來源路徑各自一個快取檔，切換對應表時不會互相覆蓋
+    """
+    us2tw, twlist = Path(us2tw).resolve(), Path(twlist).resolve()
+    if (us2tw, twlist) == (DEFAULT_US2TW.resolve(), DEFAULT_TWLIST.resolve()):
+        return CACHE_DIR / ".mapping_index.pkl"
+    key = hashlib.sha256(f"{us2tw}\n{twlist}".encode("utf-8")).hexdigest()[:12]
+    return CACHE_DIR / f".mapping_index.{key}.pkl"
+
+
+def load_mapping_index(us2tw: Path = DEFAULT_US2TW, twlist: Path = DEFAULT_TWLIST,
+                       cache_path: Path | None = None) -> MappingIndex:
+    """
+    載入對應索引：來源檔 mtime/size 未變時直接讀取快取；
+    有變動時比對內容雜湊，內容真的改變才重新編譯。
+    """
+    us2tw, twlist = Path(us2tw), Path(twlist)
+    cache_path = Path(cache_path) if cache_path else default_cache_path(us2tw, twlist)
+    sources = _sources(us2tw, twlist)
+
+    cached = None
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") != INDEX_VERSION:
+                cached = None
+        except Exception as e:
+            logger.warning(f"⚠️  對應索引快取無法讀取，重新編譯: {e}")
+            cached = None
+
+    if cached is not None:
+        fingerprints = cached["sources"]
+        if set(fingerprints) == {str(p) for p in sources}:
+            stale = [p for p in sources if tuple(fingerprints[str(p)]["stat"]) != _stat(p)]
+            if not stale:
+                return MappingIndex(**cached["index"])
+            if all(fingerprints[str(p)]["sha256"] == _digest(p) for p in stale):
+                # 只有 mtime 變動 (例如 git checkout)，內容相同，不需重建
+                for p in stale:
+                    fingerprints[str(p)]["stat"] = _stat(p)
+                _write_cache(cache_path, cached)
+                return MappingIndex(**cached["index"])
+
+    logger.info("🔧 重新編譯對應索引...")
+    idx = compile_index(us2tw, twlist)
+    for w in idx.warnings:
+        logger.warning(f"  ⚠️  {w}")
+
+    payload = {
+        "version": INDEX_VERSION,
+        "sources": {str(p): {"stat": _stat(p), "sha256": _digest(p)} for p in sources},
+        "index": asdict(idx),
+    }
+    _write_cache(cache_path, payload)
+    return idx
+
+
+def _write_cache(cache_path: Path, payload: dict) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = load_mapping_index()
+    logger.info(f"美股板塊: {len(index.us_to_themes)} | 台股族群: {len(index.theme_to_stocks)} "
+                f"| 台股個股: {len(index.stock_to_themes)} | 警告: {len(index.warnings)}")
@@ -0,0 +1,146 @@
+"""
+執行效能量測
+每輪記錄各階段與各 ticker 的耗時、請求/失敗/傳輸量等計數,
+以 JSON Lines (一輪一行) 附加到指標檔,另提供 cProfile 分析報告
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class CycleMetrics:
+    """單輪執行的計時器與計數器 (可由多個抓取執行緒同時寫入)"""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.tickers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _add(self, table, key, value):
+        with self._lock:
+            table[key] = table.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        """計時一個階段 (同名階段累加)"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(self.stages, name, time.perf_counter() - t0)
+
+    @contextmanager
+    def ticker(self, ticker):
+        """計時單一 ticker 的抓取"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(self.tickers, ticker, time.perf_counter() - t0)
+
+    def count(self, name, n=1):
+        self._add(self.counters, name, n)
+
+    def count_stats(self, prefix, before, after):
+        """累加兩次 stats dict 快照之間的差值,計數器名稱為 {prefix}_{key}"""
+        for key, value in after.items():
+            delta = value - before.get(key, 0)
+            if delta:
+                self.count(f"{prefix}_{key}", delta)
+
+    def record(self, **extra):
+        """本輪指標 (JSON 可序列化,時間單位為秒)"""
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(),
+                'total_s': round(time.perf_counter() - self._t0, 4),
+                'stages': {k: round(v, 4) for k, v in self.stages.items()},
+                'tickers': {k: round(v, 4) for k, v in sorted(self.tickers.items())},
+                'counters': dict(sorted(self.counters.items())),
+                **extra,
+            }
+
+    def summary(self, slowest=5):
+        """各階段耗時與最慢的 ticker"""
+        record = self.record()
+        stages = ' | '.join(f"{k} {v:.2f}s" for k, v in record['stages'].items())
+        lines = [f"⏱️  本輪 {record['total_s']:.2f}s: {stages}"]
+        if record['tickers']:
+            worst = sorted(record['tickers'].items(), key=lambda kv: kv[1], reverse=True)[:slowest]
+            lines.append("🐢 最慢 ticker: " + ', '.join(f"{t} {s:.2f}s" for t, s in worst))
+        if record['counters']:
+            lines.append("🔢 " + ', '.join(f"{k}={v}" for k, v in record['counters'].items()))
+        return '\n'.join(lines)
+
+
+def append_jsonl(path, record):
+    """附加一行 JSON 到指標檔"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+# profiled() 啟用期間,工作執行緒內 profile_call 的分析結果併入此處
+_worker_stats = None
+_worker_lock = threading.Lock()
+
+
+def profile_call(fn, *args, **kwargs):
+    """
+    執行 fn(*args, **kwargs);profiled() 啟用期間以該執行緒自己的 cProfile 記錄,併入最後的報告
+    (cProfile 只分析呼叫 enable() 的執行緒,執行緒池的工作需經由此函式送出才會被記錄)
+    """
+    if _worker_stats is None:
+        return fn(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ 同時只能有一個分析器,主執行緒的分析器已涵蓋所有執行緒
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        with _worker_lock:
+            if _worker_stats is not None:
+                _worker_stats.add(profiler)
+
+
+@contextmanager
+def profiled(path, top=30):
+    """
+    以 cProfile 分析區塊內的執行 (主執行緒,以及經由 profile_call 執行的工作執行緒)
+    path: 原始分析資料 (.prof,可用 snakeviz / pstats 開啟),另寫一份依累計時間排序的文字報告 (.txt)
+    """
+    global _worker_stats
+    with _worker_lock:
+        _worker_stats = pstats.Stats()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        with _worker_lock:
+            stats, _worker_stats = _worker_stats, None
+        stats.add(profiler)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        stats.dump_stats(path)
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(top)
+        report_path = os.path.splitext(path)[0] + '.txt'
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        print(f"🔬 效能分析已儲存至 {path} ({report_path})")
@@ -0,0 +1,188 @@
+"""
+flow_strength 線上統計 (每次更新 O(1))
+每檔 ticker 保留:
+  累計平均 / 變異數      Welford 演算法
+  滾動平均 / 變異數      固定長度視窗,新值加入、最舊的值移出時各做一次 Welford 更新
+  EWMA 動能             快慢兩條 EWMA 的差
+z 分數以「加入本次數值之前」的滾動平均 / 標準差計算,衡量本次 flow_strength 相對近期的異常程度
+
+狀態以 JSON 存檔 (先寫暫存檔再換名),常駐程式重啟後直接接續,不需重新載入歷史資料
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+
+DEFAULT_WINDOW = 78      # 5 分鐘一輪約為一個美股交易日
+DEFAULT_FAST_SPAN = 6
+DEFAULT_SLOW_SPAN = 26
+DEFAULT_MIN_PERIODS = 20
+
+
+class Welford:
+    """可加入與移除數值的平均 / 變異數 (母體變異數)"""
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.n
+        self.m2 -= delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return max(self.m2, 0.0) / self.n if self.n else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {'n': self.n, 'mean': self.mean, 'm2': self.m2}
+
+
+class TickerStats:
+    """單一 ticker 的線上統計狀態"""
+
+    def __init__(self, window=DEFAULT_WINDOW, fast_span=DEFAULT_FAST_SPAN, slow_span=DEFAULT_SLOW_SPAN,
+                 state=None):
+        state = state or {}
+        self.total = Welford(**state.get('total', {}))
+        self.rolling = Welford(**state.get('rolling', {}))
+        self.values = deque(state.get('values', []), maxlen=window)
+        self.fast_alpha = 2 / (fast_span + 1)
+        self.slow_alpha = 2 / (slow_span + 1)
+        self.ewma_fast = state.get('ewma_fast')
+        self.ewma_slow = state.get('ewma_slow')
+        # 加入最後一個觀測值之前的 EWMA 與被擠出視窗的值,供 pop_last 還原
+        self.prev_ewma = state.get('prev_ewma', [None, None])
+        self.evicted = state.get('evicted')
+        self.last_key = state.get('last_key')
+
+        # 視窗長度改變時依保留的數值重建滾動統計
+        if len(self.values) != self.rolling.n:
+            self.rolling = Welford()
+            for x in self.values:
+                self.rolling.add(x)
+
+    def zscore(self, x, min_periods=DEFAULT_MIN_PERIODS):
+        """x 相對目前滾動視窗的 z 分數,樣本不足或標準差為 0 時為 None"""
+        if self.rolling.n < min_periods or self.rolling.std == 0:
+            return None
+        return (x - self.rolling.mean) / self.rolling.std
+
+    def add(self, x):
+        self.evicted = None
+        if len(self.values) == self.values.maxlen:
+            self.evicted = self.values[0]
+            self.rolling.remove(self.evicted)
+        self.values.append(x)
+        self.rolling.add(x)
+        self.total.add(x)
+        self.prev_ewma = [self.ewma_fast, self.ewma_slow]
+        self.ewma_fast = x if self.ewma_fast is None else self.ewma_fast + self.fast_alpha * (x - self.ewma_fast)
+        self.ewma_slow = x if self.ewma_slow is None else self.ewma_slow + self.slow_alpha * (x - self.ewma_slow)
+
+    def pop_last(self):
+        """移除最後一個觀測值 (同一根 K 線更新時以新值取代)"""
+        if not self.values:
+            return
+        x = self.values.pop()
+        self.rolling.remove(x)
+        self.total.remove(x)
+        if self.evicted is not None:
+            self.values.appendleft(self.evicted)
+            self.rolling.add(self.evicted)
+            self.evicted = None
+        self.ewma_fast, self.ewma_slow = self.prev_ewma
+
+    def to_dict(self):
+        return {
+            'total': self.total.to_dict(),
+            'rolling': self.rolling.to_dict(),
+            'values': list(self.values),
+            'ewma_fast': self.ewma_fast,
+            'ewma_slow': self.ewma_slow,
+            'prev_ewma': self.prev_ewma,
+            'evicted': self.evicted,
+            'last_key': self.last_key,
+        }
+
+
+class OnlineFlowStats:
+    def __init__(self, path='cache/flow_stats.json', window=DEFAULT_WINDOW, fast_span=DEFAULT_FAST_SPAN,
+                 slow_span=DEFAULT_SLOW_SPAN, min_periods=DEFAULT_MIN_PERIODS):
+        """
+        path: 狀態檔 (None 表示只保留在記憶體)
+        window: 滾動視窗的觀測數
+        fast_span / slow_span: EWMA 動能的快慢週期
+        min_periods: 滾動視窗至少要有幾個觀測值才計算 z 分數
+        """
+        self.path = path
+        self.window = window
+        self.fast_span = fast_span
+        self.slow_span = slow_span
+        self.min_periods = min_periods
+        self._lock = threading.Lock()
+        self.tickers = {
+            ticker: TickerStats(window, fast_span, slow_span, state)
+            for ticker, state in self._load().items()
+        }
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save(self):
+        """寫入狀態檔 (checkpoint)"""
+        if not self.path:
+            return
+        with self._lock:
+            state = {ticker: stats.to_dict() for ticker, stats in self.tickers.items()}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def update(self, ticker, value, key=None):
+        """
+        加入一個 flow_strength 觀測值,回傳本次的統計
+        key: 觀測值的識別 (如最新 K 線時間),與上次相同時以新值取代上次的觀測值而不重複加入
+             (進行中的 K 線會持續更新;休市時每輪都是同一根 K 線)
+        回傳 {'z', 'mean', 'std', 'ewma', 'momentum', 'count'}
+        """
+        with self._lock:
+            stats = self.tickers.get(ticker)
+            if stats is None:
+                stats = self.tickers[ticker] = TickerStats(self.window, self.fast_span, self.slow_span)
+            if key is not None and key == stats.last_key:
+                stats.pop_last()
+            z = stats.zscore(value, self.min_periods)
+            stats.add(value)
+            stats.last_key = key
+            return {
+                'z': None if z is None else round(z, 4),
+                'mean': round(stats.rolling.mean, 4),
+                'std': round(stats.rolling.std, 4),
+                'ewma': round(stats.ewma_fast, 4),
+                'momentum': round(stats.ewma_fast - stats.ewma_slow, 4),
+                'count': stats.total.n,
+            }
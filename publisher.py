@@ -0,0 +1,201 @@
+"""
+輸出檔發佈
+在背景工作池中產生輸出內容 (報告文字、JSON),不佔用抓取主流程;
+每個檔案先寫入同目錄的暫存檔再換名,讀取端 (GitHub Pages、儀表板) 不會讀到寫一半的內容;
+內容雜湊與上次發佈相同時不重寫檔案,排程執行時不會產生只有時間戳變動的 commit
+
+發佈紀錄: {manifest} = {輸出路徑: 內容雜湊}
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+
+def content_hash(obj):
+    """str / bytes 直接雜湊,其他物件以排序鍵的 JSON 雜湊"""
+    if isinstance(obj, str):
+        obj = obj.encode('utf-8')
+    elif not isinstance(obj, bytes):
+        obj = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(obj).hexdigest()
+
+
+def atomic_write(path, content, encoding='utf-8'):
+    """寫入暫存檔後以 os.replace 換名 (同一檔案系統內為原子操作)"""
+    data = content.encode(encoding) if isinstance(content, str) else content
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def json_text(obj):
+    """JSON 輸出 (縮排 2,保留中文)"""
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def _render_and_write(path, render, args, encoding, previous=None):
+    """
+    (在工作執行緒 / 程序中執行) 產生內容並寫入,回傳 (內容雜湊, 是否實際寫入)
+    雜湊與 previous 相同時不寫入;沒有 previous (例如發佈紀錄不存在的全新 checkout) 時與現有檔案比對
+    """
+    content = render(*args)
+    digest = content_hash(content)
+    if digest == previous:
+        return digest, False
+    if previous is None and os.path.exists(path):
+        data = content.encode(encoding) if isinstance(content, str) else content
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return digest, False
+    atomic_write(path, content, encoding)
+    return digest, True
+
+
+class Publisher:
+    def __init__(self, manifest='cache/publish_manifest.json', max_workers=2, processes=False):
+        """
+        manifest: 發佈紀錄檔 (放在不納入版本控制的 cache/;None 表示只保留在記憶體)
+        max_workers: 同時產生輸出的工作數
+        processes: False 使用執行緒池 (預設);True 使用以 spawn 啟動的程序池,
+                   render 必須是可 pickle 的模組層級函式 (不 fork 已有抓取執行緒 / API server 的程序)
+        """
+        self.manifest = manifest
+        self.max_workers = max_workers
+        self.processes = processes
+        self.hashes = self._load()
+        self.stats = {'written': 0, 'skipped': 0, 'failed': 0}
+        self._pool = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def _load(self):
+        if self.manifest and os.path.exists(self.manifest):
+            try:
+                with open(self.manifest, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save(self):
+        if not self.manifest:
+            return
+        with self._save_lock:
+            with self._lock:
+                text = json.dumps(self.hashes, ensure_ascii=False, indent=2, sort_keys=True)
+            atomic_write(self.manifest, text + '\n')
+
+    def _executor(self):
+        if self._pool is None:
+            if self.processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='publish')
+        return self._pool
+
+    def unchanged(self, key, fingerprint):
+        """fingerprint 與上次發佈相同且輸出仍存在"""
+        return fingerprint is not None and self.hashes.get(key) == fingerprint and os.path.exists(key)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _skipped(self, key):
+        self._count('skipped')
+        print(f"➖ 內容未變動,略過: {key}")
+        future = Future()
+        future.set_result(False)
+        return future
+
+    def _track(self, job, key, describe):
+        """
+        job 完成後記錄發佈結果,回傳 Future (結果為 describe 的回傳值)
+        describe(job 結果) -> (雜湊或 None, 完成訊息或 None);雜湊不為 None 時寫入發佈紀錄
+        """
+        result = Future()
+
+        def finish(done):
+            try:
+                digest, message = describe(done.result())
+            except Exception as e:
+                self._count('failed')
+                print(f"❌ 發佈失敗 {key}: {e}")
+                result.set_exception(e)
+                return
+            if digest is not None:
+                with self._lock:
+                    self.hashes[key] = digest
+                self._save()
+                self._count('written')
+            else:
+                self._count('skipped')
+            if message:
+                print(message)
+            result.set_result(digest is not None)
+
+        job.add_done_callback(finish)
+        with self._lock:
+            self._pending.append(result)
+        return result
+
+    def publish(self, path, render, *args, fingerprint=None, encoding='utf-8'):
+        """
+        在背景產生 render(*args) 並原子寫入 path,回傳 Future (結果為是否實際寫入)
+        fingerprint: 代表內容的雜湊 (例如排除時間戳後的資料);與上次相同時直接略過,不產生內容
+                     未提供時以產生的內容本身比對,相同時不寫入
+        """
+        if self.unchanged(path, fingerprint):
+            return self._skipped(path)
+
+        previous = self.hashes.get(path) if fingerprint is None and os.path.exists(path) else None
+        job = self._executor().submit(_render_and_write, path, render, args, encoding, previous)
+
+        def describe(outcome):
+            digest, written = outcome
+            if not written:
+                return None, f"➖ 內容未變動,略過: {path}"
+            return (fingerprint or digest), f"💾 已發佈: {path}"
+
+        return self._track(job, path, describe)
+
+    def submit(self, key, fingerprint, fn, *args, message=None):
+        """
+        在背景執行其他輸出工作 (例如附加歷史資料),fingerprint 與上次相同時略過
+        key: 輸出路徑 (記錄於發佈紀錄)
+        message: 完成後以 fn 的回傳值格式化的訊息 (str.format)
+        """
+        if self.unchanged(key, fingerprint):
+            return self._skipped(key)
+        job = self._executor().submit(fn, *args)
+        return self._track(job, key, lambda value: (fingerprint, message.format(value) if message else None))
+
+    def wait(self):
+        """等待所有已送出的發佈完成,回傳實際寫入的檔案數"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        wait(pending)
+        return sum(1 for f in pending if not f.exception() and f.result())
+
+    def close(self):
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def report(self):
+        s = self.stats
+        return f"📤 輸出發佈: 寫入 {s['written']} | 未變動略過 {s['skipped']} | 失敗 {s['failed']}"
+
@@ -0,0 +1,85 @@
+"""
+請求速率限制器 (Token Bucket)
+同一個 bucket 可同時給執行緒 (acquire) 與 asyncio (acquire_async) 使用
+get_limiter(source) 提供行程內每個資料來源唯一的 bucket,所有抓取路徑共用同一份請求預算
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        rate: 每秒補充的 token 數 (即長期平均請求速率)
+        capacity: bucket 容量 (允許的瞬間突發請求數),預設為 max(1, rate)
+        """
+        if rate <= 0:
+            raise ValueError("rate 必須大於 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """重設統計: 請求數、累計等待秒數 (多執行緒同時等待會重複累計)"""
+        self.stats = {'requests': 0, 'waited': 0.0}
+        self._since = time.monotonic()
+
+    def _reserve(self, tokens=1):
+        """預約 token,回傳需要等待的秒數 (token 不足時允許暫時為負,後到者排隊)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+            self.stats['requests'] += tokens
+            self.stats['waited'] += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """阻塞直到取得 token,回傳實際等待秒數"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """asyncio 版本的 acquire"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def report(self, name=''):
+        """統計文字: 請求數、吞吐量、限速等待時間"""
+        elapsed = max(time.monotonic() - self._since, 1e-9)
+        n = self.stats['requests']
+        waited = self.stats['waited']
+        avg = waited / n if n else 0.0
+        return (f"{name.upper():6s} 請求 {n:4d} 次 / {elapsed:6.1f} 秒 = {n / elapsed:5.2f} req/s "
+                f"| 限速等待 累計 {waited:6.1f} 秒 (平均 {avg:.2f} 秒/次)")
+
+
+# 各資料來源的請求預算: (每秒請求數, 突發上限)
+# Yahoo 沒有公開上限,保守抓每秒 2 次;證交所約允許每 5 秒 3 次,超過會被暫時封鎖
+SOURCE_LIMITS = {
+    'yahoo': (2.0, 5),
+    'twse': (0.6, 3),
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(source):
+    """取得資料來源共用的 TokenBucket (同一行程內每個來源只建立一個)"""
+    with _limiters_lock:
+        if source not in _limiters:
+            rate, burst = SOURCE_LIMITS[source]
+            _limiters[source] = TokenBucket(rate, burst)
+        return _limiters[source]
@@ -6,7 +6,6 @@
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-import json
 from datetime import datetime, timedelta
 import yfinance as yf
 import os
@@ -27,15 +26,25 @@ ch = logging.StreamHandler()
 基於台股官方產業分類,支援即時資料更新
 """
 
+import argparse
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-import json
 from datetime import datetime, timedelta
 import yfinance as yf
 import os
 import time
 import pytz
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from history_store import HistoryStore
+from mapping_index import load_mapping_index
+from volume_profile import VolumeProfile
+from intraday_stream import IntradayStream, YahooBarSource
+from metrics import CycleMetrics, append_jsonl, profile_call, profiled
+from online_stats import OnlineFlowStats
+from publisher import Publisher, content_hash, json_text
+from api_server import DEFAULT_PORT, ApiServer, ApiState, load_snapshot
 
 # 美股核心板塊 ETF (11大板塊)
 US_SECTOR_ETFS = {
@@ -246,11 +255,67 @@ SECTOR_MAPPING = {
     }
 }
 
+# flow_strength 門檻 -> 交易信號 / 強度等級 (由高到低,大於門檻即成立;回測也使用同一組門檻)
+SIGNAL_THRESHOLDS = [
+    (10, '🔥🔥 爆量流入'),
+    (5, '🔥 強勁流入'),
+    (2, '📈 資金流入'),
+    (-2, '➡️ 持平'),
+    (-5, '📉 資金流出'),
+    (-10, '❄️ 大量流出'),
+]
+SIGNAL_FLOOR = '❄️❄️ 恐慌流出'
+STRENGTH_THRESHOLDS = [(10, 5), (5, 4), (2, 3), (-2, 2)]
+# flow_strength 相對近期的 z 分數門檻 -> 交易信號 (zscore_signals=True 時使用)
+Z_SIGNAL_THRESHOLDS = [
+    (3, '🔥🔥 爆量流入'),
+    (2, '🔥 強勁流入'),
+    (1, '📈 資金流入'),
+    (-1, '➡️ 持平'),
+    (-2, '📉 資金流出'),
+    (-3, '❄️ 大量流出'),
+]
+
+
 class SectorFlowTracker:
-    def __init__(self, include_themes=True, realtime=True):
+    def __init__(self, include_themes=True, realtime=True,
+                 max_workers=8, ticker_timeout=30, fetch_deadline=120,
+                 volume_profile_dir='cache/volume_profile',
+                 metrics_file=None,
+                 flow_stats='cache/flow_stats.json', zscore_signals=False,
+                 publish_manifest='cache/publish_manifest.json', publish_processes=False):
+        """
+        max_workers: 同時抓取的 ticker 數量上限
+        ticker_timeout: 單一 ticker 抓取逾時秒數
+        fetch_deadline: 一輪抓取的總期限秒數
+        volume_profile_dir: 每分鐘成交量基準快取目錄 (None 表示以當日平均量計算 volume_ratio)
+        metrics_file: 每輪效能指標 (JSON Lines) 輸出檔 (None 表示不寫檔)
+        flow_stats: flow_strength 線上統計 (滾動 z 分數 / EWMA 動能) 狀態檔 (None 表示只保留在記憶體)
+        zscore_signals: 交易信號改以 flow_strength 的 z 分數判斷 (樣本不足時仍用固定門檻)
+        publish_manifest: 輸出發佈紀錄 (各輸出檔上次發佈的內容雜湊,None 表示只保留在記憶體)
+        publish_processes: 以程序池產生輸出檔 (預設使用執行緒池)
+        """
         self.results = []
         self.include_themes = include_themes
         self.realtime = realtime
+        self.max_workers = max_workers
+        self.ticker_timeout = ticker_timeout
+        self.fetch_deadline = fetch_deadline
+        self.missing_tickers = {}
+        self.history_store = HistoryStore('history')
+        self.mapping = load_mapping_index()
+        self.volume_profile = VolumeProfile(volume_profile_dir, timeout=ticker_timeout) if volume_profile_dir else None
+        self.stream = IntradayStream(YahooBarSource(lambda t: yf.Ticker(t), timeout=ticker_timeout)) if realtime else None
+        self.metrics_file = metrics_file
+        self.metrics = CycleMetrics()
+        self.flow_stats = OnlineFlowStats(flow_stats)
+        self.zscore_signals = zscore_signals
+        self.publisher = Publisher(publish_manifest, processes=publish_processes)
+        self.api = None  # 內嵌的 ApiServer,每輪完成後替換其快照
+        # 跨輪共用的抓取執行緒池;上一輪逾時但仍在執行的 ticker 不重複送出
+        self._executor = None
+        self._inflight = {}
+        self._profiles_ready = None  # 成交量基準已更新的美東日期
         self.us_tz = pytz.timezone('America/New_York')
         self.tw_tz = pytz.timezone('Asia/Taipei')
         
@@ -290,36 +355,45 @@ class SectorFlowTracker:
             'is_trading': market_status == '盤中交易'
         }
 
-    def fetch_realtime_data(self, ticker):
-        """抓取即時資料"""
+    def fetch_realtime_data(self, ticker, metrics=None):
+        """
+        抓取即時資料 (只讀 K 線,不呼叫 stock.info)
+        現價、昨收與成交量取自分K (增量接收) / 日K 與同一次回應附帶的 chart metadata;
+        板塊名稱來自 US_SECTOR_ETFS / US_THEME_ETFS,每輪不抓基本資料
+        metrics: 記錄本次請求的 CycleMetrics (預設為目前這一輪)
+        """
+        metrics = metrics or self.metrics
         try:
             stock = yf.Ticker(ticker)
-            
+            current_price = prev_close = None
+            hist = pd.DataFrame()
+
             if self.realtime:
-                hist = stock.history(period='1d', interval='1m')
+                # 分K 由 IntradayStream 增量接收,每輪只抓最後一根之後的 K 線
+                data = self.stream.update(ticker)
+                if data:
+                    hist = data['hist']
+                    current_price = data['current_price']
+                    prev_close = data['prev_close']
+
+            if prev_close is None:
+                daily = stock.history(period='5d', interval='1d', timeout=self.ticker_timeout)
+                metrics.count('yahoo_daily_requests')
                 if len(hist) == 0:
-                    hist = stock.history(period='5d', interval='1d')
-            else:
-                hist = stock.history(period='5d', interval='1d')
-            
-            info = stock.info
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-            prev_close = info.get('previousClose') or info.get('regularMarketPreviousClose')
-            
-            if current_price is None and len(hist) > 0:
-                current_price = hist['Close'].iloc[-1]
-            
-            if prev_close is None and len(hist) >= 2:
-                prev_close = hist['Close'].iloc[-2]
-            
+                    hist = daily
+                if len(daily) > 0 and current_price is None:
+                    current_price = daily['Close'].iloc[-1]
+                if len(daily) >= 2:
+                    prev_close = daily['Close'].iloc[-2]
+
             return {
                 'hist': hist,
                 'current_price': current_price,
                 'prev_close': prev_close,
-                'info': info
             }
         except Exception as e:
             print(f"⚠️  {ticker} 即時資料抓取失敗: {e}")
+            metrics.count('failures')
             return None
 
     def fetch_sector_data(self):
@@ -339,51 +413,163 @@ class SectorFlowTracker:
         if self.include_themes:
             all_etfs.update(US_THEME_ETFS)
         
+        if self.realtime and self.volume_profile:
+            with self.metrics.stage('volume_profile'):
+                self.prepare_volume_profiles(list(all_etfs))
+
+        fetched = self._fetch_concurrently(list(all_etfs))
+        
         for ticker, name in all_etfs.items():
+            if ticker not in fetched:
+                continue
             try:
-                data = self.fetch_realtime_data(ticker)
-                
-                if data and data['current_price'] and data['prev_close']:
-                    current_price = data['current_price']
-                    prev_close = data['prev_close']
-                    change_pct = ((current_price - prev_close) / prev_close) * 100
-                    
-                    hist = data['hist']
-                    if len(hist) > 0:
-                        latest_volume = hist['Volume'].iloc[-1]
-                        avg_volume = hist['Volume'].mean()
-                        volume_ratio = latest_volume / avg_volume if avg_volume > 0 else 1
-                    else:
-                        latest_volume = data['info'].get('volume', 0)
-                        volume_ratio = 1
-                    
-                    flow_strength = change_pct * volume_ratio
-                    
-                    sector_type = '核心板塊' if ticker in US_SECTOR_ETFS else '主題板塊'
-                    last_update = datetime.now(self.tw_tz).strftime('%H:%M:%S')
-                    
-                    sector_data.append({
-                        'ticker': ticker,
-                        'name': name,
-                        'type': sector_type,
-                        'price': round(current_price, 2),
-                        'prev_close': round(prev_close, 2),
-                        'change_pct': round(change_pct, 2),
-                        'volume': int(latest_volume),
-                        'volume_ratio': round(volume_ratio, 2),
-                        'flow_strength': round(flow_strength, 2),
-                        'last_update': last_update,
-                        'market_status': time_info['market_status']
-                    })
-                    
-                    emoji = '🔥' if change_pct > 3 else '📈' if change_pct > 0 else '📉'
-                    print(f"{emoji} {ticker:6s} ({name:25s}): {change_pct:+6.2f}% | ${current_price:8.2f} | 量能: {volume_ratio:.2f}x")
-                
+                row = self._build_sector_row(ticker, name, fetched[ticker], time_info)
+                if row:
+                    sector_data.append(row)
             except Exception as e:
                 print(f"❌ {ticker} 抓取失敗: {e}")
         
+        if self.missing_tickers:
+            missing_str = ', '.join(f"{t}({reason})" for t, reason in self.missing_tickers.items())
+            print(f"\n⏱️  以下 ticker 逾時,本輪略過: {missing_str}")
+        
         return sorted(sector_data, key=lambda x: x['flow_strength'], reverse=True)
 
+    def prepare_volume_profiles(self, tickers):
+        """
+        每天一次、在抓取報價之前更新各 ticker 的每分鐘成交量基準
+        (冷快取需要抓數段歷史分K,不佔用單檔抓取的逾時與整輪期限)
+        """
+        today = datetime.now(self.us_tz).date()
+        if self._profiles_ready == today:
+            return
+        def ensure(ticker):
+            try:
+                self.volume_profile.ensure(ticker, yf.Ticker(ticker), today)
+            except Exception as e:
+                print(f"⚠️  {ticker} 成交量基準更新失敗: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            list(executor.map(lambda ticker: profile_call(ensure, ticker), tickers))
+        self._profiles_ready = today
+
+    def _fetch_concurrently(self, tickers):
+        """
+        以執行緒池並行抓取多檔 ticker
+        單檔超過 ticker_timeout 或整輪超過 fetch_deadline 者不再等待,
+        記錄於 self.missing_tickers ({ticker: 'timeout' | 'deadline' | 'busy'})
+        每個請求都帶有逾時設定,逾時的工作會自行結束;結束前該 ticker 不會再次送出 ('busy')
+        """
+        self.missing_tickers = {}
+        results = {}
+        started = {}
+        metrics = self.metrics
+
+        def task(ticker):
+            started[ticker] = time.monotonic()
+            with metrics.ticker(ticker):
+                return self.fetch_realtime_data(ticker, metrics)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        futures = {}
+        for ticker in tickers:
+            previous = self._inflight.get(ticker)
+            if previous is not None and not previous.done():
+                self.missing_tickers[ticker] = 'busy'
+                continue
+            future = self._executor.submit(profile_call, task, ticker)
+            self._inflight[ticker] = future
+            futures[future] = ticker
+        pending = set(futures)
+        deadline = time.monotonic() + self.fetch_deadline
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            done, pending = wait(pending, timeout=min(remaining, 0.5),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker = futures[future]
+                try:
+                    results[ticker] = future.result()
+                except Exception as e:
+                    print(f"❌ {ticker} 抓取失敗: {e}")
+
+            # 單檔逾時: 不取消執行中的請求,只是不再等待
+            now = time.monotonic()
+            for future in list(pending):
+                ticker = futures[future]
+                if ticker in started and now - started[ticker] > self.ticker_timeout:
+                    pending.discard(future)
+                    self.missing_tickers[ticker] = 'timeout'
+
+        for future in pending:
+            future.cancel()
+            self.missing_tickers[futures[future]] = 'deadline'
+        for reason in self.missing_tickers.values():
+            self.metrics.count(f"{reason}s")
+
+        return results
+
+    def close(self):
+        """結束抓取執行緒池 (等待仍在執行的請求逾時結束)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._inflight = {}
+
+    def _build_sector_row(self, ticker, name, data, time_info):
+        """將單檔抓取結果整理為 sector_data 的一列"""
+        if not (data and data['current_price'] and data['prev_close']):
+            return None
+
+        current_price = data['current_price']
+        prev_close = data['prev_close']
+        change_pct = ((current_price - prev_close) / prev_close) * 100
+        
+        hist = data['hist']
+        if len(hist) > 0:
+            latest_volume = hist['Volume'].iloc[-1]
+            volume_ratio = None
+            if self.realtime and self.volume_profile:
+                # 與過去 N 日同一分鐘的平均量比較,不受開收盤量大的影響
+                volume_ratio = self.volume_profile.volume_ratio(ticker, hist.index[-1], latest_volume)
+            if volume_ratio is None:
+                avg_volume = hist['Volume'].mean()
+                volume_ratio = latest_volume / avg_volume if avg_volume > 0 else 1
+        else:
+            latest_volume = 0
+            volume_ratio = 1
+        
+        flow_strength = change_pct * volume_ratio
+        # 以最新 K 線時間為觀測識別: 同一根 K 線 (進行中或休市) 只佔一個觀測值
+        stats = self.flow_stats.update(ticker, flow_strength, str(hist.index[-1]) if len(hist) > 0 else None)
+        
+        sector_type = '核心板塊' if ticker in US_SECTOR_ETFS else '主題板塊'
+        last_update = datetime.now(self.tw_tz).strftime('%H:%M:%S')
+        
+        emoji = '🔥' if change_pct > 3 else '📈' if change_pct > 0 else '📉'
+        print(f"{emoji} {ticker:6s} ({name:25s}): {change_pct:+6.2f}% | ${current_price:8.2f} | 量能: {volume_ratio:.2f}x")
+        
+        return {
+            'ticker': ticker,
+            'name': name,
+            'type': sector_type,
+            'price': round(current_price, 2),
+            'prev_close': round(prev_close, 2),
+            'change_pct': round(change_pct, 2),
+            'volume': int(latest_volume),
+            'volume_ratio': round(volume_ratio, 2),
+            'flow_strength': round(flow_strength, 2),
+            'flow_z': stats['z'],
+            'flow_momentum': stats['momentum'],
+            'last_update': last_update,
+            'market_status': time_info['market_status']
+        }
+
     def map_to_taiwan_sectors(self, us_sectors):
         """對應到台股族群"""
         print("\n" + "="*70)
@@ -394,8 +580,8 @@ class SectorFlowTracker:
         
         for sector in us_sectors:
             ticker = sector['ticker']
-            if ticker in SECTOR_MAPPING:
-                tw_info = SECTOR_MAPPING[ticker]
+            tw_info = self.mapping.sector_mapping.get(ticker)
+            if tw_info:
                 
                 result = {
                     'us_sector': sector['name'],
@@ -410,7 +596,9 @@ class SectorFlowTracker:
                     'tw_stocks': tw_info['tw_stocks'],
                     'industry_detail': tw_info.get('industry_detail', ''),
                     'related_themes': tw_info.get('related_themes', []),
-                    'signal': self._generate_signal(sector['flow_strength']),
+                    'flow_z': sector.get('flow_z'),
+                    'flow_momentum': sector.get('flow_momentum'),
+                    'signal': self._generate_signal(sector['flow_strength'], sector.get('flow_z')),
                     'strength_level': self._get_strength_level(sector['flow_strength']),
                     'last_update': sector['last_update'],
                     'market_status': sector['market_status']
@@ -420,35 +608,24 @@ class SectorFlowTracker:
         
         return mapped_results
 
-    def _generate_signal(self, flow_strength):
-        """生成交易信號"""
-        if flow_strength > 10:
-            return '🔥🔥 爆量流入'
-        elif flow_strength > 5:
-            return '🔥 強勁流入'
-        elif flow_strength > 2:
-            return '📈 資金流入'
-        elif flow_strength > -2:
-            return '➡️ 持平'
-        elif flow_strength > -5:
-            return '📉 資金流出'
-        elif flow_strength > -10:
-            return '❄️ 大量流出'
-        else:
-            return '❄️❄️ 恐慌流出'
+    def _generate_signal(self, flow_strength, flow_z=None):
+        """生成交易信號 (zscore_signals 開啟且有 z 分數時以 z 分數門檻判斷)"""
+        if self.zscore_signals and flow_z is not None:
+            for threshold, signal in Z_SIGNAL_THRESHOLDS:
+                if flow_z > threshold:
+                    return signal
+            return SIGNAL_FLOOR
+        for threshold, signal in SIGNAL_THRESHOLDS:
+            if flow_strength > threshold:
+                return signal
+        return SIGNAL_FLOOR
 
     def _get_strength_level(self, flow_strength):
         """獲取強度等級"""
-        if flow_strength > 10:
-            return 5
-        elif flow_strength > 5:
-            return 4
-        elif flow_strength > 2:
-            return 3
-        elif flow_strength > -2:
-            return 2
-        else:
-            return 1
+        for threshold, level in STRENGTH_THRESHOLDS:
+            if flow_strength > threshold:
+                return level
+        return 1
 
     def generate_report(self, mapped_data):
         """生成報告"""
@@ -482,7 +659,10 @@ class SectorFlowTracker:
             report += f"\n{i}. {data['signal']} {stars} | {data['us_sector']}\n"
             report += f"   類型: {data['sector_type']} | 更新: {data['last_update']}\n"
             report += f"   美股: {data['us_ticker']} | 價格: ${data['current_price']:.2f} ({data['us_change']:+.2f}%)\n"
-            report += f"   資金強度: {data['flow_strength']:.2f} | 量能比: {data['volume_ratio']:.2f}x\n"
+            report += f"   資金強度: {data['flow_strength']:.2f} | 量能比: {data['volume_ratio']:.2f}x"
+            if data.get('flow_z') is not None:
+                report += f" | z 分數: {data['flow_z']:+.2f} | 動能: {data['flow_momentum']:+.2f}"
+            report += "\n"
             report += f"\n   📍 台股對應產業: {', '.join(data['tw_sectors'][:3])}\n"
             report += f"   🏭 細分產業: {data['industry_detail']}\n"
             report += f"   💡 建議關注個股:\n"
@@ -530,11 +710,11 @@ class SectorFlowTracker:
         
         return report
 
-    def save_to_json(self, mapped_data, filename='sector_flow_data.json'):
-        """儲存為 JSON"""
+    def build_output(self, mapped_data):
+        """sector_flow_data.json 的內容"""
         time_info = self.get_current_time_info()
 
-        output = {
+        return {
             'update_time': datetime.now(self.tw_tz).isoformat(),
             'us_time': time_info['us_time'],
             'tw_time': time_info['tw_time'],
@@ -546,34 +726,75 @@ class SectorFlowTracker:
                 'inflow_count': len([d for d in mapped_data if d['flow_strength'] > 2]),
                 'outflow_count': len([d for d in mapped_data if d['flow_strength'] < -2]),
                 'top_sector': mapped_data[0]['us_sector'] if mapped_data else None,
-                'worst_sector': mapped_data[-1]['us_sector'] if mapped_data else None
+                'worst_sector': mapped_data[-1]['us_sector'] if mapped_data else None,
+                'missing_tickers': sorted(self.missing_tickers)
             }
         }
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
+    def save_to_json(self, mapped_data, filename='sector_flow_data.json', fingerprint=None, output=None):
+        """
+        在背景寫入 JSON (fingerprint 與上次發佈相同時略過)
+        output: 已建立的 build_output 結果 (與 API 快照共用同一份)
+        """
+        output = output if output is not None else self.build_output(mapped_data)
+        return self.publisher.publish(filename, json_text, output, fingerprint=fingerprint)
 
-        print(f"\n💾 資料已儲存至 {filename}")
+    def save_to_markdown(self, report, filename='README.md', fingerprint=None):
+        """在背景寫入 Markdown 報告 (fingerprint 與上次發佈相同時略過)"""
+        return self.publisher.publish(filename, str, report, fingerprint=fingerprint)
 
-    def save_to_markdown(self, report, filename='README.md'):
-        """儲存為 Markdown"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(report)
+    def save_to_history(self, mapped_data, legacy_csv='sector_flow_history.csv', fingerprint=None):
+        """
+        在背景附加本輪快照到歷史資料庫 (首次執行時自動匯入舊版 CSV)
+        fingerprint 與上次附加時相同 (例如休市期間資料未變動) 時不重複附加
+        """
+        if self.history_store.is_empty() and os.path.exists(legacy_csv):
+            self.history_store.migrate_csv(legacy_csv)
 
-        print(f"📝 報告已儲存至 {filename}")
+        now = datetime.now(self.tw_tz)
+        fingerprint = fingerprint or content_hash([now.isoformat(), mapped_data])
+        return self.publisher.submit(self.history_store.root, fingerprint, self.history_store.append,
+                                     mapped_data, now.strftime('%Y-%m-%d'), now.strftime('%H:%M:%S'),
+                                     message=f"📊 歷史資料已附加 {{}} 筆至 {self.history_store.root}/")
 
-    def save_to_csv(self, mapped_data, filename='sector_flow_history.csv'):
-        """儲存歷史記錄"""
-        df = pd.DataFrame(mapped_data)
-        df['date'] = datetime.now(self.tw_tz).strftime('%Y-%m-%d')
-        df['time'] = datetime.now(self.tw_tz).strftime('%H:%M:%S')
+    def content_fingerprint(self, mapped_data):
+        """本輪輸出內容的雜湊 (不含每輪都會變動的更新時間)"""
+        return content_hash({
+            'market_status': self.get_current_time_info()['market_status'],
+            'is_realtime': self.realtime,
+            'missing_tickers': sorted(self.missing_tickers),
+            'sectors': [{k: v for k, v in d.items() if k != 'last_update'} for d in mapped_data],
+        })
+
+    def publish(self, mapped_data, report, output=None):
+        """
+        送出本輪的輸出檔 (JSON / README / 歷史資料),在背景產生並寫入
+        output: sector_flow_data.json 的內容 (未提供時由 build_output 建立)
+        """
+        # 上一輪的輸出尚未完成時先等待,確保同一檔案依序發佈
+        self.publisher.wait()
+        fingerprint = self.content_fingerprint(mapped_data)
+        self.save_to_json(mapped_data, fingerprint=fingerprint, output=output)
+        self.save_to_markdown(report, fingerprint=fingerprint)
+        self.save_to_history(mapped_data, fingerprint=fingerprint)
 
-        if os.path.exists(filename):
-            existing_df = pd.read_csv(filename)
-            df = pd.concat([existing_df, df], ignore_index=True)
+    def _source_stats(self):
+        """各資料來源目前的累計統計 (每輪前後相減得到本輪的請求數 / 傳輸量)"""
+        stats = {}
+        if self.stream:
+            stats['intraday'] = dict(self.stream.source.stats)
+        if self.volume_profile:
+            stats['volume_profile'] = dict(self.volume_profile.stats)
+        stats['publish'] = dict(self.publisher.stats)
+        return stats
 
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
-        print(f"📊 歷史資料已更新至 {filename}")
+    def _finish_cycle(self, before, **extra):
+        """彙整本輪指標: 印出各階段耗時並附加到指標檔"""
+        for prefix, after in self._source_stats().items():
+            self.metrics.count_stats(prefix, before.get(prefix, {}), after)
+        print("\n" + self.metrics.summary())
+        if self.metrics_file:
+            append_jsonl(self.metrics_file, self.metrics.record(**extra))
 
     def run(self, continuous=False, interval=300):
         """執行完整流程"""
@@ -581,15 +802,27 @@ class SectorFlowTracker:
         print("="*70)
 
         while True:
+            self.metrics = CycleMetrics()
+            before = self._source_stats()
             try:
-                us_sectors = self.fetch_sector_data()
-                mapped_data = self.map_to_taiwan_sectors(us_sectors)
-                report = self.generate_report(mapped_data)
+                with self.metrics.stage('fetch'):
+                    us_sectors = self.fetch_sector_data()
+                self.flow_stats.save()
+                with self.metrics.stage('map'):
+                    mapped_data = self.map_to_taiwan_sectors(us_sectors)
+                with self.metrics.stage('report'):
+                    report = self.generate_report(mapped_data)
                 print(report)
 
-                self.save_to_json(mapped_data)
-                self.save_to_markdown(report)
-                self.save_to_csv(mapped_data)
+                output = self.build_output(mapped_data)
+                with self.metrics.stage('publish'):
+                    self.publish(mapped_data, report, output)
+                    # 持續模式下輸出在背景完成,不延誤下一輪
+                    if not continuous:
+                        self.publisher.wait()
+                if self.api:
+                    self.api.update(flow=output)
+                self._finish_cycle(before, sectors=len(mapped_data))
 
                 print("\n✅ 執行完成！")
                 print("="*70)
@@ -608,14 +841,48 @@ class SectorFlowTracker:
                 break
             except Exception as e:
                 print(f"\n❌ 錯誤: {e}")
+                self._finish_cycle(before, error=str(e))
                 if continuous:
                     print(f"⏰ {interval}秒後重試...")
                     time.sleep(interval)
                 else:
                     break
 
+        self.close()
+        self.publisher.close()
+        print(self.publisher.report())
         return mapped_data if 'mapped_data' in locals() else []
 
+def main():
+    p = argparse.ArgumentParser(description="美股板塊資金流向 -> 台股族群追蹤")
+    p.add_argument('--continuous', action='store_true', help="持續更新")
+    p.add_argument('--interval', type=int, default=300, help="持續更新間隔秒數")
+    p.add_argument('--metrics', nargs='?', const='tracker_metrics.jsonl', default=None,
+                   help="每輪效能指標輸出檔 (JSON Lines,預設 tracker_metrics.jsonl;未指定時不寫檔)")
+    p.add_argument('--zscore-signals', action='store_true', help="以 flow_strength 的滾動 z 分數判斷交易信號")
+    p.add_argument('--serve', nargs='?', type=int, const=DEFAULT_PORT, default=None,
+                   help=f"同時啟動 HTTP JSON API (預設埠 {DEFAULT_PORT}),每輪完成後更新")
+    p.add_argument('--profile', nargs='?', const='logs/tracker_profile.prof', default=None,
+                   help="以 cProfile 分析本次執行並輸出報告 (含抓取執行緒池的工作;預設 logs/tracker_profile.prof)")
+    args = p.parse_args()
+    if args.serve is not None and not args.continuous:
+        p.error("--serve 需搭配 --continuous (單次執行結束後程序就會結束,API 無法持續提供)")
+
+    tracker = SectorFlowTracker(include_themes=True, realtime=True, metrics_file=args.metrics,
+                                zscore_signals=args.zscore_signals)
+    if args.serve is not None:
+        try:
+            tracker.api = ApiServer(ApiState(load_snapshot('sector_flow_data.json', 'out')), port=args.serve).start()
+        except OSError as e:
+            print(f"❌ API server 無法啟動: {e}")
+            return 1
+    if args.profile:
+        with profiled(args.profile):
+            tracker.run(continuous=args.continuous, interval=args.interval)
+    else:
+        tracker.run(continuous=args.continuous, interval=args.interval)
+    return 0
+
+
 if __name__ == '__main__':
-    tracker = SectorFlowTracker(include_themes=True, realtime=True)
-    tracker.run(continuous=False)
+    raise SystemExit(main())
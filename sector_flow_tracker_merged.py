@@ -20,6 +20,8 @@ from zoneinfo import ZoneInfo
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from mapping_index import load_mapping_index
+
 
 # ============================================================================
 # 配置和數據定義
@@ -103,6 +105,7 @@ class SectorFlowTracker:
         self.results = []
         self.output_dir = Path('output')
         self.output_dir.mkdir(exist_ok=True)
+        self.mapping = load_mapping_index()
 
     def get_timestamp(self) -> str:
         """即時抓取電腦時間（台北時區）並回傳格式化字串。"""
@@ -179,8 +182,8 @@ class SectorFlowTracker:
             ticker = sector['us_ticker']
             
             # 加入台股族群信息
-            if ticker in SECTOR_MAPPING:
-                tw_groups = SECTOR_MAPPING[ticker]['tw_groups']
+            if ticker in self.mapping.merged_groups:
+                tw_groups = self.mapping.merged_groups[ticker]
                 sector['tw_groups'] = tw_groups
                 print(f"✅ {sector['signal']} {sector['us_sector']:35s} → {', '.join(tw_groups)}")
             else:
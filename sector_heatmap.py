@@ -12,20 +12,29 @@ Outputs:
   out/tw_themes_ranked.json                (台股族群：依對應美股板塊漲跌加權後排序)
   out/tw_theme_constituents.json           (台股族群 -> 個股清單)
   out/us_sector_to_tw_picks.json           (美股板塊 -> 台股族群 -> 台股個股)
+  out/tw_theme_heatmap.json                (台股族群：以成分股實際漲跌計算的中位數/成交值加權/漲跌家數/離散度)
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import io
 import json
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 
+import numpy as np
 import yfinance as yf
 
+from mapping_index import LEARNED_US2TW, load_mapping_index
+from publisher import atomic_write
+from symbol_resolver import SymbolResolver
+from ticker_metadata import TickerMetadataCache
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -37,6 +46,7 @@ class SectorQuote:
     price: float
     change: float
     change_pct: float
+    volume: float = 0.0
 
 
 def read_csv(path: Path, encoding: str = "utf-8-sig") -> List[dict]:
@@ -45,30 +55,129 @@ def read_csv(path: Path, encoding: str = "utf-8-sig") -> List[dict]:
         return list(csv.DictReader(f))
 
 
-def write_csv(path: Path, header: List[str], rows: List[dict]) -> None:
-    """寫入 CSV 檔案"""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8-sig", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=header)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in header})
+def _write_if_changed(path: Path, text: str, encoding: str) -> bool:
+    """內容與現有檔案相同時不重寫 (寫入時先寫暫存檔再換名)，回傳是否實際寫入"""
+    data = text.encode(encoding)
+    if path.exists() and path.read_bytes() == data:
+        logger.info(f"➖ 內容未變動，略過: {path}")
+        return False
+    atomic_write(str(path), data)
     logger.info(f"✅ 已儲存: {path}")
+    return True
+
+
+def write_csv(path: Path, header: List[str], rows: List[dict]) -> bool:
+    """寫入 CSV 檔案"""
+    buf = io.StringIO(newline="")
+    w = csv.DictWriter(buf, fieldnames=header)
+    w.writeheader()
+    for r in rows:
+        w.writerow({k: r.get(k, "") for k in header})
+    return _write_if_changed(path, buf.getvalue(), "utf-8-sig")
 
 
-def write_json(path: Path, obj) -> None:
+def write_json(path: Path, obj) -> bool:
     """寫入 JSON 檔案"""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    logger.info(f"✅ 已儲存: {path}")
+    return _write_if_changed(path, json.dumps(obj, ensure_ascii=False, indent=2), "utf-8")
+
+
+def _quote_from_closes(t: str, name: str, price: float, prev: float, volume: float = 0.0) -> SectorQuote:
+    """由最新價與前一日收盤價組出 SectorQuote"""
+    change = price - prev
+    change_pct = (change / prev * 100.0) if prev else 0.0
+    return SectorQuote(
+        ticker=t,
+        name=name,
+        price=round(price, 4),
+        change=round(change, 4),
+        change_pct=round(change_pct, 4),
+        volume=volume,
+    )
+
+
+def _download_closes(sector_tickers: List[str]) -> Dict[str, Tuple[float, float, float]]:
+    """
+    以單一 yf.download 請求批次抓取所有 ticker 最近 5 日日線。
+
+    Returns:
+        {ticker: (last_close, prev_close, last_volume)}，批次結果中缺漏的 ticker 不會出現
+    """
+    if not sector_tickers:
+        return {}
+
+    data = yf.download(
+        sector_tickers,
+        period="5d",
+        interval="1d",
+        group_by="ticker",
+        auto_adjust=False,
+        threads=True,
+        progress=False,
+    )
+    if data is None or data.empty:
+        return {}
+
+    closes: Dict[str, Tuple[float, float, float]] = {}
+    multi = getattr(data.columns, "nlevels", 1) > 1
+    for t in sector_tickers:
+        try:
+            if multi:
+                if t not in data.columns.get_level_values(0):
+                    continue
+                frame = data[t]
+            else:
+                # 單一 ticker 時 yfinance 可能回傳平面欄位
+                if len(sector_tickers) != 1:
+                    continue
+                frame = data
+        except KeyError:
+            continue
+
+        frame = frame.dropna(subset=["Close"])
+        if frame.empty:
+            continue
+        close = frame["Close"]
+        price = float(close.iloc[-1])
+        prev = float(close.iloc[-2]) if len(close) >= 2 else price
+        volume = float(frame["Volume"].iloc[-1]) if "Volume" in frame else 0.0
+        if price:
+            closes[t] = (price, prev, volume)
+
+    return closes
+
+
+def _fetch_single_quote(t: str) -> SectorQuote:
+    """單檔抓取：fast_info，無資料時再以 history 補救"""
+    ticker_obj = yf.Ticker(t)
+    info = ticker_obj.fast_info
 
+    price = float(info.get("last_price", 0.0) or 0.0)
+    prev = float(info.get("previous_close", 0.0) or 0.0)
+    volume = float(info.get("last_volume", 0.0) or 0.0)
 
-def fetch_sector_quotes(sector_tickers: List[str]) -> Dict[str, SectorQuote]:
+    # 如果 fast_info 無資料，嘗試 history
+    if price == 0.0:
+        hist = ticker_obj.history(period='5d', interval='1d')
+        if not hist.empty:
+            price = float(hist['Close'].iloc[-1])
+            prev = float(hist['Close'].iloc[-2]) if len(hist) >= 2 else price
+            if 'Volume' in hist:
+                volume = float(hist['Volume'].iloc[-1])
+
+    name = info.get("longName") or info.get("shortName") or t
+    return _quote_from_closes(t, name, price, prev, volume)
+
+
+def fetch_sector_quotes(sector_tickers: List[str], batch: bool = True) -> Dict[str, SectorQuote]:
     """
     用 yfinance 抓 ticker 的即時/延遲報價資訊。
+
+    預設先以一次批次下載取得所有 ticker 的最新價/前收，
+    只有批次結果缺漏的 ticker 才逐檔以 fast_info/history 補抓。
     
     Args:
         sector_tickers: 美股板塊 ETF 代碼列表
+        batch: False 時退回逐檔抓取 (僅供比較/除錯)
         
     Returns:
         {ticker: SectorQuote} 的字典
@@ -77,35 +186,23 @@ def fetch_sector_quotes(sector_tickers: List[str]) -> Dict[str, SectorQuote]:
     
     logger.info(f"🔍 正在抓取 {len(sector_tickers)} 檔美股板塊 ETF 報價...")
 
-    # 用 fast_info 方法取得快速報價 (更穩定)
+    closes: Dict[str, Tuple[float, float, float]] = {}
+    if batch:
+        try:
+            closes = _download_closes(sector_tickers)
+            logger.info(f"  📦 批次下載取得 {len(closes)}/{len(sector_tickers)} 檔")
+        except Exception as e:
+            logger.warning(f"  ⚠️  批次下載失敗，改為逐檔抓取: {e}")
+
     for t in sector_tickers:
         try:
-            ticker_obj = yf.Ticker(t)
-            info = ticker_obj.fast_info
-            
-            price = float(info.get("last_price", 0.0) or 0.0)
-            prev = float(info.get("previous_close", 0.0) or 0.0)
-            
-            # 如果 fast_info 無資料，嘗試 history
-            if price == 0.0:
-                hist = ticker_obj.history(period='5d', interval='1d')
-                if not hist.empty:
-                    price = float(hist['Close'].iloc[-1])
-                    prev = float(hist['Close'].iloc[-2]) if len(hist) >= 2 else price
-            
-            change = price - prev
-            change_pct = (change / prev * 100.0) if prev else 0.0
-            
-            name = info.get("longName") or info.get("shortName") or t
-            
-            quotes[t] = SectorQuote(
-                ticker=t,
-                name=name,
-                price=round(price, 4),
-                change=round(change, 4),
-                change_pct=round(change_pct, 4),
-            )
-            logger.info(f"  ✓ {t:6s} {name:30s} {price:8.2f} {change_pct:+7.2f}%")
+            if t in closes:
+                price, prev, volume = closes[t]
+                q = _quote_from_closes(t, t, price, prev, volume)
+            else:
+                q = _fetch_single_quote(t)
+            quotes[t] = q
+            logger.info(f"  ✓ {t:6s} {q.name:30s} {q.price:8.2f} {q.change_pct:+7.2f}%")
         except Exception as e:
             logger.warning(f"  ⚠️  {t} 抓取失敗: {e}")
             # 最弱容錯：至少不讓整支程式掛掉
@@ -114,6 +211,450 @@ def fetch_sector_quotes(sector_tickers: List[str]) -> Dict[str, SectorQuote]:
     return quotes
 
 
+@dataclass(frozen=True)
+class ThemeWeightMatrix:
+    """
+    美股板塊 x 台股族群 稀疏權重矩陣 (COO 格式)。
+
+    rows[k] / cols[k] / weights[k] 表示 sectors[rows[k]] -> themes[cols[k]] 的對應權重；
+    非零元素依 cols 排序，max 聚合可直接用 np.maximum.reduceat。
+    """
+    sectors: List[str]
+    themes: List[str]
+    rows: np.ndarray
+    cols: np.ndarray
+    weights: np.ndarray
+
+    @classmethod
+    def from_mapping(cls, sectors: List[str], us_to_tw: Dict[str, List[str]],
+                     weights: Optional[Dict[str, Dict[str, float]]] = None) -> "ThemeWeightMatrix":
+        """
+        由 us_ticker -> [tw_theme] 對應建立矩陣。
+        themes 依首次出現順序排列；weights 未提供的對應以 1.0 計。
+        """
+        weights = weights or {}
+        theme_pos: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for i, t in enumerate(sectors):
+            for theme in us_to_tw.get(t, []):
+                rows.append(i)
+                cols.append(theme_pos.setdefault(theme, len(theme_pos)))
+                vals.append(float(weights.get(t, {}).get(theme, 1.0)))
+
+        rows_a = np.asarray(rows, dtype=np.int64)
+        cols_a = np.asarray(cols, dtype=np.int64)
+        vals_a = np.asarray(vals, dtype=np.float64)
+        order = np.argsort(cols_a, kind="stable")
+        return cls(
+            sectors=list(sectors),
+            themes=list(theme_pos),
+            rows=rows_a[order],
+            cols=cols_a[order],
+            weights=vals_a[order],
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.sectors), len(self.themes)
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """W^T x：每個族群的 sum(weight * x[sector])"""
+        return np.bincount(self.cols, weights=self.weights * x[self.rows], minlength=len(self.themes))
+
+    def subset(self, theme_idx: np.ndarray) -> "ThemeWeightMatrix":
+        """只保留指定族群 (theme_idx 需已排序) 的子矩陣，sectors 不變"""
+        theme_idx = np.asarray(theme_idx, dtype=np.int64)
+        mask = np.isin(self.cols, theme_idx)
+        return ThemeWeightMatrix(
+            sectors=self.sectors,
+            themes=[self.themes[i] for i in theme_idx.tolist()],
+            rows=self.rows[mask],
+            cols=np.searchsorted(theme_idx, self.cols[mask]),
+            weights=self.weights[mask],
+        )
+
+    def segment_starts(self) -> np.ndarray:
+        """每個族群在 (已依 cols 排序的) 非零元素中的起始位置"""
+        return np.searchsorted(self.cols, np.arange(len(self.themes)))
+
+
+Aggregator = Callable[[ThemeWeightMatrix, np.ndarray, np.ndarray], np.ndarray]
+
+
+def _agg_max(m: ThemeWeightMatrix, change: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    if not len(m.cols):
+        return np.zeros(len(m.themes))
+    return np.maximum.reduceat(change[m.rows], m.segment_starts())
+
+
+def _agg_mean(m: ThemeWeightMatrix, change: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    counts = np.bincount(m.cols, minlength=len(m.themes))
+    sums = np.bincount(m.cols, weights=change[m.rows], minlength=len(m.themes))
+    return np.divide(sums, counts, out=np.zeros(len(m.themes)), where=counts > 0)
+
+
+def _agg_weighted(m: ThemeWeightMatrix, change: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    total = m.matvec(np.ones(len(m.sectors)))
+    return np.divide(m.matvec(change), total, out=np.zeros(len(m.themes)), where=total != 0)
+
+
+def _agg_volume(m: ThemeWeightMatrix, change: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    total = m.matvec(volume)
+    scores = np.divide(m.matvec(change * volume), total, out=np.zeros(len(m.themes)), where=total != 0)
+    # 沒有成交量資料的族群退回 mapping 權重加權
+    return np.where(total != 0, scores, _agg_weighted(m, change, volume))
+
+
+# 族群熱度聚合方式：max (預設，與舊版相同)、mean、weighted (mapping 權重)、volume (成交量加權)
+AGGREGATORS: Dict[str, Aggregator] = {
+    "max": _agg_max,
+    "mean": _agg_mean,
+    "weighted": _agg_weighted,
+    "volume": _agg_volume,
+}
+
+
+def score_themes(matrix: ThemeWeightMatrix, change_pct: np.ndarray,
+                 volume: Optional[np.ndarray] = None, aggregator: str = "max") -> np.ndarray:
+    """
+    一次計算所有族群的熱度分數。
+
+    Args:
+        matrix: 板塊 x 族群權重矩陣
+        change_pct: 依 matrix.sectors 排列的漲跌幅
+        volume: 依 matrix.sectors 排列的成交量 (volume 聚合使用)
+        aggregator: AGGREGATORS 中的名稱
+
+    Returns:
+        依 matrix.themes 排列的分數
+    """
+    if aggregator not in AGGREGATORS:
+        raise ValueError(f"未知的聚合方式: {aggregator} (可用: {', '.join(AGGREGATORS)})")
+    change = np.asarray(change_pct, dtype=np.float64)
+    vol = np.zeros_like(change) if volume is None else np.asarray(volume, dtype=np.float64)
+    return AGGREGATORS[aggregator](matrix, change, vol)
+
+
+class HeatmapState:
+    """
+    常駐模式的記憶體狀態：對應表、權重矩陣、最近一次報價與各輸出的中間結果。
+
+    apply_quotes 只重算漲跌幅變動超過門檻的板塊所影響的 picks 與族群分數。
+    """
+
+    def __init__(self, sector_tickers: List[str], us_to_tw: Dict[str, List[str]],
+                 us_sector_name: Dict[str, str], tw_theme_to_stocks: Dict[str, List[dict]],
+                 weights: Optional[Dict[str, Dict[str, float]]] = None, aggregator: str = "max"):
+        self.sector_tickers = sector_tickers
+        self.us_to_tw = us_to_tw
+        self.us_sector_name = us_sector_name
+        self.tw_theme_to_stocks = tw_theme_to_stocks
+        self.aggregator = aggregator
+        self.matrix = ThemeWeightMatrix.from_mapping(sector_tickers, us_to_tw, weights)
+        self.sector_pos = {t: i for i, t in enumerate(self.matrix.sectors)}
+
+        self.quotes: Dict[str, SectorQuote] = {}
+        self.change = np.zeros(len(self.matrix.sectors))
+        self.volume = np.zeros(len(self.matrix.sectors))
+        self.scores = np.zeros(len(self.matrix.themes))
+        self.picks: Dict[str, dict] = {}
+        self.theme_sources: Dict[str, List[dict]] = {}
+        self.tw_quotes: Optional[Dict[str, SectorQuote]] = None
+
+    def apply_quotes(self, quotes: Dict[str, SectorQuote], threshold: Optional[float] = None) -> List[str]:
+        """
+        套用新報價。
+
+        Args:
+            quotes: {ticker: SectorQuote}
+            threshold: change_pct 變動超過此值 (百分點) 才視為有變化；None 表示全部重算
+
+        Returns:
+            本次有變化 (已重算) 的 ticker 列表
+        """
+        changed = []
+        for t in self.sector_tickers:
+            q = quotes.get(t)
+            if q is None:
+                continue
+            old = self.quotes.get(t)
+            if threshold is None or old is None or abs(q.change_pct - old.change_pct) > threshold:
+                changed.append(t)
+
+        if not changed:
+            return changed
+
+        for t in changed:
+            q = quotes[t]
+            self.quotes[t] = q
+            self.change[self.sector_pos[t]] = q.change_pct
+            self.volume[self.sector_pos[t]] = q.volume
+            self.picks[t] = self._pick_entry(t)
+
+        rows = np.array([self.sector_pos[t] for t in changed], dtype=np.int64)
+        affected = np.unique(self.matrix.cols[np.isin(self.matrix.rows, rows)])
+        self._rescore(affected)
+        return changed
+
+    def _pick_entry(self, t: str) -> dict:
+        q = self.quotes[t]
+        return {
+            "us_sector": {
+                "ticker": t,
+                "name": self.us_sector_name.get(t, q.name),
+                "price": q.price,
+                "change": q.change,
+                "change_pct": q.change_pct,
+            },
+            "tw_themes": [
+                {
+                    "tw_theme": theme,
+                    "stocks": self.tw_theme_to_stocks.get(theme, [])
+                }
+                for theme in self.us_to_tw.get(t, [])
+            ]
+        }
+
+    def _rescore(self, theme_idx: np.ndarray) -> None:
+        """只重算指定族群的分數與來源板塊清單"""
+        if not len(theme_idx):
+            return
+        sub = self.matrix.subset(theme_idx)
+        self.scores[theme_idx] = score_themes(sub, self.change, self.volume, self.aggregator)
+
+        for r, c in zip(sub.rows.tolist(), sub.cols.tolist()):
+            self.theme_sources[sub.themes[c]] = []
+        for r, c in zip(sub.rows.tolist(), sub.cols.tolist()):
+            t = sub.sectors[r]
+            q = self.quotes.get(t)
+            if q is None:
+                continue
+            self.theme_sources[sub.themes[c]].append({
+                "us_sector_ticker": t,
+                "us_sector_name": self.us_sector_name.get(t, q.name),
+                "change_pct": float(q.change_pct),
+            })
+
+    def us_rows(self) -> List[dict]:
+        rows = []
+        for t in self.sector_tickers:
+            q = self.quotes[t]
+            rows.append({
+                "us_sector_ticker": q.ticker,
+                "us_sector_name": self.us_sector_name.get(t, q.name),
+                "price": q.price,
+                "change": q.change,
+                "change_pct": q.change_pct,
+            })
+        rows.sort(key=lambda r: float(r["change_pct"]), reverse=True)
+        return rows
+
+    def picks_list(self) -> List[dict]:
+        return [self.picks[t] for t in self.sector_tickers]
+
+    def ranked(self) -> List[dict]:
+        ranked = []
+        for c in np.argsort(-self.scores, kind="stable").tolist():
+            theme = self.matrix.themes[c]
+            ranked.append({
+                "tw_theme": theme,
+                "score_change_pct": round(float(self.scores[c]), 4),
+                "sources": sorted(self.theme_sources.get(theme, []), key=lambda r: r["change_pct"], reverse=True),
+                "stock_count": len(self.tw_theme_to_stocks.get(theme, [])),
+            })
+        return ranked
+
+
+def fetch_tw_quotes(stock_codes: List[str], resolver: Optional[SymbolResolver] = None) -> Dict[str, SectorQuote]:
+    """
+    批次抓取台股個股報價 (重複代碼只抓一次)。
+
+    已解析交易所後綴的代碼直接以該後綴下載，其餘先以 .TW 一次批次下載，
+    缺漏者再以 .TWO 批次下載一次；解析結果寫回 resolver。
+
+    Returns:
+        {stock_code: SectorQuote}，查無報價的代碼不會出現
+    """
+    codes = list(dict.fromkeys(stock_codes))
+    candidates = {c: (resolver.candidates(c) if resolver else [".TW", ".TWO"]) for c in codes}
+    logger.info(f"🔍 正在批次抓取 {len(codes)} 檔台股成分股報價...")
+
+    closes: Dict[str, Tuple[float, float, float]] = {}
+    suffix_of: Dict[str, str] = {}
+
+    def download(suffix: str, batch: List[str]) -> None:
+        if not batch:
+            return
+        try:
+            got = _download_closes([f"{c}{suffix}" for c in batch])
+        except Exception as e:
+            logger.warning(f"  ⚠️  {suffix} 批次下載失敗: {e}")
+            got = {}
+        for c in batch:
+            if f"{c}{suffix}" in got:
+                closes[c] = got[f"{c}{suffix}"]
+                suffix_of[c] = suffix
+        logger.info(f"  📦 {suffix} 批次取得 {sum(1 for c in batch if c in closes)}/{len(batch)} 檔")
+
+    download(".TW", [c for c in codes if candidates[c][:1] == [".TW"]])
+    # 已知上櫃股票與 .TW 批次中沒有資料的未解析股票
+    download(".TWO", [c for c in codes if candidates[c] == [".TWO"]
+                      or (len(candidates[c]) > 1 and c not in closes)])
+
+    if resolver is not None:
+        resolver.record_many({c: suffix_of[c] for c in codes if c in suffix_of and len(candidates[c]) > 1})
+
+    return {c: _quote_from_closes(c, c, *closes[c]) for c in codes if c in closes}
+
+
+def _segment_median(m: ThemeWeightMatrix, x: np.ndarray) -> np.ndarray:
+    """每個族群成分的中位數 (依族群、數值排序後取中間位置)"""
+    n = len(m.themes)
+    if not len(m.cols):
+        return np.zeros(n)
+    vals = x[m.rows]
+    order = np.lexsort((vals, m.cols))
+    v = vals[order]
+    counts = np.bincount(m.cols, minlength=n)
+    starts = m.segment_starts()
+    lo = np.clip(starts + (counts - 1) // 2, 0, len(v) - 1)
+    hi = np.clip(starts + counts // 2, 0, len(v) - 1)
+    return np.where(counts > 0, (v[lo] + v[hi]) / 2.0, 0.0)
+
+
+def constituent_stats(matrix: ThemeWeightMatrix, change_pct: np.ndarray,
+                      turnover: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    以成分股漲跌一次算出所有族群的統計量 (matrix 的列為個股、欄為族群)。
+
+    Returns:
+        依 matrix.themes 排列的 count / median / mean / weighted (成交值加權) /
+        advancers / decliners / breadth (上漲家數比例) / dispersion (標準差)
+    """
+    n = len(matrix.themes)
+    x = np.asarray(change_pct, dtype=np.float64)
+    counts = np.bincount(matrix.cols, minlength=n).astype(np.float64)
+    mean = _agg_mean(matrix, x, turnover)
+    sq = np.bincount(matrix.cols, weights=x[matrix.rows] ** 2, minlength=n)
+    var = np.divide(sq, counts, out=np.zeros(n), where=counts > 0) - mean ** 2
+    advancers = np.bincount(matrix.cols, weights=(x[matrix.rows] > 0).astype(np.float64), minlength=n)
+    decliners = np.bincount(matrix.cols, weights=(x[matrix.rows] < 0).astype(np.float64), minlength=n)
+    return {
+        "count": counts,
+        "median": _segment_median(matrix, x),
+        "mean": mean,
+        "weighted": _agg_volume(matrix, x, np.asarray(turnover, dtype=np.float64)),
+        "advancers": advancers,
+        "decliners": decliners,
+        "breadth": np.divide(advancers, counts, out=np.zeros(n), where=counts > 0),
+        "dispersion": np.sqrt(np.maximum(var, 0.0)),
+    }
+
+
+def tw_theme_heatmap(tw_theme_to_stocks: Dict[str, List[dict]],
+                     quotes: Dict[str, SectorQuote]) -> List[dict]:
+    """
+    台股族群熱力圖：以成分股實際漲跌計算各族群統計量，依中位數漲跌幅排序。
+    多個族群共用的個股只佔一列，沒有報價的個股不列入統計。
+    """
+    codes = [c for c in dict.fromkeys(s["stock_code"] for stocks in tw_theme_to_stocks.values() for s in stocks)
+             if c in quotes]
+    stock_to_themes: Dict[str, List[str]] = {}
+    for theme, stocks in tw_theme_to_stocks.items():
+        for s in stocks:
+            if s["stock_code"] in quotes:
+                stock_to_themes.setdefault(s["stock_code"], []).append(theme)
+
+    matrix = ThemeWeightMatrix.from_mapping(codes, stock_to_themes)
+    change = np.array([quotes[c].change_pct for c in codes], dtype=np.float64)
+    turnover = np.array([quotes[c].price * quotes[c].volume for c in codes], dtype=np.float64)
+    stats = constituent_stats(matrix, change, turnover)
+    theme_pos = {theme: i for i, theme in enumerate(matrix.themes)}
+
+    grid = []
+    for theme, stocks in tw_theme_to_stocks.items():
+        i = theme_pos.get(theme)
+        cells = sorted(
+            ({
+                "stock_code": s["stock_code"],
+                "stock_name": s["stock_name"],
+                "price": quotes[s["stock_code"]].price,
+                "change_pct": quotes[s["stock_code"]].change_pct,
+                "volume": quotes[s["stock_code"]].volume,
+            } for s in stocks if s["stock_code"] in quotes),
+            key=lambda r: r["change_pct"], reverse=True)
+        grid.append({
+            "tw_theme": theme,
+            "stock_count": len(stocks),
+            "quoted": len(cells),
+            **{
+                f"{key}_change_pct": (round(float(stats[key][i]), 4) if i is not None else None)
+                for key in ("median", "weighted", "mean")
+            },
+            "breadth": round(float(stats["breadth"][i]), 4) if i is not None else None,
+            "advancers": int(stats["advancers"][i]) if i is not None else 0,
+            "decliners": int(stats["decliners"][i]) if i is not None else 0,
+            "dispersion": round(float(stats["dispersion"][i]), 4) if i is not None else None,
+            "stocks": cells,
+        })
+    # 依中位數漲跌幅排序，沒有任何報價的族群排在最後
+    grid.sort(key=lambda r: (r["median_change_pct"] is not None, r["median_change_pct"] or 0.0), reverse=True)
+    return grid
+
+
+def write_outputs(state: HeatmapState, outdir: Path) -> int:
+    """寫出 out/ 內的四個檔案 (內容未變動者略過)，回傳實際寫入的檔案數"""
+    written = [
+        write_csv(outdir / "us_sector_quotes.csv",
+                  ["us_sector_ticker", "us_sector_name", "price", "change", "change_pct"],
+                  state.us_rows()),
+        write_json(outdir / "tw_theme_constituents.json", state.tw_theme_to_stocks),
+        write_json(outdir / "us_sector_to_tw_picks.json", state.picks_list()),
+        write_json(outdir / "tw_themes_ranked.json", state.ranked()),
+    ]
+    return sum(written)
+
+
+def write_tw_heatmap(state: HeatmapState, outdir: Path, tw_quotes: Dict[str, SectorQuote]) -> bool:
+    """台股成分股報價與上次相同時不重算；否則重算並寫出 tw_theme_heatmap.json，回傳是否實際寫入"""
+    if tw_quotes == state.tw_quotes:
+        return False
+    state.tw_quotes = tw_quotes
+    return write_json(outdir / "tw_theme_heatmap.json", tw_theme_heatmap(state.tw_theme_to_stocks, tw_quotes))
+
+
+def watch(state: HeatmapState, outdir: Path, interval: float, threshold: float,
+          tw_heatmap: bool = False, resolver: Optional[SymbolResolver] = None) -> None:
+    """
+    常駐模式：定期抓取報價，只在有板塊變動時重算並更新輸出。
+    tw_heatmap 開啟時每輪同時抓取台股成分股報價，報價有變動時重算 tw_theme_heatmap.json。
+    """
+    logger.info(f"👀 進入常駐模式：每 {interval:.0f} 秒更新，門檻 {threshold} 個百分點 (Ctrl+C 結束)")
+    codes = [s["stock_code"] for stocks in state.tw_theme_to_stocks.values() for s in stocks]
+    while True:
+        try:
+            time.sleep(interval)
+            quotes = fetch_sector_quotes(state.sector_tickers)
+            changed = state.apply_quotes(quotes, threshold)
+            written = 0
+            if changed:
+                logger.info(f"🔄 {len(changed)} 檔板塊變動: {', '.join(changed)}")
+                written += write_outputs(state, outdir)
+            else:
+                logger.info("➖ 報價無顯著變動，略過重算")
+            if tw_heatmap:
+                written += write_tw_heatmap(state, outdir, fetch_tw_quotes(codes, resolver))
+            if written:
+                logger.info(f"📁 更新 {written} 個輸出檔")
+        except KeyboardInterrupt:
+            logger.info("⚠️  使用者中斷")
+            break
+        except Exception as e:
+            logger.warning(f"❌ 本輪更新失敗: {e}")
+
+
 def main() -> int:
     p = argparse.ArgumentParser(description="美股板塊 -> 台股族群/個股熱力圖產生器")
     p.add_argument("--us2tw", default="mappings/us_sector_to_tw_theme.csv", 
@@ -122,126 +663,89 @@ def main() -> int:
                    help="台股族群->個股對應表")
     p.add_argument("--outdir", default="out",
                    help="輸出目錄")
+    p.add_argument("--learned", action="store_true",
+                   help="改用 lead_lag.py 產生的資料驅動對應表 (out/us_sector_to_tw_theme_learned.csv)，"
+                        "聚合方式預設為 weighted")
+    p.add_argument("--aggregator", default=None, choices=sorted(AGGREGATORS),
+                   help="族群熱度聚合方式 (預設 max；--learned 時為 weighted)")
+    p.add_argument("--watch", action="store_true",
+                   help="常駐模式：定期更新，只重算有變動的板塊")
+    p.add_argument("--interval", type=float, default=300,
+                   help="常駐模式更新間隔秒數 (預設 300)")
+    p.add_argument("--threshold", type=float, default=0.01,
+                   help="常駐模式 change_pct 變動門檻 (百分點，預設 0.01)")
+    p.add_argument("--tw-heatmap", action=argparse.BooleanOptionalAction, default=True,
+                   help="抓取台股成分股報價並輸出 tw_theme_heatmap.json (預設開啟)")
+    p.add_argument("--metadata", action=argparse.BooleanOptionalAction, default=True,
+                   help="對應表沒有名稱的 ETF 以 yfinance 基本資料補上名稱 (快取於 cache/，預設開啟)")
     args = p.parse_args()
+    if args.learned:
+        if not LEARNED_US2TW.exists():
+            p.error(f"找不到 {LEARNED_US2TW}，請先執行 python lead_lag.py")
+        args.us2tw = str(LEARNED_US2TW)
+    if args.aggregator is None:
+        args.aggregator = "weighted" if args.learned else "max"
 
     logger.info(f"📁 輸入檔案:")
     logger.info(f"   美股->台股: {args.us2tw}")
     logger.info(f"   台股族群->個股: {args.twlist}")
     
-    us2tw = read_csv(Path(args.us2tw))
-    twlist = read_csv(Path(args.twlist))
+    # 對應表由 mapping_index 編譯並快取，來源未變動時只需一次讀檔
+    index = load_mapping_index(Path(args.us2tw), Path(args.twlist))
     outdir = Path(args.outdir)
 
     # 1) 建立 mapping：us_sector_ticker -> list(tw_theme)
-    us_to_tw: Dict[str, List[str]] = {}
-    us_sector_name: Dict[str, str] = {}
-    for r in us2tw:
-        us_t = (r.get("us_sector_ticker") or "").strip().upper()
-        us_n = (r.get("us_sector_name") or "").strip()
-        tw   = (r.get("tw_theme") or "").strip()
-        if not us_t:
-            continue
-        us_to_tw.setdefault(us_t, [])
-        if tw and tw not in us_to_tw[us_t]:
-            us_to_tw[us_t].append(tw)
-        if us_n:
-            us_sector_name[us_t] = us_n
+    us_to_tw: Dict[str, List[str]] = index.us_to_themes
+    us_sector_name: Dict[str, str] = dict(index.us_names)
 
     sector_tickers = sorted(us_to_tw.keys())
     if not sector_tickers:
         raise SystemExit("❌ 未找到美股板塊代碼，請檢查 us_sector_to_tw_theme.csv")
 
+    # 對應表沒有名稱 (或名稱就是代碼) 的 ETF 以基本資料補上，磁碟快取 7 天內不重抓
+    missing = [t for t in sector_tickers if us_sector_name.get(t, t) == t]
+    if missing and args.metadata:
+        for t, info in TickerMetadataCache().get_many(missing).items():
+            name = info.get("longName") or info.get("shortName")
+            if name:
+                us_sector_name[t] = name
+
     logger.info(f"📊 已載入 {len(sector_tickers)} 檔美股板塊 ETF")
 
     # 2) 抓美股板塊ETF報價
     logger.info(f"\n🔄 抓取美股板塊行情...")
     quotes = fetch_sector_quotes(sector_tickers)
 
-    # 輸出美股板塊行情
-    us_rows = []
-    for t in sector_tickers:
-        q = quotes[t]
-        us_rows.append({
-            "us_sector_ticker": q.ticker,
-            "us_sector_name": us_sector_name.get(t, q.name),
-            "price": q.price,
-            "change": q.change,
-            "change_pct": q.change_pct,
-        })
-    us_rows.sort(key=lambda r: float(r["change_pct"]), reverse=True)
-    write_csv(outdir / "us_sector_quotes.csv",
-              ["us_sector_ticker", "us_sector_name", "price", "change", "change_pct"],
-              us_rows)
-
     # 3) 台股族群 -> 個股
     logger.info(f"\n📋 載入台股族群->個股對應...")
-    tw_theme_to_stocks: Dict[str, List[dict]] = {}
-    for r in twlist:
-        theme = (r.get("tw_theme") or r.get("產業分類") or "").strip()
-        code  = (r.get("stock_code") or r.get("股票代碼") or "").strip()
-        name  = (r.get("stock_name") or r.get("股票名稱") or "").strip()
-        if not theme or not code:
-            continue
-        tw_theme_to_stocks.setdefault(theme, [])
-        tw_theme_to_stocks[theme].append({"stock_code": code, "stock_name": name})
+    tw_theme_to_stocks: Dict[str, List[dict]] = {
+        theme: [{"stock_code": code, "stock_name": name} for code, name in stocks]
+        for theme, stocks in index.theme_to_stocks.items()
+    }
 
     logger.info(f"   已載入 {len(tw_theme_to_stocks)} 個台股族群，共 {sum(len(s) for s in tw_theme_to_stocks.values())} 檔個股")
-    
-    write_json(outdir / "tw_theme_constituents.json", tw_theme_to_stocks)
-
-    # 4) 美股板塊 -> 台股族群 -> 台股個股（最終輸出）
-    logger.info(f"\n🔗 建立美股板塊 -> 台股族群 -> 個股對應...")
-    us_to_tw_picks = []
-    for t in sector_tickers:
-        q = quotes[t]
-        themes = us_to_tw.get(t, [])
-        us_to_tw_picks.append({
-            "us_sector": {
-                "ticker": t,
-                "name": us_sector_name.get(t, q.name),
-                "price": q.price,
-                "change": q.change,
-                "change_pct": q.change_pct,
-            },
-            "tw_themes": [
-                {
-                    "tw_theme": theme,
-                    "stocks": tw_theme_to_stocks.get(theme, [])
-                }
-                for theme in themes
-            ]
-        })
 
+    # 4) 美股板塊 -> 台股族群 -> 台股個股
     # 5) 族群熱度排行（用對應到的美股板塊漲跌來給分）
-    # 一個族群可能被多個板塊指到，這裡用「max change_pct」當族群熱度分數
-    logger.info(f"\n🔥 計算台股族群熱度排行...")
-    theme_score: Dict[str, float] = {}
-    theme_sources: Dict[str, List[dict]] = {}
-    for item in us_to_tw_picks:
-        us = item["us_sector"]
-        for tw in item["tw_themes"]:
-            theme = tw["tw_theme"]
-            score = float(us["change_pct"])
-            theme_score[theme] = max(theme_score.get(theme, -1e9), score)
-            theme_sources.setdefault(theme, []).append({
-                "us_sector_ticker": us["ticker"],
-                "us_sector_name": us["name"],
-                "change_pct": score
-            })
-
-    ranked = []
-    for theme, score in sorted(theme_score.items(), key=lambda x: x[1], reverse=True):
-        ranked.append({
-            "tw_theme": theme,
-            "score_change_pct": round(score, 4),
-            "sources": sorted(theme_sources.get(theme, []), key=lambda r: r["change_pct"], reverse=True),
-            "stock_count": len(tw_theme_to_stocks.get(theme, [])),
-        })
-
-    write_json(outdir / "us_sector_to_tw_picks.json", us_to_tw_picks)
-    write_json(outdir / "tw_themes_ranked.json", ranked)
-
-    # 6) 輸出摘要
+    # 一個族群可能被多個板塊指到，以稀疏權重矩陣一次算出所有族群分數 (預設 max change_pct)
+    logger.info(f"\n🔗 建立美股板塊 -> 台股族群 -> 個股對應...")
+    logger.info(f"\n🔥 計算台股族群熱度排行 (聚合: {args.aggregator})...")
+    state = HeatmapState(sector_tickers, us_to_tw, us_sector_name, tw_theme_to_stocks,
+                         index.us_theme_weights, args.aggregator)
+    state.apply_quotes(quotes)
+    write_outputs(state, outdir)
+
+    # 6) 台股成分股熱力圖：所有族群的個股去重後批次抓取實際報價
+    resolver = SymbolResolver() if args.tw_heatmap else None
+    if args.tw_heatmap:
+        logger.info(f"\n🇹🇼 計算台股成分股熱力圖...")
+        started = time.perf_counter()
+        codes = [s["stock_code"] for stocks in tw_theme_to_stocks.values() for s in stocks]
+        tw_quotes = fetch_tw_quotes(codes, resolver)
+        write_tw_heatmap(state, outdir, tw_quotes)
+        logger.info(f"   {len(tw_quotes)}/{len(set(codes))} 檔取得報價，耗時 {time.perf_counter() - started:.1f} 秒")
+
+    # 7) 輸出摘要
     logger.info(f"\n" + "="*70)
     logger.info(f"✅ 熱力圖生成完成！")
     logger.info(f"="*70)
@@ -254,7 +758,12 @@ def main() -> int:
     logger.info(f"   - us_sector_to_tw_picks.json (美股->台股完整對應)")
     logger.info(f"   - tw_themes_ranked.json (台股族群熱度排行)")
     logger.info(f"   - tw_theme_constituents.json (台股族群->個股清單)")
+    if args.tw_heatmap:
+        logger.info(f"   - tw_theme_heatmap.json (台股族群成分股熱力圖)")
     logger.info(f"="*70)
+
+    if args.watch:
+        watch(state, outdir, args.interval, args.threshold, args.tw_heatmap, resolver)
     
     return 0
 
@@ -0,0 +1,163 @@
+"""
+台股代碼 -> Yahoo 交易所後綴 (.TW 上市 / .TWO 上櫃) 解析快取
+記錄每個代碼解析到的後綴,上櫃股票不必每次先白打一次 .TW;
+查無資料的代碼也記錄 (負向快取),到期後才重新驗證
+
+快取檔: stock_data/cache/symbol_suffix.json
+  {code: {'suffix': '.TW' | '.TWO' | null, 'checked': 'YYYY-MM-DD'}}
+
+用法:
+  python symbol_resolver.py --seed      # 依台股產業分類表批次解析所有代碼
+  python symbol_resolver.py 6488 2330   # 查詢
+"""
+
+import argparse
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+SUFFIXES = ('.TW', '.TWO')
+DEFAULT_PATH = 'stock_data/cache/symbol_suffix.json'
+SEED_CSV = 'stock_data/台股產業分類表.csv'
+
+# 已解析的後綴 30 天後重新驗證 (上櫃轉上市等),查無資料者 7 天後重試
+POSITIVE_TTL_DAYS = 30
+NEGATIVE_TTL_DAYS = 7
+
+
+class SymbolResolver:
+    def __init__(self, path=DEFAULT_PATH, positive_ttl=POSITIVE_TTL_DAYS, negative_ttl=NEGATIVE_TTL_DAYS):
+        self.path = path
+        self.positive_ttl = timedelta(days=positive_ttl)
+        self.negative_ttl = timedelta(days=negative_ttl)
+        self.entries = self._load()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def _fresh(self, entry, today):
+        ttl = self.positive_ttl if entry['suffix'] else self.negative_ttl
+        return today - date.fromisoformat(entry['checked']) < ttl
+
+    def candidates(self, code, today=None):
+        """
+        依序要嘗試的後綴
+        已解析: [後綴] | 已知查無資料: [] | 未知或已過期: ['.TW', '.TWO']
+        """
+        today = today or date.today()
+        with self._lock:
+            entry = self.entries.get(code)
+            if entry and self._fresh(entry, today):
+                if entry['suffix']:
+                    self.stats['hits'] += 1
+                    return [entry['suffix']]
+                self.stats['negative_hits'] += 1
+                return []
+            self.stats['misses'] += 1
+            return list(SUFFIXES)
+
+    def record_many(self, results, today=None):
+        """記錄解析結果 {code: '.TW' | '.TWO' | None (查無資料)}"""
+        if not results:
+            return
+        checked = (today or date.today()).isoformat()
+        with self._lock:
+            for code, suffix in results.items():
+                self.entries[code] = {'suffix': suffix, 'checked': checked}
+            self._save()
+
+    def record(self, code, suffix, today=None):
+        self.record_many({code: suffix}, today)
+
+    def resolve_bulk(self, codes, probe, today=None):
+        """
+        批次解析多個代碼 (最多 2 次 probe: .TW 一次、其餘 .TWO 一次),已在快取內且未過期者不查詢
+        probe: [symbol, ...] -> 有資料的 symbol 集合
+        回傳 {code: '.TW' | '.TWO' | None}
+        """
+        codes = list(dict.fromkeys(codes))
+        unknown = [c for c in codes if len(self.candidates(c, today)) > 1]
+
+        found = {}
+        if unknown:
+            listed = probe([f"{c}.TW" for c in unknown])
+            found.update({c: '.TW' for c in unknown if f"{c}.TW" in listed})
+            rest = [c for c in unknown if c not in found]
+            if rest:
+                otc = probe([f"{c}.TWO" for c in rest])
+                found.update({c: '.TWO' for c in rest if f"{c}.TWO" in otc})
+            self.record_many({c: found.get(c) for c in unknown}, today)
+
+        return {c: self.entries.get(c, {}).get('suffix') for c in codes}
+
+    def report(self):
+        s = self.stats
+        return (f"後綴快取命中: {s['hits']} | 已知無資料: {s['negative_hits']} | 需解析: {s['misses']}")
+
+
+def yahoo_probe(symbols):
+    """以一次 yf.download 查詢哪些 Yahoo 代號有近期資料"""
+    import yfinance as yf
+    from rate_limiter import get_limiter
+
+    get_limiter('yahoo').acquire()
+    data = yf.download(symbols, period='1mo', group_by='ticker', auto_adjust=True,
+                       threads=True, progress=False)
+    if data is None or data.empty:
+        return set()
+    if getattr(data.columns, 'nlevels', 1) == 1:
+        return set(symbols) if len(symbols) == 1 and data['Close'].notna().any() else set()
+    return {s for s in symbols
+            if s in data.columns.get_level_values(0) and data[s]['Close'].notna().any()}
+
+
+def seed_codes(csv_path=SEED_CSV):
+    """產業分類表內的所有不重複代碼"""
+    df = pd.read_csv(csv_path, dtype={'股票代碼': str}, encoding='utf-8-sig')
+    return list(dict.fromkeys(df['股票代碼'].str.strip()))
+
+
+def main():
+    p = argparse.ArgumentParser(description="台股代碼交易所後綴解析快取")
+    p.add_argument('codes', nargs='*', help="要查詢的代碼")
+    p.add_argument('--seed', action='store_true', help=f"批次解析 {SEED_CSV} 內的所有代碼")
+    p.add_argument('--path', default=DEFAULT_PATH, help="快取檔")
+    args = p.parse_args()
+
+    resolver = SymbolResolver(args.path)
+    codes = seed_codes() if args.seed else args.codes
+    if not codes:
+        p.error("請指定代碼或 --seed")
+
+    resolved = resolver.resolve_bulk(codes, yahoo_probe)
+    listed = sum(1 for s in resolved.values() if s == '.TW')
+    otc = sum(1 for s in resolved.values() if s == '.TWO')
+    missing = [c for c, s in resolved.items() if s is None]
+    if args.seed:
+        print(f"✅ 已解析 {len(resolved)} 檔: 上市 {listed} | 上櫃 {otc} | 查無資料 {len(missing)}")
+        if missing:
+            print(f"⚠️  查無資料: {', '.join(missing)}")
+    else:
+        for code, suffix in resolved.items():
+            print(f"{code}: {suffix or '查無資料'}")
+    print(resolver.report())
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+"""
+美股 ETF 基本資料 (metadata) 磁碟快取
+yfinance 的 Ticker.info 是最慢、最容易被限流的端點,價格與成交量改由 K 線取得,
+info 只用於名稱、類別等不常變動的欄位,快取到磁碟並以長 TTL 控制重抓
+只在需要顯示名稱 / 類別時才查詢 (sector_heatmap 補上對應表缺少的 ETF 名稱;追蹤器每輪不抓),
+多檔一起查詢時整批只寫一次快取檔
+"""
+
+import json
+import os
+import threading
+import time
+
+import yfinance as yf
+
+# 只保留不常變動的欄位,價格類欄位一律不存
+METADATA_FIELDS = ['shortName', 'longName', 'quoteType', 'category', 'fundFamily',
+                   'currency', 'exchange', 'totalAssets']
+
+# 預設 7 天重抓一次
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class TickerMetadataCache:
+    def __init__(self, path='cache/ticker_metadata.json', ttl=DEFAULT_TTL, source=None):
+        """
+        path: 快取檔案位置
+        ttl: 快取有效秒數
+        source: 提供 Ticker(ticker).info 的物件,預設為 yfinance (測試時可替換)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.source = source
+        self.entries = self._load()
+        self.stats = {'hits': 0, 'misses': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, ticker, save=True):
+        """
+        取得 ticker 基本資料,快取未過期時不發出任何請求
+        抓取失敗時回傳過期的舊資料 (沒有則為空 dict)
+        save: 抓到新資料時是否立即寫入快取檔 (整批查詢時由 get_many 最後寫一次)
+        """
+        with self._lock:
+            entry = self.entries.get(ticker)
+            if entry and time.time() - entry['fetched_at'] < self.ttl:
+                self.stats['hits'] += 1
+                return entry['info']
+
+        try:
+            info = (self.source or yf).Ticker(ticker).info
+        except Exception as e:
+            print(f"⚠️  {ticker} 基本資料抓取失敗: {e}")
+            with self._lock:
+                self.stats['failed'] += 1
+            return entry['info'] if entry else {}
+
+        info = {k: info[k] for k in METADATA_FIELDS if info.get(k) is not None}
+        with self._lock:
+            self.stats['misses'] += 1
+            self.entries[ticker] = {'fetched_at': time.time(), 'info': info}
+            if save:
+                self._save()
+        return info
+
+    def get_many(self, tickers):
+        """取得多檔基本資料 ({ticker: info}),有新資料時只寫一次快取檔"""
+        misses = self.stats['misses']
+        result = {ticker: self.get(ticker, save=False) for ticker in tickers}
+        if self.stats['misses'] != misses:
+            with self._lock:
+                self._save()
+        return result
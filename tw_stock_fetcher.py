@@ -12,6 +12,23 @@ import time
 import os
 from io import StringIO
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+from bar_cache import BarCache, bar_dates
+from columnar_store import write_columnar
+from mapping_index import load_mapping_index
+from rate_limiter import get_limiter
+from symbol_resolver import SymbolResolver
+from twse_async import TWSE_STOCK_DAY_URL, AsyncTWSEFetcher, month_starts
+from twse_http_cache import TWSEResponseCache
+
+# yfinance period 對應的天數 (用於本地快取判斷涵蓋區間)
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 365, '2y': 730, '5y': 1826, '10y': 3652,
+}
 
 # 台股產業分類表 (根據官方分類)
 TW_STOCK_CATEGORIES = {
@@ -93,11 +110,93 @@ TW_STOCK_CATEGORIES = {
     }
 }
 
+# Yahoo Finance 欄位 -> 中文欄位
+YAHOO_COLUMNS = {
+    'Date': '日期',
+    'Open': '開盤價',
+    'High': '最高價',
+    'Low': '最低價',
+    'Close': '收盤價',
+    'Volume': '成交量',
+    'Dividends': '股息',
+    'Stock Splits': '股票分割',
+    'Stock_Code': '股票代碼'
+}
+
+# 下載區間至少涵蓋這麼多天仍無資料,才將代碼記為查無資料 (短區間可能只是遇到休市)
+NEGATIVE_WINDOW_DAYS = 14
+
+
+def period_start(period, today):
+    """將 yfinance period 轉為起始日,無法轉換 (如 'max') 時回傳 None"""
+    if period == 'ytd':
+        return today.replace(month=1, day=1)
+    if period in PERIOD_DAYS:
+        return today - timedelta(days=PERIOD_DAYS[period])
+    return None
+
+
 class TaiwanStockFetcher:
-    def __init__(self):
+    def __init__(self, use_cache=True, max_workers=8, output_format='csv', columnar_layout='category',
+                 yahoo_bulk=True, resolve_symbols=True, http_cache=True):
+        """
+        use_cache: 是否使用本地日線快取 (stock_data/cache),只補抓缺少的尾端資料
+        max_workers: 並行抓取的執行緒數 (實際請求速率由各資料來源的全域限速器控制)
+        output_format: 產業資料輸出格式 'csv' 或 'columnar' (二進位欄式,可 memory-map 讀取)
+        columnar_layout: 欄式輸出以 'category' (每產業一個目錄) 或 'symbol' (每檔股票一個目錄) 存放
+        yahoo_bulk: 多檔 Yahoo 抓取時整批下載 (.TW 一次、缺漏者 .TWO 一次),而非逐檔請求
+        resolve_symbols: 記錄每個代碼的交易所後綴 (stock_data/cache/symbol_suffix.json),上櫃股票直接以 .TWO 抓取
+        http_cache: 快取證交所 STOCK_DAY 原始回應 (stock_data/cache/twse_http),已結束的月份不再重新請求
+        """
+        if output_format not in ('csv', 'columnar'):
+            raise ValueError(f"不支援的輸出格式: {output_format}")
+        if columnar_layout not in ('category', 'symbol'):
+            raise ValueError(f"不支援的欄式輸出方式: {columnar_layout}")
         self.data_dir = 'stock_data'
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
+        self.cache = BarCache(os.path.join(self.data_dir, 'cache')) if use_cache else None
+        self.mapping = load_mapping_index()
+        self.max_workers = max_workers
+        self.output_format = output_format
+        self.columnar_layout = columnar_layout
+        self.yahoo_bulk = yahoo_bulk
+        self._write_lock = threading.Lock()
+        self.limiters = {'yahoo': get_limiter('yahoo'), 'twse': get_limiter('twse')}
+        self.resolver = SymbolResolver(os.path.join(self.data_dir, 'cache', 'symbol_suffix.json')) \
+            if resolve_symbols else None
+        self.http_cache = TWSEResponseCache(os.path.join(self.data_dir, 'cache', 'twse_http')) \
+            if http_cache else None
+        # 同步抓取證交所時重複使用 keep-alive 連線
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.http.mount('https://', adapter)
+    
+    def _yahoo_window(self, start_date, end_date, period):
+        """Yahoo 抓取區間 -> (start, end) 日期 (含頭尾),period 無法換算時 start 為 None"""
+        # 台股 13:30 收盤,收盤前今日 K 棒尚未定型,不寫入快取
+        now_tw = datetime.now(ZoneInfo('Asia/Taipei'))
+        today = now_tw.date() if now_tw.hour >= 14 else now_tw.date() - timedelta(days=1)
+        if start_date and end_date:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = min(datetime.strptime(end_date, '%Y-%m-%d').date() - timedelta(days=1), today)
+        else:
+            start, end = period_start(period, today), today
+        return start, end
+    
+    def _suffix_candidates(self, stock_code):
+        """要嘗試的交易所後綴 (未啟用解析快取時一律先 .TW 再 .TWO)"""
+        if self.resolver is None:
+            return ['.TW', '.TWO']
+        return self.resolver.candidates(stock_code)
+    
+    def _conclusive(self, start_date, end_date, period):
+        """此下載區間查無資料時,是否足以判定代碼查無資料"""
+        if start_date and end_date:
+            span = datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')
+            return span.days >= NEGATIVE_WINDOW_DAYS
+        days = PERIOD_DAYS.get(period)
+        return days is None or days >= NEGATIVE_WINDOW_DAYS
     
     def fetch_from_yahoo(self, stock_code, start_date=None, end_date=None, period='1y'):
         """
@@ -106,46 +205,66 @@ class TaiwanStockFetcher:
         start_date: 開始日期 'YYYY-MM-DD'
         end_date: 結束日期 'YYYY-MM-DD'
         period: 時間區間 '1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'
+        啟用快取時,只下載快取最後日期之後的資料
         """
+        start, end = self._yahoo_window(start_date, end_date, period)
+
+        if self.cache is None or start is None:
+            return self._download_yahoo(stock_code, start_date, end_date, period)
+
+        fetch_from = self.cache.plan('yahoo', stock_code, start, end)
+        if fetch_from is not None:
+            df = self._download_yahoo(stock_code,
+                                      start_date=fetch_from.strftime('%Y-%m-%d'),
+                                      end_date=(end + timedelta(days=1)).strftime('%Y-%m-%d'))
+            if df is not None:
+                self.cache.append('yahoo', stock_code, df, checked=end, fetched_from=fetch_from)
+
+        df = self.cache.load('yahoo', stock_code, start, end)
+        if df is None or df.empty:
+            print(f"❌ {stock_code} 無資料")
+            return None
+
+        if fetch_from is None:
+            print(f"✅ {stock_code} 快取命中! 共 {len(df)} 筆資料")
+        return df
+    
+    def _download_yahoo(self, stock_code, start_date=None, end_date=None, period='1y'):
+        """實際向 Yahoo Finance 下載 (不經快取)"""
         try:
-            # 台股代碼需加上 .TW 或 .TWO
-            ticker_symbol = f"{stock_code}.TW"
+            # 台股代碼需加上 .TW 或 .TWO (已解析過的代碼直接使用記錄的後綴)
+            suffixes = self._suffix_candidates(stock_code)
+            if not suffixes:
+                print(f"⏭️  {stock_code} 近期已確認查無資料,略過")
+                return None
             
             print(f"📥 正在抓取 {stock_code} 的資料...")
             
-            stock = yf.Ticker(ticker_symbol)
-            
-            # 如果指定日期範圍
-            if start_date and end_date:
-                df = stock.history(start=start_date, end=end_date)
-            else:
-                df = stock.history(period=period)
-            
-            if df.empty:
-                # 嘗試上櫃股票 .TWO
-                ticker_symbol = f"{stock_code}.TWO"
-                stock = yf.Ticker(ticker_symbol)
+            df = pd.DataFrame()
+            for suffix in suffixes:
+                stock = yf.Ticker(f"{stock_code}{suffix}")
+                
+                # 如果指定日期範圍
+                self.limiters['yahoo'].acquire()
                 if start_date and end_date:
                     df = stock.history(start=start_date, end=end_date)
                 else:
                     df = stock.history(period=period)
+                if not df.empty:
+                    break
+            
+            if self.resolver is not None and len(suffixes) > 1:
+                if not df.empty:
+                    self.resolver.record(stock_code, suffix)
+                elif self._conclusive(start_date, end_date, period):
+                    self.resolver.record(stock_code, None)
             
             if not df.empty:
                 df.reset_index(inplace=True)
                 df['Stock_Code'] = stock_code
                 
                 # 重新命名欄位為中文
-                df.rename(columns={
-                    'Date': '日期',
-                    'Open': '開盤價',
-                    'High': '最高價',
-                    'Low': '最低價',
-                    'Close': '收盤價',
-                    'Volume': '成交量',
-                    'Dividends': '股息',
-                    'Stock Splits': '股票分割',
-                    'Stock_Code': '股票代碼'
-                }, inplace=True)
+                df.rename(columns=YAHOO_COLUMNS, inplace=True)
                 
                 print(f"✅ {stock_code} 抓取成功! 共 {len(df)} 筆資料")
                 return df
@@ -157,54 +276,198 @@ class TaiwanStockFetcher:
             print(f"❌ {stock_code} 抓取失敗: {e}")
             return None
     
+    def _download_yahoo_batch(self, symbols, start_date=None, end_date=None, period='1y'):
+        """
+        以單一 yf.download 請求抓取多個 Yahoo 代號 (如 ['2330.TW', ...])
+        回傳 {代號: DataFrame (index 為日期,英文欄位)},無資料的代號不列入;請求失敗時回傳 None
+        """
+        if not symbols:
+            return {}
+        self.limiters['yahoo'].acquire()
+        kwargs = {'start': start_date, 'end': end_date} if start_date and end_date else {'period': period}
+        try:
+            data = yf.download(symbols, group_by='ticker', auto_adjust=True, actions=True,
+                               ignore_tz=False, threads=True, progress=False, **kwargs)
+        except Exception as e:
+            print(f"❌ 批次下載失敗: {e}")
+            return None
+        if data is None or data.empty:
+            return {}
+        
+        frames = {}
+        multi = getattr(data.columns, 'nlevels', 1) > 1
+        for symbol in symbols:
+            if multi:
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            elif len(symbols) == 1:
+                frame = data
+            else:
+                continue
+            frame = frame.dropna(subset=['Close'])
+            if not frame.empty:
+                frames[symbol] = frame
+        return frames
+    
+    def _download_yahoo_bulk(self, stock_codes, start_date=None, end_date=None, period='1y'):
+        """
+        整批下載多檔台股 (不經快取): 先以 .TW 一次下載,缺漏的再以 .TWO 下載一次
+        已解析後綴的上櫃股票直接併入 .TWO 批次,近期確認查無資料的代碼略過
+        回傳 {stock_code: DataFrame},欄位與 _download_yahoo 相同
+        """
+        codes = list(dict.fromkeys(stock_codes))
+        print(f"📥 正在批次抓取 {len(codes)} 檔股票的資料...")
+        
+        candidates = {code: self._suffix_candidates(code) for code in codes}
+        unresolved = [c for c in codes if len(candidates[c]) > 1]
+        skipped = [c for c in codes if not candidates[c]]
+        
+        frames = {}
+        failed = False
+        tw_codes = [c for c in codes if candidates[c][:1] == ['.TW']]
+        listed = self._download_yahoo_batch([f"{c}.TW" for c in tw_codes], start_date, end_date, period)
+        failed |= listed is None
+        for code in tw_codes:
+            if f"{code}.TW" in (listed or {}):
+                frames[code] = listed[f"{code}.TW"]
+        
+        # 已知上櫃股票與上市批次中沒有資料的未解析股票以 .TWO 下載
+        otc_codes = [c for c in codes if candidates[c] == ['.TWO']
+                     or (c in unresolved and c not in frames and not failed)]
+        if otc_codes:
+            otc = self._download_yahoo_batch([f"{c}.TWO" for c in otc_codes], start_date, end_date, period)
+            failed |= otc is None
+            for code in otc_codes:
+                if f"{code}.TWO" in (otc or {}):
+                    frames[code] = otc[f"{code}.TWO"]
+        
+        if self.resolver is not None and not failed:
+            resolved = {c: ('.TW' if c in tw_codes else '.TWO') for c in unresolved if c in frames}
+            if self._conclusive(start_date, end_date, period):
+                resolved.update({c: None for c in unresolved if c not in frames})
+            self.resolver.record_many(resolved)
+        if skipped:
+            print(f"⏭️  近期已確認查無資料,略過: {', '.join(skipped)}")
+        
+        results = {}
+        for code, frame in frames.items():
+            df = frame.copy()
+            if df.index.tz is None:
+                df.index = df.index.tz_localize('Asia/Taipei')
+            df.index.name = 'Date'
+            df = df.reset_index()
+            df['Stock_Code'] = code
+            df.rename(columns=YAHOO_COLUMNS, inplace=True)
+            results[code] = df
+        
+        missing = [c for c in codes if c not in results]
+        print(f"✅ 批次抓取完成: {len(results)}/{len(codes)} 檔"
+              + (f" | 無資料: {', '.join(missing)}" if missing else ""))
+        return results
+    
+    def fetch_yahoo_bulk(self, stock_codes, start_date=None, end_date=None, period='1y'):
+        """
+        整批從 Yahoo Finance 抓取多檔台股 (每批最多 2 次請求: .TW 一次、缺漏者 .TWO 一次)
+        啟用快取時只下載快取不足的股票,回傳 {stock_code: DataFrame}
+        """
+        codes = list(dict.fromkeys(stock_codes))
+        start, end = self._yahoo_window(start_date, end_date, period)
+        if self.cache is None or start is None:
+            return self._download_yahoo_bulk(codes, start_date, end_date, period)
+        
+        plans = {code: self.cache.plan('yahoo', code, start, end) for code in codes}
+        stale = {code: fetch_from for code, fetch_from in plans.items() if fetch_from is not None}
+        if stale:
+            # 同一批次只能有一個區間: 從最早需要補抓的日期開始
+            fetch_from = min(stale.values())
+            downloaded = self._download_yahoo_bulk(
+                list(stale),
+                start_date=fetch_from.strftime('%Y-%m-%d'),
+                end_date=(end + timedelta(days=1)).strftime('%Y-%m-%d'))
+            for code, df in downloaded.items():
+                dates = bar_dates('yahoo', df['日期'])
+                df = df[(dates >= stale[code]).values]
+                self.cache.append('yahoo', code, df, checked=end, fetched_from=stale[code])
+        
+        results = {}
+        for code in codes:
+            df = self.cache.load('yahoo', code, start, end)
+            if df is not None and not df.empty:
+                results[code] = df
+        hits = len(codes) - len(stale)
+        if hits:
+            print(f"✅ 快取命中 {hits} 檔")
+        return results
+    
     def fetch_from_twse(self, stock_code, start_date, end_date):
         """
         從證交所抓取資料
         stock_code: 股票代碼
         start_date: 開始日期 'YYYYMMDD'
         end_date: 結束日期 'YYYYMMDD'
+        啟用快取時,只下載快取最後日期所在月份之後的資料
+        """
+        if self.cache is None:
+            return self._download_twse(stock_code, start_date, end_date)
+
+        start = datetime.strptime(start_date, '%Y%m%d').date()
+        end = datetime.strptime(end_date, '%Y%m%d').date()
+
+        fetch_from = self.cache.plan('twse', stock_code, start, end)
+        if fetch_from is not None:
+            df = self._download_twse(stock_code, fetch_from.strftime('%Y%m%d'), end_date)
+            if df is not None:
+                self.cache.append('twse', stock_code, df, checked=end, fetched_from=fetch_from)
+
+        df = self.cache.load('twse', stock_code, start, end)
+        if df is None or df.empty:
+            return None
+        return df
+    
+    def _get_twse_month(self, stock_code, month):
         """
+        取得單一 (股票, 月份) 的 STOCK_DAY JSON,優先使用回應快取
+        month: 'YYYYMM01'
+        """
+        entry = None
+        if self.http_cache is not None:
+            data, entry = self.http_cache.lookup(stock_code, month)
+            if data is not None:
+                return data
+        
+        params = {'response': 'json', 'date': month, 'stockNo': stock_code}
+        # 與非同步抓取共用證交所限速器,取代固定的 time.sleep(3)
+        self.limiters['twse'].acquire()
+        response = self.http.get(TWSE_STOCK_DAY_URL, params=params,
+                                 headers=TWSEResponseCache.conditional_headers(entry), timeout=15)
+        if response.status_code == 304 and entry is not None:
+            return self.http_cache.revalidated(stock_code, month, entry)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if self.http_cache is not None:
+            self.http_cache.store(stock_code, month, data,
+                                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return data
+    
+    def _download_twse(self, stock_code, start_date, end_date):
+        """實際向證交所下載 (不經日線快取)"""
         try:
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-            
-            # 轉換日期格式
-            start = datetime.strptime(start_date, '%Y%m%d')
-            end = datetime.strptime(end_date, '%Y%m%d')
-            
             all_data = []
-            current = start
-            
-            while current <= end:
-                year = current.year - 1911  # 民國年
-                month = current.month
-                
-                params = {
-                    'response': 'json',
-                    'date': f"{year}{month:02d}01",
-                    'stockNo': stock_code
-                }
+            for month in month_starts(start_date, end_date):
+                year, mon = int(month[:4]) - 1911, int(month[4:6])  # 民國年
                 
-                print(f"📥 正在抓取 {stock_code} {year}年{month}月 的資料...")
+                print(f"📥 正在抓取 {stock_code} {year}年{mon}月 的資料...")
+                data = self._get_twse_month(stock_code, month)
                 
-                response = requests.get(url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
+                if data is not None:
                     if data.get('stat') == 'OK':
                         df = pd.DataFrame(data['data'], columns=data['fields'])
                         all_data.append(df)
-                        print(f"✅ {year}年{month}月 抓取成功")
+                        print(f"✅ {year}年{mon}月 抓取成功")
                     else:
-                        print(f"⚠️  {year}年{month}月 無資料")
-                
-                # 移到下個月
-                if current.month == 12:
-                    current = current.replace(year=current.year + 1, month=1)
-                else:
-                    current = current.replace(month=current.month + 1)
-                
-                time.sleep(3)  # 避免請求過快
+                        print(f"⚠️  {year}年{mon}月 無資料")
             
             if all_data:
                 final_df = pd.concat(all_data, ignore_index=True)
@@ -219,12 +482,83 @@ class TaiwanStockFetcher:
             print(f"❌ {stock_code} 抓取失敗: {e}")
             return None
     
-    def fetch_category_stocks(self, category, source='yahoo', period='1y'):
+    def fetch_many_from_twse(self, stock_codes, start_date, end_date):
+        """
+        以非同步方式從證交所同時抓取多檔股票
+        所有 (股票, 月份) 請求共用全域限速器,取代逐月 time.sleep(3)
+        stock_codes: 股票代碼列表
+        start_date: 開始日期 'YYYYMMDD'
+        end_date: 結束日期 'YYYYMMDD'
+        回傳 {stock_code: DataFrame}
+        """
+        codes = list(dict.fromkeys(stock_codes))
+        print(f"📥 正在從證交所抓取 {len(codes)} 檔股票 {start_date} ~ {end_date} 的資料...")
+
+        twse = AsyncTWSEFetcher(http_cache=self.http_cache)
+        if self.cache is None:
+            results = twse.fetch_stocks(codes, start_date, end_date)
+        else:
+            start = datetime.strptime(start_date, '%Y%m%d').date()
+            end = datetime.strptime(end_date, '%Y%m%d').date()
+
+            ranges = {}
+            for code in codes:
+                fetch_from = self.cache.plan('twse', code, start, end)
+                if fetch_from is not None:
+                    ranges[code] = (fetch_from.strftime('%Y%m%d'), end_date)
+
+            fetched = twse.fetch_ranges(ranges) if ranges else {}
+            for code, df in fetched.items():
+                fetch_from = datetime.strptime(ranges[code][0], '%Y%m%d').date()
+                self.cache.append('twse', code, df, checked=end, fetched_from=fetch_from)
+
+            results = {}
+            for code in codes:
+                df = self.cache.load('twse', code, start, end)
+                if df is not None and not df.empty:
+                    results[code] = df
+
+        for code in codes:
+            if code in results:
+                print(f"✅ {code} 總共抓取 {len(results[code])} 筆資料")
+            else:
+                print(f"❌ {code} 無資料")
+        print(f"📊 請求 {twse.stats['requests']} 次 | 重試 {twse.stats['retries']} 次 | 失敗 {twse.stats['failed']} 次")
+        if self.http_cache is not None:
+            print(self.http_cache.report())
+        return results
+    
+    def fetch_symbols(self, stock_codes, source='yahoo', period='1y'):
+        """
+        抓取一組股票 (重複代碼只抓一次)
+        stock_codes: 股票代碼列表
+        source: 'yahoo' 或 'twse'
+        period: 時間區間 (yahoo)
+        回傳 {stock_code: DataFrame},無資料的股票不列入
+        """
+        codes = list(dict.fromkeys(stock_codes))
+        
+        if source != 'yahoo':
+            # 證交所需要指定日期,整批一次並行抓取
+            end_date = datetime.now().strftime('%Y%m%d')
+            start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
+            return self.fetch_many_from_twse(codes, start_date, end_date)
+        
+        if self.yahoo_bulk:
+            return self.fetch_yahoo_bulk(codes, period=period)
+        
+        # 並行抓取,速率由 Yahoo 全域限速器控制 (取代每檔 time.sleep(1))
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {code: executor.submit(self.fetch_from_yahoo, code, period=period) for code in codes}
+        return {code: f.result() for code, f in futures.items() if f.result() is not None}
+    
+    def fetch_category_stocks(self, category, source='yahoo', period='1y', prefetched=None):
         """
         抓取特定產業的所有股票
         category: 產業名稱
         source: 'yahoo' 或 'twse'
         period: 時間區間
+        prefetched: 已抓好的 {stock_code: DataFrame},提供時不再重新抓取
         """
         if category not in TW_STOCK_CATEGORIES:
             print(f"❌ 找不到產業: {category}")
@@ -232,39 +566,31 @@ class TaiwanStockFetcher:
             return None
         
         category_info = TW_STOCK_CATEGORIES[category]
-        stocks = category_info['stocks']
-        names = category_info['names']
+        # 同一產業內重複列出的股票只保留第一次
+        members = list(dict.fromkeys(zip(category_info['stocks'], category_info['names'])))
         
         print(f"\n🏭 開始抓取 [{category}] 產業股票...")
-        print(f"共 {len(stocks)} 檔股票\n")
+        print(f"共 {len(members)} 檔股票\n")
         print("=" * 70)
         
+        if prefetched is None:
+            prefetched = self.fetch_symbols([code for code, _ in members], source=source, period=period)
+        
         all_data = []
         
-        for stock_code, stock_name in zip(stocks, names):
-            print(f"\n📊 {stock_code} {stock_name}")
-            
-            if source == 'yahoo':
-                df = self.fetch_from_yahoo(stock_code, period=period)
-            else:
-                # 證交所需要指定日期
-                end_date = datetime.now().strftime('%Y%m%d')
-                start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
-                df = self.fetch_from_twse(stock_code, start_date, end_date)
-            
+        for stock_code, stock_name in members:
+            df = prefetched.get(stock_code)
             if df is not None:
+                df = df.copy()
                 df['股票名稱'] = stock_name
                 df['產業分類'] = category
                 all_data.append(df)
-            
-            time.sleep(1)  # 避免請求過快
         
         if all_data:
             final_df = pd.concat(all_data, ignore_index=True)
             
             # 儲存檔案
-            filename = f"{self.data_dir}/{category}_stocks_{datetime.now().strftime('%Y%m%d')}.csv"
-            final_df.to_csv(filename, index=False, encoding='utf-8-sig')
+            filename = self.save_category_data(category, final_df)
             
             print("\n" + "=" * 70)
             print(f"✅ [{category}] 產業資料抓取完成!")
@@ -277,9 +603,51 @@ class TaiwanStockFetcher:
             print(f"\n❌ [{category}] 產業無資料")
             return None
     
+    def save_category_data(self, category, df):
+        """依 output_format 儲存產業資料,回傳檔案 (或目錄) 路徑"""
+        stem = f"{category}_stocks_{datetime.now().strftime('%Y%m%d')}"
+        if self.output_format == 'csv':
+            filename = f"{self.data_dir}/{stem}.csv"
+            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            return filename
+        
+        columnar_dir = os.path.join(self.data_dir, 'columnar')
+        if self.columnar_layout == 'category':
+            path = os.path.join(columnar_dir, stem)
+            write_columnar(df, path)
+            return path + '/'
+        
+        # 每檔股票一個目錄 (跨產業重複的股票以最後寫入者為準;各產業並行存檔,需互斥)
+        with self._write_lock:
+            for stock_code, group in df.groupby('股票代碼', sort=False):
+                write_columnar(group, os.path.join(columnar_dir, 'symbols', str(stock_code)))
+        return os.path.join(columnar_dir, 'symbols') + '/'
+    
+    def plan_category_fetch(self, categories):
+        """
+        規劃多個產業的抓取: 收集所有產業的不重複股票代碼
+        回傳 {'symbols': [...], 'occurrences': 總出現次數, 'saved': 省下的請求數}
+        """
+        occurrences = 0
+        symbols = []
+        for category in categories:
+            if category in TW_STOCK_CATEGORIES:
+                stocks = TW_STOCK_CATEGORIES[category]['stocks']
+                occurrences += len(stocks)
+                symbols.extend(stocks)
+        
+        symbols = list(dict.fromkeys(symbols))
+        return {
+            'symbols': symbols,
+            'occurrences': occurrences,
+            'saved': occurrences - len(symbols),
+        }
+    
     def fetch_all_categories(self, source='yahoo', period='1y', categories=None):
         """
         抓取所有產業或指定產業列表
+        跨產業重複的股票只抓一次,再分配回各產業的 DataFrame/CSV
+        各產業同時進行,請求速率由各資料來源的全域限速器控制,不再固定 sleep
         categories: 產業列表,None 表示全部
         """
         if categories is None:
@@ -288,23 +656,74 @@ class TaiwanStockFetcher:
         print(f"\n🚀 開始抓取 {len(categories)} 個產業的股票資料...")
         print(f"資料來源: {source.upper()}")
         print(f"時間區間: {period}")
+        
+        plan = self.plan_category_fetch(categories)
+        print(f"不重複股票: {len(plan['symbols'])} 檔 (原需 {plan['occurrences']} 次,省下 {plan['saved']} 次請求)")
         print("=" * 70)
         
-        results = {}
+        limiter = self.limiters['yahoo' if source == 'yahoo' else 'twse']
+        limiter.reset_stats()
+        started = time.monotonic()
         
-        for category in categories:
-            df = self.fetch_category_stocks(category, source=source, period=period)
-            if df is not None:
-                results[category] = df
-            time.sleep(2)
+        symbol_pool = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        category_pool = ThreadPoolExecutor(max_workers=max(1, len(categories)))
+        try:
+            # pending: {stock_code: 回傳 {stock_code: DataFrame} 的 future}
+            # 產業工作只等待自己的股票,先抓完的產業先存檔
+            if source != 'yahoo':
+                # 證交所整批非同步抓取 (同一個限速器),完成後各產業同時分配
+                batch = symbol_pool.submit(self.fetch_symbols, plan['symbols'], source=source, period=period)
+                pending = {code: batch for code in plan['symbols']}
+            elif self.yahoo_bulk:
+                # 每檔股票只由第一個包含它的產業批次下載 (每批最多 2 次請求)
+                owners = {}
+                for category in categories:
+                    for code in TW_STOCK_CATEGORIES.get(category, {}).get('stocks', []):
+                        owners.setdefault(code, category)
+                batches = {
+                    owner: symbol_pool.submit(self.fetch_yahoo_bulk,
+                                              [code for code, o in owners.items() if o == owner], period=period)
+                    for owner in dict.fromkeys(owners.values())
+                }
+                pending = {code: batches[owner] for code, owner in owners.items()}
+            else:
+                # 每檔股票一個工作
+                pending = {
+                    code: symbol_pool.submit(lambda c: {c: self.fetch_from_yahoo(c, period=period)}, code)
+                    for code in plan['symbols']
+                }
+            
+            def category_job(category):
+                codes = TW_STOCK_CATEGORIES.get(category, {}).get('stocks', [])
+                prefetched = {code: pending[code].result().get(code) for code in codes}
+                prefetched = {code: df for code, df in prefetched.items() if df is not None}
+                return self.fetch_category_stocks(category, source=source, period=period, prefetched=prefetched)
+            
+            category_futures = {category: category_pool.submit(category_job, category) for category in categories}
+            
+            results = {}
+            for category in categories:
+                df = category_futures[category].result()
+                if df is not None:
+                    results[category] = df
+        finally:
+            category_pool.shutdown()
+            symbol_pool.shutdown()
         
         # 生成總覽報告
-        self.generate_summary_report(results)
+        rate_lines = [limiter.report(source), f"總耗時: {time.monotonic() - started:.1f} 秒"]
+        if source != 'yahoo' and self.http_cache is not None:
+            rate_lines.append(self.http_cache.report())
+        self.generate_summary_report(results, fetch_plan=plan, rate_lines=rate_lines)
         
         return results
     
-    def generate_summary_report(self, results):
-        """生成總覽報告"""
+    def generate_summary_report(self, results, fetch_plan=None, rate_lines=None):
+        """
+        生成總覽報告
+        fetch_plan: plan_category_fetch 的結果,提供時列出去重省下的請求數
+        rate_lines: 各資料來源的吞吐量 / 限速等待統計文字
+        """
         report_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         report = "=" * 70 + "\n"
@@ -330,6 +749,21 @@ class TaiwanStockFetcher:
         report += f"{'總計':15s} | 股票數: {total_stocks:3d} | 資料筆數: {total_records:8d}\n"
         report += "=" * 70 + "\n"
         
+        if fetch_plan is not None:
+            report += f"\n🔁 跨產業去重: 不重複股票 {len(fetch_plan['symbols'])} 檔 | "
+            report += f"原需 {fetch_plan['occurrences']} 次 | 省下 {fetch_plan['saved']} 次請求\n"
+        
+        if rate_lines:
+            report += "\n📶 資料來源速率\n"
+            report += "-" * 70 + "\n"
+            report += "\n".join(rate_lines) + "\n"
+        
+        if self.cache is not None:
+            report += "\n💾 本地快取\n"
+            report += "-" * 70 + "\n"
+            report += self.cache.report() + "\n"
+            report += "=" * 70 + "\n"
+        
         # 儲存報告
         report_file = f"{self.data_dir}/summary_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         with open(report_file, 'w', encoding='utf-8') as f:
@@ -358,16 +792,32 @@ class TaiwanStockFetcher:
         return df
     
     def search_stock_category(self, stock_code):
-        """查詢股票所屬產業"""
-        for category, info in TW_STOCK_CATEGORIES.items():
-            if stock_code in info['stocks']:
-                idx = info['stocks'].index(stock_code)
-                stock_name = info['names'][idx]
-                print(f"📊 {stock_code} {stock_name} 屬於 [{category}] 產業")
-                return category
+        """
+        查詢股票所屬產業 (一檔股票可能屬於多個產業/族群)
+        回傳產業列表,找不到時回傳 None
+        """
+        categories = self.mapping.groups_for_stock(stock_code)
+        if categories:
+            stock_name = self.mapping.stock_names.get(stock_code, '')
+            print(f"📊 {stock_code} {stock_name} 屬於 [{', '.join(categories)}] 產業")
+            return categories
         
         print(f"❌ 找不到股票代碼: {stock_code}")
         return None
+    
+    def lookup_categories(self, stock_codes):
+        """
+        批次查詢多檔股票所屬產業
+        回傳 {stock_code: [產業, ...]},找不到的代碼為空列表
+        """
+        return self.mapping.lookup_stocks(stock_codes)
+    
+    def search_stocks(self, query, limit=50):
+        """
+        依代碼前綴或名稱關鍵字搜尋股票
+        回傳 [(stock_code, stock_name), ...]
+        """
+        return self.mapping.search_stocks(query, limit=limit)
 
 # 使用範例
 if __name__ == '__main__':
@@ -0,0 +1,178 @@
+"""
+證交所 (TWSE) STOCK_DAY 非同步抓取器
+以單一全域 Token Bucket 控制請求速率,同時抓取多組 (股票, 月份)
+可搭配 TWSEResponseCache: 已結束的月份不再請求,當月以條件式請求重新驗證
+"""
+
+import asyncio
+import random
+from datetime import datetime
+
+import aiohttp
+import pandas as pd
+
+from rate_limiter import SOURCE_LIMITS, get_limiter
+from twse_http_cache import TWSEResponseCache
+
+TWSE_STOCK_DAY_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY"
+
+# 證交所約允許每 5 秒 3 次請求,超過會被暫時封鎖
+TWSE_RATE, TWSE_BURST = SOURCE_LIMITS['twse']
+
+# 全域共用的限速器: 所有 AsyncTWSEFetcher 與同步抓取路徑共用同一個 bucket
+TWSE_LIMITER = get_limiter('twse')
+
+# 視為被限流、需要退避重試的 HTTP 狀態碼
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def month_starts(start_date, end_date):
+    """
+    列出區間內每個月的第一天
+    start_date / end_date: 'YYYYMMDD'
+    回傳 ['YYYYMM01', ...]
+    """
+    start = datetime.strptime(start_date, '%Y%m%d').replace(day=1)
+    end = datetime.strptime(end_date, '%Y%m%d')
+
+    months = []
+    current = start
+    while current <= end:
+        months.append(current.strftime('%Y%m01'))
+        if current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
+        else:
+            current = current.replace(month=current.month + 1)
+    return months
+
+
+class TWSEThrottled(Exception):
+    """證交所回應限流或非 JSON 內容"""
+
+
+class AsyncTWSEFetcher:
+    def __init__(self, base_url=TWSE_STOCK_DAY_URL, limiter=None, max_connections=4,
+                 max_retries=4, backoff=2.0, timeout=15, http_cache=None):
+        """
+        base_url: STOCK_DAY 端點 (測試時可指向本地 HTTP 服務)
+        limiter: TokenBucket,預設使用全域 TWSE_LIMITER
+        max_connections: 連線池大小 (keep-alive 連線重複使用)
+        max_retries: 限流時最多重試次數
+        backoff: 退避基準秒數,第 n 次重試等待 backoff * 2**n (加上隨機抖動)
+        timeout: 單次請求逾時秒數
+        http_cache: TWSEResponseCache,None 表示每次都向證交所請求
+        """
+        self.base_url = base_url
+        self.limiter = limiter or TWSE_LIMITER
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.http_cache = http_cache
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failed': 0}
+
+    async def _get_json(self, session, params, headers=None):
+        """回傳 (JSON, 回應標頭);條件式請求得到 304 時 JSON 為 None"""
+        await self.limiter.acquire_async()
+        self.stats['requests'] += 1
+        async with session.get(self.base_url, params=params, headers=headers) as response:
+            if response.status in THROTTLE_STATUS:
+                raise TWSEThrottled(f"HTTP {response.status}")
+            if response.status == 304:
+                return None, response.headers
+            response.raise_for_status()
+            try:
+                return await response.json(content_type=None), response.headers
+            except ValueError:
+                # 被封鎖時證交所會回傳 HTML 頁面
+                raise TWSEThrottled("非 JSON 回應")
+
+    async def fetch_month(self, session, stock_code, month):
+        """
+        抓取單一 (股票, 月份),限流時以指數退避重試
+        month: 'YYYYMM01'
+        回傳 STOCK_DAY JSON (stat 非 OK 時回傳 None)
+        """
+        entry = None
+        if self.http_cache is not None:
+            data, entry = self.http_cache.lookup(stock_code, month)
+            if data is not None:
+                return data if data.get('stat') == 'OK' else None
+
+        params = {'response': 'json', 'date': month, 'stockNo': stock_code}
+        headers = TWSEResponseCache.conditional_headers(entry)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                data, response_headers = await self._get_json(session, params, headers)
+                if self.http_cache is not None:
+                    if data is None:
+                        data = self.http_cache.revalidated(stock_code, month, entry)
+                    else:
+                        self.http_cache.store(stock_code, month, data,
+                                              response_headers.get('ETag'),
+                                              response_headers.get('Last-Modified'))
+                if data.get('stat') == 'OK':
+                    return data
+                return None
+            except (TWSEThrottled, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, TWSEThrottled):
+                    self.stats['throttled'] += 1
+                if attempt == self.max_retries:
+                    self.stats['failed'] += 1
+                    print(f"❌ {stock_code} {month[:6]} 抓取失敗: {e}")
+                    return None
+                self.stats['retries'] += 1
+                delay = self.backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def fetch_pairs(self, pairs):
+        """
+        同時抓取多組 (stock_code, month)
+        回傳 {(stock_code, month): STOCK_DAY JSON 或 None}
+        """
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(
+                *(self.fetch_month(session, code, month) for code, month in pairs)
+            )
+        return dict(zip(pairs, results))
+
+    async def fetch_ranges_async(self, ranges):
+        """
+        抓取多檔股票各自區間內的日成交資訊
+        ranges: {stock_code: (start_date, end_date)},日期格式 'YYYYMMDD'
+        回傳 {stock_code: DataFrame},無資料的股票不列入
+        """
+        months = {code: month_starts(start, end) for code, (start, end) in ranges.items()}
+        pairs = [(code, month) for code, code_months in months.items() for month in code_months]
+        raw = await self.fetch_pairs(pairs)
+
+        results = {}
+        for code, code_months in months.items():
+            frames = [
+                pd.DataFrame(data['data'], columns=data['fields'])
+                for data in (raw[(code, month)] for month in code_months)
+                if data
+            ]
+            if frames:
+                df = pd.concat(frames, ignore_index=True)
+                df['股票代碼'] = code
+                results[code] = df
+        return results
+
+    async def fetch_stocks_async(self, stock_codes, start_date, end_date):
+        """
+        抓取多檔股票在同一區間內的日成交資訊
+        start_date / end_date: 'YYYYMMDD'
+        """
+        return await self.fetch_ranges_async({code: (start_date, end_date) for code in stock_codes})
+
+    def fetch_ranges(self, ranges):
+        """fetch_ranges_async 的同步包裝"""
+        return asyncio.run(self.fetch_ranges_async(ranges))
+
+    def fetch_stocks(self, stock_codes, start_date, end_date):
+        """fetch_stocks_async 的同步包裝"""
+        return asyncio.run(self.fetch_stocks_async(stock_codes, start_date, end_date))
@@ -0,0 +1,112 @@
+"""
+證交所 STOCK_DAY 回應快取
+每組 (股票, 月份) 一個檔案,保存原始 JSON 與 ETag / Last-Modified:
+  已結束的月份資料不會再變動,抓到後永久有效
+  當月資料在 current_ttl 秒內直接使用,過期後以條件式請求 (If-None-Match / If-Modified-Since) 重新驗證
+
+檔案: {cache_dir}/{stockNo}/{YYYYMM}.json
+  {'fetched': epoch 秒, 'final': 是否為已結束月份, 'etag': ..., 'last_modified': ..., 'data': STOCK_DAY JSON}
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+TW_TZ = ZoneInfo('Asia/Taipei')
+
+# 當月資料的有效秒數 (盤後才會新增當日資料,不需要頻繁重抓)
+CURRENT_MONTH_TTL = 3600
+
+
+def month_end_passed(month, fetched):
+    """
+    month: 'YYYYMM01'
+    fetched: 抓取時間 (epoch 秒)
+    抓取時 (台北時間) 該月份是否已結束,已結束的月份資料不會再變動
+    """
+    year, mon = int(month[:4]), int(month[4:6])
+    next_month = date(year + mon // 12, mon % 12 + 1, 1)
+    return datetime.fromtimestamp(fetched, TW_TZ).date() >= next_month
+
+
+class TWSEResponseCache:
+    def __init__(self, cache_dir='stock_data/cache/twse_http', current_ttl=CURRENT_MONTH_TTL):
+        self.cache_dir = cache_dir
+        self.current_ttl = current_ttl
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0}
+
+    def _path(self, stock_code, month):
+        return os.path.join(self.cache_dir, stock_code, f"{month[:6]}.json")
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def lookup(self, stock_code, month, now=None):
+        """
+        回傳 (data, entry)
+        data: 仍有效時為快取的 STOCK_DAY JSON,需要重新請求時為 None
+        entry: 快取項目 (用於條件式請求),沒有快取時為 None
+        """
+        path = self._path(stock_code, month)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None, None
+
+        now = time.time() if now is None else now
+        if entry['final'] or now - entry['fetched'] < self.current_ttl:
+            self._count('hits')
+            return entry['data'], entry
+        self._count('misses')
+        return None, entry
+
+    def store(self, stock_code, month, data, etag=None, last_modified=None, now=None):
+        """寫入回應 (先寫暫存檔再換名,並行寫入同一檔案也不會讀到寫一半的內容)"""
+        now = time.time() if now is None else now
+        entry = {
+            'fetched': now,
+            'final': month_end_passed(month, now),
+            'etag': etag,
+            'last_modified': last_modified,
+            'data': data,
+        }
+        path = self._path(stock_code, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._count('stores')
+
+    def revalidated(self, stock_code, month, entry, now=None):
+        """伺服器回應 304: 沿用快取內容並更新抓取時間,回傳快取的 JSON"""
+        self._count('revalidated')
+        self.store(stock_code, month, entry['data'], entry.get('etag'), entry.get('last_modified'), now)
+        return entry['data']
+
+    @staticmethod
+    def conditional_headers(entry):
+        """依快取項目產生條件式請求標頭"""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @property
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def report(self):
+        s = self.stats
+        return (f"📦 證交所回應快取: 命中 {s['hits']} | 未命中 {s['misses']} "
+                f"| 304 重新驗證 {s['revalidated']} | 命中率 {self.hit_rate:.0%}")
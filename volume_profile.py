@@ -0,0 +1,195 @@
+"""
+美股 ETF 盤中成交量基準 (volume profile)
+每檔 ticker 保存最近 N 個完整交易日「每分鐘」的成交量,
+以同一分鐘的 N 日平均量作為基準,讓 volume_ratio 可跨時段比較
+
+目錄結構:
+  cache/volume_profile/{ticker}.npz
+    days:    int64   [n]       交易日 YYYYMMDD
+    volumes: float64 [n, 390]  每分鐘成交量 (09:30 起算,缺值為 NaN)
+    checked: int64             最後一次檢查更新的日期 YYYYMMDD
+
+第一次使用時由歷史分K 建立,之後每天只補抓新完成的交易日;
+某段分K 抓取失敗時保留已抓到的交易日,當天不再重試,隔天從最後一個交易日之後接續
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+US_TZ = pytz.timezone('America/New_York')
+SESSION_OPEN_MINUTE = 9 * 60 + 30
+SESSION_MINUTES = 390
+
+# Yahoo 分K 只提供最近 30 天,且單次請求最多 8 天
+MAX_LOOKBACK_DAYS = 29
+CHUNK_DAYS = 7
+
+
+def _yyyymmdd(day):
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def minute_of_session(index):
+    """K 線時間 -> 開盤後第幾分鐘 (0 ~ 389,盤前盤後為負數或 >= 390)"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    local = index.tz_convert(US_TZ)
+    return np.asarray(local.hour * 60 + local.minute - SESSION_OPEN_MINUTE)
+
+
+class VolumeProfile:
+    def __init__(self, cache_dir='cache/volume_profile', days=20, timeout=None):
+        """
+        cache_dir: 快取目錄
+        days: 平均的交易日數
+        timeout: 單次分K 請求逾時秒數 (None 為 yfinance 預設值)
+        """
+        self.cache_dir = cache_dir
+        self.days = days
+        self.timeout = timeout
+        self.profiles = {}
+        self.stats = {'built': 0, 'updated': 0, 'requests': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _path(self, ticker):
+        return os.path.join(self.cache_dir, f"{ticker}.npz")
+
+    def _load(self, ticker):
+        if ticker not in self.profiles:
+            path = self._path(ticker)
+            if os.path.exists(path):
+                with np.load(path) as f:
+                    self.profiles[ticker] = {
+                        'days': f['days'],
+                        'volumes': f['volumes'],
+                        'checked': int(f['checked']),
+                    }
+                    self.profiles[ticker]['baseline'] = self._baseline(self.profiles[ticker]['volumes'])
+        return self.profiles.get(ticker)
+
+    def _save(self, ticker, profile):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._path(ticker) + '.tmp.npz'
+        np.savez(tmp, days=profile['days'], volumes=profile['volumes'],
+                 checked=np.int64(profile['checked']))
+        os.replace(tmp, self._path(ticker))
+
+    @staticmethod
+    def _baseline(volumes):
+        """每分鐘的 N 日平均量 (全部缺值的分鐘為 NaN)"""
+        if len(volumes) == 0:
+            return np.full(SESSION_MINUTES, np.nan)
+        valid = ~np.isnan(volumes)
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, volumes, 0.0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    @staticmethod
+    def session_vectors(hist, before):
+        """
+        將分K 依交易日拆成每分鐘成交量向量
+        before: 只保留此日期 (美東) 之前、已完整收盤的交易日
+        回傳 {YYYYMMDD: ndarray[390]}
+        """
+        if hist is None or len(hist) == 0:
+            return {}
+        minutes = minute_of_session(hist.index)
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        days = index.tz_convert(US_TZ).date
+        volume = hist['Volume'].to_numpy(dtype=float)
+
+        keep = (minutes >= 0) & (minutes < SESSION_MINUTES) & (days < before)
+        vectors = {}
+        for day in sorted(set(days[keep])):
+            mask = keep & (days == day)
+            vec = np.full(SESSION_MINUTES, np.nan)
+            vec[minutes[mask]] = volume[mask]
+            vectors[_yyyymmdd(day)] = vec
+        return vectors
+
+    def ensure(self, ticker, stock, today=None):
+        """
+        確保 ticker 的成交量基準已包含最近一個完整交易日
+        stock: 提供 history(start=, end=, interval='1m') 的物件 (yf.Ticker)
+        today: 美東日期,預設為現在
+        每個 ticker 每天最多檢查一次 (抓取失敗時也算已檢查)
+        """
+        today = today or datetime.now(US_TZ).date()
+        with self._lock:
+            profile = self._load(ticker)
+        if profile and profile['checked'] >= _yyyymmdd(today):
+            return profile
+
+        if profile and len(profile['days']):
+            last = str(int(profile['days'][-1]))
+            start = datetime.strptime(last, '%Y%m%d').date() + timedelta(days=1)
+            start = max(start, today - timedelta(days=MAX_LOOKBACK_DAYS))
+        else:
+            start = today - timedelta(days=MAX_LOOKBACK_DAYS)
+
+        kwargs = {'timeout': self.timeout} if self.timeout else {}
+        vectors = {}
+        chunk_start = start
+        while chunk_start <= today:
+            chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS), today + timedelta(days=1))
+            with self._lock:
+                self.stats['requests'] += 1
+            try:
+                hist = stock.history(start=chunk_start.isoformat(), end=chunk_end.isoformat(), interval='1m',
+                                     **kwargs)
+            except Exception as e:
+                # 保留已抓到的較早交易日,之後的區段隔天再從最後一個交易日接續
+                print(f"⚠️  {ticker} 成交量基準更新失敗 ({chunk_start} 起): {e}")
+                with self._lock:
+                    self.stats['failed'] += 1
+                break
+            vectors.update(self.session_vectors(hist, today))
+            chunk_start = chunk_end
+
+        days = list(profile['days']) if profile else []
+        volumes = list(profile['volumes']) if profile else []
+        for day in sorted(vectors):
+            if day not in days:
+                days.append(day)
+                volumes.append(vectors[day])
+
+        days = np.asarray(days[-self.days:], dtype=np.int64)
+        volumes = np.asarray(volumes[-self.days:], dtype=float).reshape(-1, SESSION_MINUTES)
+        new_profile = {
+            'days': days,
+            'volumes': volumes,
+            'checked': _yyyymmdd(today),
+            'baseline': self._baseline(volumes),
+        }
+        with self._lock:
+            self.stats['updated' if profile else 'built'] += 1
+            self.profiles[ticker] = new_profile
+            self._save(ticker, new_profile)
+        return new_profile
+
+    def baseline(self, ticker, timestamp):
+        """ticker 在 timestamp 那一分鐘的 N 日平均量,沒有基準時回傳 None"""
+        profile = self.profiles.get(ticker)
+        if not profile or not len(profile['days']):
+            return None
+        minute = int(minute_of_session([timestamp])[0])
+        if not 0 <= minute < SESSION_MINUTES:
+            return None
+        value = profile['baseline'][minute]
+        return None if np.isnan(value) else float(value)
+
+    def volume_ratio(self, ticker, timestamp, volume):
+        """最新一根分K 成交量 / 同一分鐘的 N 日平均量,沒有基準時回傳 None"""
+        base = self.baseline(ticker, timestamp)
+        if not base:
+            return None
+        return float(volume) / base